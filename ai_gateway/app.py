@@ -2,7 +2,16 @@ from __future__ import annotations
 
 from fastapi import FastAPI
 
-from .routers import coach, dispute_summary, match, scam_filter, semantic_search, summaries
+from .core.cache import get_cache
+from .routers import (
+    coach,
+    dispute_summary,
+    embeddings,
+    match,
+    scam_filter,
+    semantic_search,
+    summaries,
+)
 
 app = FastAPI(title="Obsidian AI Gateway", version="1.0.0")
 
@@ -12,8 +21,14 @@ app.include_router(summaries.router, tags=["summaries"])
 app.include_router(coach.router, tags=["coach"])
 app.include_router(scam_filter.router, tags=["scam-filter"])
 app.include_router(dispute_summary.router, tags=["disputes"])
+app.include_router(embeddings.router, tags=["embeddings"])
 
 
 @app.get("/health")
 def healthcheck() -> dict[str, str]:  # pragma: no cover - trivial
     return {"status": "ok"}
+
+
+@app.get("/cache/stats")
+def cache_stats() -> dict[str, int | float]:
+    return get_cache().stats()
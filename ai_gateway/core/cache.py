@@ -1,44 +1,176 @@
-"""Простейший in-memory TTL cache для эмбеддингов и подсказок."""
+"""Ограниченный in-memory cache (LRU + TTL) для эмбеддингов и подсказок.
+
+Чтение идёт без блокировки: запись ``dict`` атомарна под GIL, а для LRU чтение
+лишь проставляет время доступа в запись. Блокировка нужна только при вставке:
+когда превышен лимит по числу записей или по примерному объёму, кэш пачкой
+вытесняет давно не читавшиеся ключи до ``low_watermark`` от лимита. Просроченные
+ключи удаляются лениво при чтении и периодической зачисткой при вставке.
+"""
 
 from __future__ import annotations
 
+import sys
 import time
-from collections.abc import MutableMapping
+from collections.abc import Iterator, MutableMapping
+from dataclasses import dataclass
 from threading import Lock
 from typing import Any
 
+from .config import get_settings
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class _Entry:
+    value: Any
+    expires_at: float
+    size: int
+    accessed_at: float
+
+
+def _estimate_size(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)) and value:
+        # Элементы векторов однотипны — оцениваем по первому.
+        size += sys.getsizeof(value[0]) * len(value)
+    return size
+
 
 class TTLCache(MutableMapping[str, Any]):
-    def __init__(self, ttl_seconds: float = 3600) -> None:
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        *,
+        max_entries: int = 50_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+        low_watermark: float = 0.9,
+    ) -> None:
         self._ttl = ttl_seconds
-        self._store: dict[str, tuple[float, Any]] = {}
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sweep_interval = sweep_interval
+        self._low_watermark = low_watermark
+        self._store: dict[str, _Entry] = {}
         self._lock = Lock()
+        self._bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        # Счётчики обновляются без блокировки и могут немного отставать под конкуренцией.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
-    def __getitem__(self, key: str) -> Any:  # pragma: no cover - trivial
-        value = self._store[key][1]
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
         return value
 
     def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: str) -> None:
         with self._lock:
-            self._store[key] = (time.time() + self._ttl, value)
+            entry = self._store.pop(key)
+            self._bytes -= entry.size
+
+    def __iter__(self) -> Iterator[str]:  # pragma: no cover - not used
+        return iter(list(self._store))
+
+    def __len__(self) -> int:
+        return len(self._store)
 
-    def __delitem__(self, key: str) -> None:  # pragma: no cover - unused
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._store.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        now = time.monotonic()
+        if entry.expires_at < now:
+            self.misses += 1
+            self._expire(key, entry)
+            return default
+        entry.accessed_at = now
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        now = time.monotonic()
+        entry = _Entry(
+            value=value,
+            expires_at=now + (self._ttl if ttl is None else ttl),
+            size=_estimate_size(key) + _estimate_size(value),
+            accessed_at=now,
+        )
+        with self._lock:
+            previous = self._store.get(key)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._store[key] = entry
+            self._bytes += entry.size
+            if now >= self._next_sweep:
+                self._sweep(now)
+            if len(self._store) > self._max_entries or self._bytes > self._max_bytes:
+                self._evict()
+
+    def _expire(self, key: str, entry: _Entry) -> None:
         with self._lock:
+            if self._store.get(key) is entry:
+                del self._store[key]
+                self._bytes -= entry.size
+                self.expirations += 1
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, entry in self._store.items() if entry.expires_at < now]
+        for key in expired:
+            self._bytes -= self._store.pop(key).size
+        self.expirations += len(expired)
+        self._next_sweep = now + self._sweep_interval
+
+    def _evict(self) -> None:
+        target_entries = int(self._max_entries * self._low_watermark)
+        target_bytes = int(self._max_bytes * self._low_watermark)
+        by_age = sorted(self._store.items(), key=lambda item: item[1].accessed_at)
+        evicted = 0
+        for key, entry in by_age:
+            if len(self._store) <= target_entries and self._bytes <= target_bytes:
+                break
             del self._store[key]
+            self._bytes -= entry.size
+            evicted += 1
+        self.evictions += evicted
 
-    def __iter__(self):  # pragma: no cover - not used
-        return iter(self._store)
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._store),
+            "approx_bytes": self._bytes,
+            "max_entries": self._max_entries,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
 
-    def __len__(self) -> int:  # pragma: no cover - not used
-        return len(self._store)
 
-    def get(self, key: str) -> Any | None:
-        record = self._store.get(key)
-        if not record:
-            return None
-        expires_at, value = record
-        if expires_at < time.time():
-            with self._lock:
-                self._store.pop(key, None)
-            return None
-        return value
+_shared: TTLCache | None = None
+_shared_lock = Lock()
+
+
+def get_cache() -> TTLCache:
+    """Общий для всех сервисов gateway кэш с единым бюджетом памяти."""
+
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            settings = get_settings()
+            _shared = TTLCache(
+                max_entries=settings.cache_max_entries,
+                max_bytes=settings.cache_max_bytes,
+                sweep_interval=settings.cache_sweep_interval,
+            )
+        return _shared
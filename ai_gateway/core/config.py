@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+import tempfile
 from functools import lru_cache
 from typing import Literal
 
@@ -16,6 +17,22 @@ class Settings(BaseModel):
     enable_rate_limit: bool = Field(default=os.getenv("AI_RATE_LIMIT", "1") == "1")
     timeout_match: PositiveFloat = Field(default=float(os.getenv("AI_TIMEOUT_MATCH", "1.2")))
     timeout_search: PositiveFloat = Field(default=float(os.getenv("AI_TIMEOUT_SEARCH", "0.9")))
+    vectorized_ranking: bool = Field(default=os.getenv("AI_VECTORIZED_RANKING", "1") == "1")
+    vectorizer_max_ngram: int = Field(default=int(os.getenv("AI_VECTORIZER_NGRAM", "1")), ge=1, le=3)
+    embedding_store_dir: str = Field(
+        default=os.getenv(
+            "AI_EMBEDDING_STORE_DIR", os.path.join(tempfile.gettempdir(), "ai-gateway-embeddings")
+        )
+    )
+    ann_nprobe: int = Field(default=int(os.getenv("AI_ANN_NPROBE", "16")), ge=1)
+    ann_min_train: int = Field(default=int(os.getenv("AI_ANN_MIN_TRAIN", "2048")), ge=64)
+    cache_max_entries: int = Field(default=int(os.getenv("AI_CACHE_MAX_ENTRIES", "50000")), ge=1)
+    cache_max_bytes: int = Field(
+        default=int(os.getenv("AI_CACHE_MAX_BYTES", str(64 * 1024 * 1024))), ge=1
+    )
+    cache_sweep_interval: PositiveFloat = Field(
+        default=float(os.getenv("AI_CACHE_SWEEP_INTERVAL", "60"))
+    )
     rank_weights: dict[str, float] = Field(
         default_factory=lambda: {
             "skill": 0.35,
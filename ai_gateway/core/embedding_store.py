@@ -0,0 +1,233 @@
+"""Персистентное хранилище предвычисленных эмбеддингов кандидатов.
+
+Каждое пространство (``match.profiles``, ``search.orders`` …) — это пара файлов:
+
+* ``<space>.f32`` — memory-mapped матрица float32 (rows × dim) частот токенов;
+* ``<space>.idx`` — append-only журнал ``id<TAB>content_hash<TAB>row``.
+
+Храним ненормированные частоты: целые числа в float32 представимы точно, поэтому
+нормировка при чтении даёт те же значения, что и векторизация «на лету». Запись
+идёт под ``flock``, так что файлы можно разделять между воркерами uvicorn.
+Сигнатура векторизатора хранится в ``<space>.meta.json``; при её смене
+пространство пересоздаётся.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+from .config import get_settings
+from .vectorizer import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_ROWS = 1024
+
+Key = tuple[str, str]
+CountsBuilder = Callable[[list[str]], np.ndarray]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingSpace:
+    """Матрица частот для одного типа сущностей и одного векторизатора."""
+
+    def __init__(self, root: Path, name: str, *, dim: int, signature: str) -> None:
+        self.name = name
+        self.dim = dim
+        self.signature = signature
+        self._matrix_path = root / f"{name}.f32"
+        self._index_path = root / f"{name}.idx"
+        self._meta_path = root / f"{name}.meta.json"
+        self._lock_path = root / f"{name}.lock"
+        self._lock = Lock()
+        self._index: dict[str, tuple[str, int]] = {}
+        self._rows = 0
+        self._offset = 0
+        self._matrix: np.memmap | None = None
+        with self._exclusive():
+            self._ensure_compatible()
+            self._refresh_index()
+
+    # ------------------------------------------------------------------ files
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        with self._lock, open(self._lock_path, "a+b") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _ensure_compatible(self) -> None:
+        expected = {"dim": self.dim, "signature": self.signature}
+        try:
+            meta = json.loads(self._meta_path.read_text())
+        except (OSError, ValueError):
+            meta = None
+        if meta == expected and self._matrix_path.exists():
+            return
+        if meta is not None:
+            logger.info("embedding_store.reset", extra={"space": self.name, "previous": meta})
+        self._matrix_path.write_bytes(b"")
+        self._index_path.write_bytes(b"")
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(expected))
+        os.replace(tmp_path, self._meta_path)
+
+    def _refresh_index(self) -> None:
+        """Дочитывает новые записи журнала, добавленные другими процессами."""
+
+        try:
+            size = self._index_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self._offset:
+            # Журнал пересоздан (сменилась сигнатура) — начинаем с нуля.
+            self._index.clear()
+            self._rows = 0
+            self._offset = 0
+            self._matrix = None
+        if size == self._offset:
+            return
+        with open(self._index_path, "rb") as handle:
+            handle.seek(self._offset)
+            chunk = handle.read(size - self._offset)
+        complete = chunk.rfind(b"\n") + 1
+        for line in chunk[:complete].decode("utf-8").splitlines():
+            identifier, digest, row = line.split("\t")
+            self._index[identifier] = (digest, int(row))
+            self._rows = max(self._rows, int(row) + 1)
+        self._offset += complete
+
+    def _view(self, rows: int) -> np.memmap | None:
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            capacity = self._matrix_path.stat().st_size // (4 * self.dim)
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+        return self._matrix
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self._matrix_path.stat().st_size // (4 * self.dim)
+        if capacity >= rows:
+            return
+        while capacity < rows:
+            capacity = max(capacity * 2, _INITIAL_ROWS)
+        with open(self._matrix_path, "r+b") as handle:
+            handle.truncate(capacity * 4 * self.dim)
+        self._matrix = None
+
+    # -------------------------------------------------------------------- API
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, keys: Sequence[Key]) -> tuple[np.ndarray, list[int]]:
+        """Возвращает частоты для ключей и позиции промахов (их строки нулевые)."""
+
+        with self._lock:
+            self._refresh_index()
+            counts = np.zeros((len(keys), self.dim), dtype=np.float64)
+            hits: list[int] = []
+            rows: list[int] = []
+            missing: list[int] = []
+            for position, (identifier, digest) in enumerate(keys):
+                record = self._index.get(identifier)
+                if record is not None and record[0] == digest:
+                    hits.append(position)
+                    rows.append(record[1])
+                else:
+                    missing.append(position)
+            matrix = self._view(self._rows)
+            if hits and matrix is not None:
+                counts[hits] = matrix[rows]
+        return counts, missing
+
+    def upsert(self, keys: Sequence[Key], counts: np.ndarray) -> None:
+        if not keys:
+            return
+        with self._exclusive():
+            self._refresh_index()
+            fresh = [
+                position
+                for position, (identifier, digest) in enumerate(keys)
+                if self._index.get(identifier, ("", -1))[0] != digest
+            ]
+            if not fresh:
+                return
+            start = self._rows
+            self._reserve(start + len(fresh))
+            matrix = self._view(start + len(fresh))
+            assert matrix is not None
+            matrix[start : start + len(fresh)] = counts[fresh].astype(np.float32)
+            matrix.flush()
+            lines = []
+            for offset, position in enumerate(fresh):
+                identifier, digest = keys[position]
+                lines.append(f"{identifier}\t{digest}\t{start + offset}\n")
+            with open(self._index_path, "ab") as handle:
+                handle.write("".join(lines).encode("utf-8"))
+            self._refresh_index()
+
+    def resolve(
+        self, identifiers: Sequence[object], texts: Sequence[str | None], build: CountsBuilder
+    ) -> np.ndarray:
+        """Частоты для текстов: из хранилища, а промахи — через ``build`` с записью."""
+
+        keys = [
+            (str(identifier), content_hash(text or ""))
+            for identifier, text in zip(identifiers, texts)
+        ]
+        counts, missing = self.lookup(keys)
+        if missing:
+            built = build([texts[position] or "" for position in missing])
+            counts[missing] = built
+            self.upsert([keys[position] for position in missing], built)
+        return counts
+
+
+class EmbeddingStore:
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._spaces: dict[str, EmbeddingSpace] = {}
+        self._lock = Lock()
+
+    def space(self, name: str, *, vectorizer: HashingVectorizer) -> EmbeddingSpace:
+        with self._lock:
+            space = self._spaces.get(name)
+            if space is None or space.signature != vectorizer.signature:
+                space = EmbeddingSpace(
+                    self._root, name, dim=vectorizer.dim, signature=vectorizer.signature
+                )
+                self._spaces[name] = space
+            return space
+
+
+_store: EmbeddingStore | None = None
+_store_lock = Lock()
+
+
+def get_embedding_store() -> EmbeddingStore | None:
+    global _store
+    settings = get_settings()
+    if not settings.embedding_store_dir:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = EmbeddingStore(settings.embedding_store_dir)
+        return _store
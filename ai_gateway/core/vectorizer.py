@@ -0,0 +1,86 @@
+"""Детерминированный hashing-векторизатор для матчинга и поиска.
+
+Встроенный ``hash()`` солится на процесс, поэтому векторы различались между
+воркерами и рестартами. Здесь корзина токена считается через CRC32 — он быстрый,
+не зависит от процесса и одинаков на всех платформах.
+"""
+
+from __future__ import annotations
+
+import math
+import zlib
+from collections.abc import Callable, Iterable
+
+import numpy as np
+
+VECTORIZER_VERSION = 1
+
+Tokenizer = Callable[[str], list[str]]
+
+
+def whitespace_tokenizer(text: str) -> list[str]:
+    return text.lower().split()
+
+
+class HashingVectorizer:
+    """Feature hashing токенов и словесных n-грамм в вектор фиксированной длины.
+
+    ``signature`` меняется вместе с версией алгоритма, размерностью, диапазоном
+    n-грамм и именем токенизатора — по ней хранилища проверяют совместимость
+    сохранённых векторов.
+    """
+
+    def __init__(
+        self,
+        *,
+        dim: int,
+        tokenizer: Tokenizer = whitespace_tokenizer,
+        tokenizer_name: str = "whitespace",
+        ngram_range: tuple[int, int] = (1, 1),
+    ) -> None:
+        low, high = ngram_range
+        if dim <= 0 or low < 1 or high < low:
+            raise ValueError("invalid vectorizer configuration")
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self._tokenizer = tokenizer
+        self.signature = (
+            f"hashing-v{VECTORIZER_VERSION}:crc32:{tokenizer_name}:dim={dim}:ngram={low}-{high}"
+        )
+
+    def _features(self, tokens: list[str]) -> Iterable[str]:
+        low, high = self.ngram_range
+        for size in range(low, high + 1):
+            if size == 1:
+                yield from tokens
+                continue
+            for start in range(len(tokens) - size + 1):
+                yield " ".join(tokens[start : start + size])
+
+    def buckets(self, text: str) -> list[int]:
+        dim = self.dim
+        return [
+            zlib.crc32(feature.encode("utf-8")) % dim
+            for feature in self._features(self._tokenizer(text))
+        ]
+
+    def vectorize(self, text: str | None) -> list[float]:
+        vector = [0.0] * self.dim
+        if not text:
+            return vector
+        for idx in self.buckets(text):
+            vector[idx] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def counts(self, texts: list[str | None]) -> np.ndarray:
+        """Матрица частот (n, dim) — ненормированная, для хранилища и скоринга."""
+
+        dim = self.dim
+        flat: list[int] = []
+        for row, text in enumerate(texts):
+            if text:
+                offset = row * dim
+                flat.extend(offset + idx for idx in self.buckets(text))
+        counts = np.bincount(np.asarray(flat, dtype=np.intp), minlength=len(texts) * dim)
+        return counts.astype(np.float64).reshape(len(texts), dim)
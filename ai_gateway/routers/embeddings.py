@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from .match import matcher
+from .semantic_search import search_service
+
+router = APIRouter(prefix="/embeddings")
+
+
+class EmbeddingItem(BaseModel):
+    id: int | str
+    title: str | None = None
+    body: str | None = None
+    tldr: str | None = None
+    slug: str | None = None
+    description: str | None = None
+
+
+class EmbeddingUpsertRequest(BaseModel):
+    entity: str = Field(pattern="^(orders|profiles|portfolio)$")
+    items: list[EmbeddingItem] = Field(default_factory=list, max_length=1000)
+
+
+class EmbeddingUpsertResponse(BaseModel):
+    entity: str
+    match: int
+    search: int
+
+
+@router.post("/upsert", response_model=EmbeddingUpsertResponse)
+def upsert_embeddings(request: EmbeddingUpsertRequest) -> EmbeddingUpsertResponse:
+    items = [item.model_dump() for item in request.items]
+    search_items = [{**item, "id": str(item["id"])} for item in items]
+    return EmbeddingUpsertResponse(
+        entity=request.entity,
+        match=matcher.upsert_embeddings(request.entity, items),
+        search=search_service.upsert_embeddings(request.entity, search_items),
+    )
@@ -49,6 +49,16 @@ class MatchRequest(BaseModel):
     locale: str = "ru"
 
 
+class MatchBatchJob(MatchJob):
+    candidate_ids: list[int] | None = None
+
+
+class MatchBatchRequest(BaseModel):
+    jobs: list[MatchBatchJob] = Field(default_factory=list, max_length=500)
+    profiles: list[ProfileCandidate] = Field(default_factory=list)
+    locale: str = "ru"
+
+
 class RankedResponse(BaseModel):
     identifier: int
     score: float
@@ -66,3 +76,20 @@ class MatchResponse(BaseModel):
 def match_endpoint(request: MatchRequest) -> MatchResponse:
     payload = matcher.match(request.model_dump())
     return MatchResponse(**payload)
+
+
+class JobRecommendations(BaseModel):
+    job_id: int
+    invite_recommendations: list[RankedResponse]
+    audit: dict
+
+
+class MatchBatchResponse(BaseModel):
+    results: list[JobRecommendations]
+    source: str
+
+
+@router.post("/match/batch", response_model=MatchBatchResponse)
+def match_batch_endpoint(request: MatchBatchRequest) -> MatchBatchResponse:
+    payload = matcher.match_batch(request.model_dump())
+    return MatchBatchResponse(**payload)
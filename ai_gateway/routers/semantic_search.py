@@ -31,12 +31,45 @@ class SemanticSearchResponse(BaseModel):
     source: str = "ai"
 
 
+class IndexUpsertRequest(BaseModel):
+    entity: str = Field(pattern="^(orders|profiles|portfolio)$")
+    locale: str = "ru"
+    documents: list[SearchDocument] = Field(default_factory=list, max_length=1000)
+
+
+class IndexDeleteRequest(BaseModel):
+    entity: str = Field(pattern="^(orders|profiles|portfolio)$")
+    locale: str = "ru"
+    ids: list[str] = Field(default_factory=list, max_length=1000)
+
+
+class IndexResponse(BaseModel):
+    entity: str
+    processed: int
+
+
 @router.post("/semantic_search", response_model=SemanticSearchResponse)
 def semantic_search(request: SemanticSearchRequest) -> SemanticSearchResponse:
     payload = search_service.search(
         query=request.query,
         documents=[doc.model_dump() for doc in request.documents],
         limit=request.limit,
+        entity=request.entity,
+        locale=request.locale,
     )
     payload["source"] = "ai"
     return SemanticSearchResponse(**payload)
+
+
+@router.post("/semantic_search/index", response_model=IndexResponse)
+def index_documents(request: IndexUpsertRequest) -> IndexResponse:
+    processed = search_service.index_documents(
+        request.entity, request.locale, [doc.model_dump() for doc in request.documents]
+    )
+    return IndexResponse(entity=request.entity, processed=processed)
+
+
+@router.post("/semantic_search/index/delete", response_model=IndexResponse)
+def delete_documents(request: IndexDeleteRequest) -> IndexResponse:
+    processed = search_service.delete_documents(request.entity, request.locale, request.ids)
+    return IndexResponse(entity=request.entity, processed=processed)
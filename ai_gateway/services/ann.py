@@ -0,0 +1,364 @@
+"""Приближённый поиск ближайших соседей (IVF) по каталогу документов.
+
+``IVFIndex`` — инвертированный индекс на NumPy: векторы делятся на кластеры
+сферическим k-means, а запрос сканирует только ``nprobe`` ближайших кластеров.
+Пока документов меньше ``min_train``, поиск идёт точным перебором.
+
+``CatalogIndex`` связывает индекс с хранилищем эмбеддингов и append-only
+журналом операций, чтобы все воркеры gateway видели один и тот же каталог и
+восстанавливали его после рестарта.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import math
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock
+from typing import Any
+
+import numpy as np
+
+from ..core.embedding_store import EmbeddingSpace, content_hash
+from ..core.vectorizer import HashingVectorizer
+from .scoring import normalize_rows, top_k_stable
+
+logger = logging.getLogger(__name__)
+
+_KMEANS_ITERATIONS = 10
+_SAMPLE_PER_CLUSTER = 64
+_MAX_LISTS = 1024
+_MIN_LISTS = 8
+
+
+class IVFIndex:
+    def __init__(self, dim: int, *, nprobe: int = 16, min_train: int = 2048, seed: int = 0) -> None:
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self._rng = np.random.default_rng(seed)
+        self._lock = RLock()
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: list[str | None] = []
+        self._rows: dict[str, int] = {}
+        self._centroids: np.ndarray | None = None
+        self._lists: list[list[int]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._rows
+
+    # ---------------------------------------------------------------- storage
+    def _grow(self, extra: int) -> None:
+        needed = len(self._ids) + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 256)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[: len(self._ids)] = self._vectors[: len(self._ids)]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._ids)] = self._alive[: len(self._ids)]
+        self._vectors, self._alive = vectors, alive
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assert self._centroids is not None
+        return np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def upsert(self, identifiers: list[str], vectors: np.ndarray) -> None:
+        """Вставляет или заменяет векторы; ожидаются L2-нормированные строки.
+
+        Повтор id внутри одного вызова: остаётся последний вектор.
+        """
+
+        if not identifiers:
+            return
+        if len(set(identifiers)) != len(identifiers):
+            latest = {identifier: position for position, identifier in enumerate(identifiers)}
+            positions = sorted(latest.values())
+            identifiers = [identifiers[position] for position in positions]
+            vectors = vectors[positions]
+        with self._lock:
+            self._delete_rows(identifiers)
+            start = len(self._ids)
+            self._grow(len(identifiers))
+            stop = start + len(identifiers)
+            self._vectors[start:stop] = vectors
+            self._alive[start:stop] = True
+            for offset, identifier in enumerate(identifiers):
+                self._ids.append(identifier)
+                self._rows[identifier] = start + offset
+            if self._centroids is not None:
+                for offset, cluster in enumerate(self._assign(self._vectors[start:stop]).tolist()):
+                    self._lists[cluster].append(start + offset)
+            self._maintain()
+
+    def delete(self, identifiers: list[str]) -> None:
+        with self._lock:
+            self._delete_rows(identifiers)
+            self._maintain()
+
+    def _delete_rows(self, identifiers: list[str]) -> None:
+        for identifier in identifiers:
+            row = self._rows.pop(identifier, None)
+            if row is not None:
+                self._alive[row] = False
+                self._ids[row] = None
+
+    def _maintain(self) -> None:
+        live = len(self._rows)
+        dead = len(self._ids) - live
+        if dead > max(live, 1024):
+            self._compact()
+        if live >= self.min_train and live >= 2 * self._trained_size:
+            self._train()
+
+    def _compact(self) -> None:
+        rows = np.flatnonzero(self._alive[: len(self._ids)])
+        identifiers = [self._ids[row] for row in rows.tolist()]
+        vectors = self._vectors[rows].copy()
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids, self._rows = [], {}
+        self._grow(len(identifiers))
+        self._vectors[: len(identifiers)] = vectors
+        self._alive[: len(identifiers)] = True
+        for row, identifier in enumerate(identifiers):
+            self._ids.append(identifier)
+            self._rows[identifier] = row
+        if self._centroids is not None:
+            self._rebuild_lists()
+
+    # --------------------------------------------------------------- training
+    def _train(self) -> None:
+        rows = np.flatnonzero(self._alive[: len(self._ids)])
+        nlist = int(min(max(math.sqrt(rows.size), _MIN_LISTS), _MAX_LISTS))
+        sample_size = min(rows.size, nlist * _SAMPLE_PER_CLUSTER)
+        sample = self._vectors[self._rng.choice(rows, size=sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.flatnonzero(np.bincount(labels, minlength=nlist) == 0)
+            if empty.size:
+                sums[empty] = sample[self._rng.choice(sample_size, size=empty.size)]
+            centroids = normalize_rows(sums.astype(np.float64)).astype(np.float32)
+        self._centroids = centroids
+        self._trained_size = rows.size
+        self._rebuild_lists()
+        logger.info("ann.trained", extra={"lists": nlist, "size": int(rows.size)})
+
+    def _rebuild_lists(self) -> None:
+        assert self._centroids is not None
+        self._lists = [[] for _ in range(self._centroids.shape[0])]
+        rows = np.flatnonzero(self._alive[: len(self._ids)])
+        if rows.size:
+            for row, cluster in zip(rows.tolist(), self._assign(self._vectors[rows]).tolist()):
+                self._lists[cluster].append(row)
+
+    # ------------------------------------------------------------------ query
+    def query(self, vector: np.ndarray, limit: int) -> list[tuple[str, float]]:
+        with self._lock:
+            query = vector.astype(np.float32)
+            if self._centroids is None:
+                rows = np.flatnonzero(self._alive[: len(self._ids)])
+            else:
+                probes = min(self.nprobe, self._centroids.shape[0])
+                closest = top_k_stable(self._centroids @ query, probes).tolist()
+                rows = np.fromiter(
+                    (row for cluster in closest for row in self._lists[cluster]), dtype=np.intp
+                )
+                rows = rows[self._alive[rows]]
+            if rows.size == 0:
+                return []
+            scores = self._vectors[rows] @ query
+            best = top_k_stable(scores, limit)
+            return [
+                (self._ids[rows[position]], float(scores[position]))
+                for position in best.tolist()
+            ]
+
+
+class CatalogIndex:
+    """IVF-индекс одного каталога, синхронизированный через журнал на диске.
+
+    Каталог ``name`` — это сущность и язык (``orders.ru``). Журнал
+    ``ann.<name>.jsonl`` хранит только id, хэш текста и сниппет; сами векторы
+    лежат в пространстве ``search.<name>`` хранилища эмбеддингов.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        vectorizer: HashingVectorizer,
+        space: EmbeddingSpace | None,
+        root: Path | None,
+        nprobe: int,
+        min_train: int,
+    ) -> None:
+        self.name = name
+        self._vectorizer = vectorizer
+        self._space = space
+        self._nprobe = nprobe
+        self._min_train = min_train
+        self._lock = RLock()
+        self._path = root / f"ann.{name}.jsonl" if root is not None and space is not None else None
+        self._lock_path = root / f"ann.{name}.lock" if self._path is not None else None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._index = IVFIndex(
+            self._vectorizer.dim, nprobe=self._nprobe, min_train=self._min_train
+        )
+        self._snippets: dict[str, str] = {}
+        self._hashes: dict[str, str] = {}
+        self._offset = 0
+        self._lines = 0
+        self._inode: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # ---------------------------------------------------------------- journal
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        assert self._lock_path is not None
+        with open(self._lock_path, "a+b") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def sync(self) -> None:
+        """Применяет записи журнала, появившиеся после прошлой синхронизации."""
+
+        if self._path is None:
+            return
+        with self._lock:
+            try:
+                stat = self._path.stat()
+            except FileNotFoundError:
+                return
+            if self._inode is not None and stat.st_ino != self._inode:
+                self._reset()
+            if stat.st_size < self._offset:
+                self._reset()
+            self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            with open(self._path, "rb") as handle:
+                handle.seek(self._offset)
+                chunk = handle.read(stat.st_size - self._offset)
+            complete = chunk.rfind(b"\n") + 1
+            self._offset += complete
+            records = [json.loads(line) for line in chunk[:complete].splitlines() if line]
+            self._lines += len(records)
+            self._replay(records)
+
+    def _replay(self, records: list[dict[str, Any]]) -> None:
+        latest: dict[str, dict[str, Any]] = {}
+        for record in records:
+            latest[record["id"]] = record
+        removed = [key for key, record in latest.items() if record["op"] == "del"]
+        for key in removed:
+            self._snippets.pop(key, None)
+            self._hashes.pop(key, None)
+        self._index.delete(removed)
+        puts = [record for record in latest.values() if record["op"] == "put"]
+        if not puts or self._space is None:
+            return
+        counts, missing = self._space.lookup([(record["id"], record["hash"]) for record in puts])
+        if missing:
+            # Вектор пропал (например, сменилась сигнатура векторизатора) —
+            # документ вернётся в индекс при следующем бэкфилле.
+            logger.warning("ann.replay_missing", extra={"catalog": self.name, "count": len(missing)})
+        keep = sorted(set(range(len(puts))) - set(missing))
+        if not keep:
+            return
+        for position in keep:
+            record = puts[position]
+            self._snippets[record["id"]] = record["snippet"]
+            self._hashes[record["id"]] = record["hash"]
+        self._index.upsert(
+            [puts[position]["id"] for position in keep], normalize_rows(counts[keep])
+        )
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        assert self._path is not None
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self._exclusive():
+            with open(self._path, "ab") as handle:
+                handle.write(payload.encode("utf-8"))
+            self.sync()
+            if self._lines > 2 * len(self._snippets) + 1024:
+                self._compact()
+
+    def _compact(self) -> None:
+        """Переписывает журнал текущим состоянием; вызывается под ``flock``."""
+
+        assert self._path is not None
+        tmp_path = self._path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as handle:
+            for key, snippet in self._snippets.items():
+                record = {"op": "put", "id": key, "hash": self._hashes[key], "snippet": snippet}
+                handle.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.replace(tmp_path, self._path)
+        stat = self._path.stat()
+        logger.info("ann.journal_compacted", extra={"catalog": self.name, "lines": self._lines})
+        self._inode, self._offset, self._lines = stat.st_ino, stat.st_size, len(self._snippets)
+
+    # -------------------------------------------------------------------- API
+    def upsert(self, documents: list[dict[str, Any]], texts: list[str]) -> int:
+        identifiers = [str(document["id"]) for document in documents]
+        snippets = [
+            (document.get("tldr") or document.get("body") or "")[:280] for document in documents
+        ]
+        if self._space is not None:
+            counts = self._space.resolve(identifiers, texts, self._vectorizer.counts)
+        else:
+            counts = self._vectorizer.counts(texts)
+        hashes = [content_hash(text or "") for text in texts]
+        with self._lock:
+            if self._path is not None:
+                self._append(
+                    [
+                        {"op": "put", "id": key, "hash": digest, "snippet": snippet}
+                        for key, digest, snippet in zip(identifiers, hashes, snippets)
+                    ]
+                )
+                return len(identifiers)
+            self._index.upsert(identifiers, normalize_rows(counts))
+            self._snippets.update(zip(identifiers, snippets))
+            self._hashes.update(zip(identifiers, hashes))
+        return len(identifiers)
+
+    def delete(self, identifiers: list[str]) -> int:
+        with self._lock:
+            if self._path is not None:
+                self._append([{"op": "del", "id": key} for key in identifiers])
+            else:
+                self._index.delete(identifiers)
+                for key in identifiers:
+                    self._snippets.pop(key, None)
+                    self._hashes.pop(key, None)
+        return len(identifiers)
+
+    def query(self, vector: np.ndarray, limit: int) -> list[dict[str, Any]]:
+        self.sync()
+        with self._lock:
+            return [
+                {"id": key, "score": round(score, 4), "snippet": self._snippets.get(key, "")}
+                for key, score in self._index.query(vector, limit)
+            ]
@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
-import math
 from collections import Counter
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from typing import Any
 
+import numpy as np
+
 from ..core.config import get_settings
+from ..core.embedding_store import get_embedding_store
+from ..core.vectorizer import HashingVectorizer
+from .scoring import CandidateMatrix, ProfileBreakdown, normalize_rows, profile_text, top_k_stable
+
+_TOP_K = 20
+_EMBEDDING_DIM = 32
 
 
 @dataclass(slots=True)
@@ -53,18 +60,33 @@ class SmartMatcher:
     def __init__(self) -> None:
         self.settings = get_settings()
         self.auditor = FairnessAuditor()
+        self.store = get_embedding_store()
+        self.vectorizer = HashingVectorizer(
+            dim=_EMBEDDING_DIM, ngram_range=(1, self.settings.vectorizer_max_ngram)
+        )
 
-    @staticmethod
-    def _vectorize(text: str | None, *, dim: int = 32) -> list[float]:
-        if not text:
-            return [0.0] * dim
-        tokens = text.lower().split()
-        vector = [0.0] * dim
-        for token in tokens:
-            idx = hash(token) % dim
-            vector[idx] += 1.0
-        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
-        return [value / norm for value in vector]
+    def _vectorize(self, text: str | None) -> list[float]:
+        return self.vectorizer.vectorize(text)
+
+    def _text_counts(
+        self, entity: str, identifiers: list[Any], texts: list[str | None]
+    ) -> np.ndarray:
+        if self.store is None:
+            return self.vectorizer.counts(texts)
+        space = self.store.space(f"match.{entity}", vectorizer=self.vectorizer)
+        return space.resolve(identifiers, texts, self.vectorizer.counts)
+
+    def upsert_embeddings(self, entity: str, items: list[dict[str, Any]]) -> int:
+        """Прогревает хранилище эмбеддингов; возвращает число обработанных записей."""
+
+        if entity == "profiles":
+            texts = [profile_text(item) for item in items]
+        elif entity == "orders":
+            texts = [item.get("description") for item in items]
+        else:
+            return 0
+        self._text_counts(entity, [item["id"] for item in items], texts)
+        return len(items)
 
     @staticmethod
     def _cosine(a: list[float], b: list[float]) -> float:
@@ -98,6 +120,63 @@ class SmartMatcher:
     def _rank_profiles(self, job: dict | None, profiles: list[dict], locale: str) -> list[RankedRecommendation]:
         if not job:
             return []
+        if self.settings.vectorized_ranking:
+            return self._rank_profiles_vectorized(job, profiles, locale)
+        return self._rank_profiles_scalar(job, profiles, locale)
+
+    def _rank_profiles_vectorized(
+        self, job: dict, profiles: list[dict], locale: str
+    ) -> tuple[list[RankedRecommendation], dict]:
+        lookup = {}
+        for profile in profiles:
+            self.auditor.scrub(profile)
+            lookup[profile["id"]] = profile
+        counts = self._text_counts(
+            "profiles",
+            [profile["id"] for profile in profiles],
+            [profile_text(profile) for profile in profiles],
+        )
+        candidates = CandidateMatrix.from_profiles(profiles, counts=counts)
+        job_vector = np.asarray(self._vectorize(job.get("description")), dtype=np.float64)
+        breakdown = candidates.score_job(job, job_vector, self.settings.rank_weights)
+        results = self._top_recommendations(candidates, breakdown)
+        audit = self.auditor.audit_distribution(results, lookup)
+        return results, audit
+
+    @staticmethod
+    def _top_recommendations(
+        candidates: CandidateMatrix,
+        breakdown: ProfileBreakdown,
+        rows: np.ndarray | None = None,
+    ) -> list[RankedRecommendation]:
+        """Top-k по пулу или по подмножеству строк ``rows`` (в их порядке)."""
+
+        if rows is None:
+            rows = np.arange(len(candidates))
+        # Сортировка идёт по округлённому баллу, как и в скалярной версии.
+        rounded = np.array([round(value, 4) for value in breakdown.total[rows].tolist()])
+        results: list[RankedRecommendation] = []
+        for row in rows[top_k_stable(rounded, _TOP_K)].tolist():
+            results.append(
+                RankedRecommendation(
+                    identifier=candidates.identifiers[row],
+                    score=round(float(breakdown.total[row]), 4),
+                    rationale=[
+                        f"skills:{breakdown.skill[row]:.2f}",
+                        f"embedding:{breakdown.embedding[row]:.2f}",
+                        f"profile:{breakdown.profile[row]:.2f}",
+                        f"conversion:{breakdown.conversion[row]:.2f}",
+                        f"escrow:{breakdown.escrow[row]:.2f}",
+                        f"response:{breakdown.response[row]:.2f}",
+                        f"pricing:{breakdown.pricing[row]:.2f}",
+                    ],
+                )
+            )
+        return results
+
+    def _rank_profiles_scalar(
+        self, job: dict, profiles: list[dict], locale: str
+    ) -> tuple[list[RankedRecommendation], dict]:
         weights = self.settings.rank_weights
         job_skills = set(job.get("skills", []))
         job_vector = self._vectorize(job.get("description"))
@@ -139,17 +218,87 @@ class SmartMatcher:
             )
         results.sort(key=lambda item: item.score, reverse=True)
         audit = self.auditor.audit_distribution(results, lookup)
-        return results[:20], audit
+        return results[:_TOP_K], audit
+
+    def _candidate_rows(
+        self, job: dict[str, Any], positions: dict[int, int]
+    ) -> np.ndarray | None:
+        identifiers = job.get("candidate_ids")
+        if identifiers is None:
+            return None
+        # Порядок ``candidate_ids`` задаёт порядок при равных баллах, как в ``/match``.
+        rows = dict.fromkeys(
+            positions[identifier] for identifier in identifiers if identifier in positions
+        )
+        return np.asarray(list(rows), dtype=np.intp)
+
+    def match_batch(self, payload: dict[str, Any]) -> dict:
+        """Ранжирует общий пул кандидатов сразу для нескольких заказов.
+
+        Профили дедуплицируются по ``id``; ``candidate_ids`` у заказа сужает и
+        упорядочивает пул, поэтому результат совпадает с ``/match`` по этим профилям.
+        """
+
+        jobs = payload.get("jobs", [])
+        unique: dict[int, dict[str, Any]] = {}
+        for profile in payload.get("profiles", []):
+            unique.setdefault(profile["id"], profile)
+        profiles = list(unique.values())
+        for profile in profiles:
+            self.auditor.scrub(profile)
+        positions = {profile["id"]: row for row, profile in enumerate(profiles)}
+        locale = payload.get("locale", "ru")
+
+        results = []
+        if self.settings.vectorized_ranking and jobs and profiles:
+            counts = self._text_counts(
+                "profiles",
+                [profile["id"] for profile in profiles],
+                [profile_text(profile) for profile in profiles],
+            )
+            candidates = CandidateMatrix.from_profiles(profiles, counts=counts)
+            job_vectors = normalize_rows(
+                self.vectorizer.counts([job.get("description") for job in jobs])
+            )
+            breakdowns = candidates.score_jobs(jobs, job_vectors, self.settings.rank_weights)
+            for job, breakdown in zip(jobs, breakdowns):
+                ranked = self._top_recommendations(
+                    candidates, breakdown, self._candidate_rows(job, positions)
+                )
+                results.append((job, ranked, self.auditor.audit_distribution(ranked, unique)))
+        else:
+            for job in jobs:
+                rows = self._candidate_rows(job, positions)
+                pool = profiles if rows is None else [profiles[row] for row in rows.tolist()]
+                ranked, audit = self._rank_profiles_scalar(job, pool, locale)
+                results.append((job, ranked, audit))
+        return {
+            "results": [
+                {
+                    "job_id": job["id"],
+                    "invite_recommendations": [asdict(item) for item in ranked],
+                    "audit": audit,
+                }
+                for job, ranked, audit in results
+            ],
+            "source": "ai",
+        }
 
     def _rank_orders(self, freelancer: dict | None, orders: list[dict]) -> list[RankedRecommendation]:
         if not freelancer:
             return []
         freel_skills = set(freelancer.get("skills", []))
-        freelancer_vector = self._vectorize(freelancer.get("tldr") or freelancer.get("slug"))
+        freelancer_vector = self._vectorize(profile_text(freelancer))
+        order_counts = self._text_counts(
+            "orders",
+            [order["id"] for order in orders],
+            [order.get("description") for order in orders],
+        )
+        order_vectors = normalize_rows(order_counts).tolist()
         ranked: list[RankedRecommendation] = []
-        for order in orders:
+        for order, order_vector in zip(orders, order_vectors):
             skill_overlap = self._skill_score(freel_skills, set(order.get("skills", [])))
-            embedding = self._cosine(freelancer_vector, self._vectorize(order.get("description")))
+            embedding = self._cosine(freelancer_vector, order_vector)
             pricing = self._pricing_score(order, freelancer)
             score = 0.5 * skill_overlap + 0.3 * embedding + 0.2 * pricing
             ranked.append(
@@ -164,7 +313,7 @@ class SmartMatcher:
                 )
             )
         ranked.sort(key=lambda item: item.score, reverse=True)
-        return ranked[:20]
+        return ranked[:_TOP_K]
 
     def match(self, payload: dict[str, Any]) -> dict:
         locale = payload.get("locale", "ru")
@@ -175,8 +324,8 @@ class SmartMatcher:
         invite_ranked, audit = self._rank_profiles(job, profiles, locale) if job else ([], {})
         order_ranked = self._rank_orders(freelancer, orders)
         return {
-            "invite_recommendations": [item.__dict__ for item in invite_ranked],
-            "order_recommendations": [item.__dict__ for item in order_ranked],
+            "invite_recommendations": [asdict(item) for item in invite_ranked],
+            "order_recommendations": [asdict(item) for item in order_ranked],
             "audit": audit,
             "source": "ai",
         }
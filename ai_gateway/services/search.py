@@ -2,10 +2,21 @@
 
 from __future__ import annotations
 
-import math
-from typing import Iterable
+import json
+from pathlib import Path
+from threading import Lock
 
-from ..core.cache import TTLCache
+import numpy as np
+
+from ..core.cache import get_cache
+from ..core.config import get_settings
+from ..core.embedding_store import content_hash, get_embedding_store
+from ..core.vectorizer import HashingVectorizer
+from .ann import CatalogIndex
+from .scoring import normalize_rows, sequential_dot, top_k_stable
+
+_DIM = 64
+_EMBEDDING_TTL = 3600
 
 _SYNONYMS = {
     "dizayn": "design",
@@ -18,7 +29,19 @@ _SYNONYMS = {
 
 class SemanticSearchService:
     def __init__(self) -> None:
-        self._cache = TTLCache(ttl_seconds=3600)
+        self._settings = get_settings()
+        self._cache = get_cache()
+        self._store = get_embedding_store()
+        self._indexes: dict[str, CatalogIndex] = {}
+        self._indexes_lock = Lock()
+        # Словарь синонимов входит в сигнатуру: его правка инвалидирует сохранённые векторы.
+        synonyms_digest = content_hash(json.dumps(_SYNONYMS, sort_keys=True))[:8]
+        self._vectorizer = HashingVectorizer(
+            dim=_DIM,
+            tokenizer=self._normalize,
+            tokenizer_name=f"synonyms-{synonyms_digest}",
+            ngram_range=(1, self._settings.vectorizer_max_ngram),
+        )
 
     @staticmethod
     def _normalize(text: str) -> list[str]:
@@ -28,54 +51,111 @@ class SemanticSearchService:
         tokens = lowered.replace("'", " ").split()
         return [token.strip() for token in tokens if token.strip()]
 
-    @staticmethod
-    def _vectorize(tokens: Iterable[str], dim: int = 64) -> list[float]:
-        vector = [0.0] * dim
-        for token in tokens:
-            idx = hash(token) % dim
-            vector[idx] += 1.0
-        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
-        return [x / norm for x in vector]
-
     def _embedding(self, text: str) -> list[float]:
-        cache_key = f"emb:{hash(text)}"
+        cache_key = f"search:emb:{hash(text)}"
         cached = self._cache.get(cache_key)
         if cached is not None:
             return cached
-        tokens = self._normalize(text)
-        vector = self._vectorize(tokens)
-        self._cache[cache_key] = vector
+        vector = self._vectorizer.vectorize(text)
+        self._cache.set(cache_key, vector, ttl=_EMBEDDING_TTL)
         return vector
 
     @staticmethod
-    def _cosine(a: list[float], b: list[float]) -> float:
-        return sum(x * y for x, y in zip(a, b))
-
-    def search(self, *, query: str, documents: list[dict], limit: int) -> dict:
-        q_vector = self._embedding(query)
-        ranked: list[tuple[float, dict]] = []
-        for document in documents:
-            doc_text = " ".join(
-                filter(
-                    None,
-                    [
-                        document.get("title"),
-                        document.get("tldr"),
-                        document.get("body"),
-                    ],
-                )
+    def _document_text(document: dict) -> str:
+        return " ".join(
+            filter(
+                None,
+                [
+                    document.get("title"),
+                    document.get("tldr"),
+                    document.get("body"),
+                ],
             )
-            vector = self._embedding(doc_text)
-            score = self._cosine(q_vector, vector)
-            ranked.append((score, document))
-        ranked.sort(key=lambda item: item[0], reverse=True)
+        )
+
+    def _document_vectors(self, documents: list[dict], entity: str | None) -> np.ndarray:
+        texts = [self._document_text(document) for document in documents]
+        identifiers = [document.get("id") for document in documents]
+        if self._store is not None and entity and None not in identifiers:
+            space = self._store.space(f"search.{entity}", vectorizer=self._vectorizer)
+            return normalize_rows(space.resolve(identifiers, texts, self._vectorizer.counts))
+        if not texts:
+            return np.zeros((0, _DIM))
+        return np.asarray([self._embedding(text) for text in texts], dtype=np.float64)
+
+    def upsert_embeddings(self, entity: str, documents: list[dict]) -> int:
+        """Прогревает хранилище эмбеддингов; возвращает число обработанных документов."""
+
+        if self._store is None:
+            return 0
+        space = self._store.space(f"search.{entity}", vectorizer=self._vectorizer)
+        texts = [self._document_text(document) for document in documents]
+        space.resolve([document["id"] for document in documents], texts, self._vectorizer.counts)
+        return len(documents)
+
+    @staticmethod
+    def catalog_locale(locale: str | None) -> str:
+        return "uz" if (locale or "ru").lower().startswith("uz") else "ru"
+
+    def _catalog(self, entity: str, locale: str | None) -> CatalogIndex:
+        # TL;DR в документах зависит от языка, поэтому каталог у каждого свой.
+        name = f"{entity}.{self.catalog_locale(locale)}"
+        with self._indexes_lock:
+            index = self._indexes.get(name)
+            if index is None:
+                space = None
+                root = None
+                if self._store is not None:
+                    space = self._store.space(f"search.{name}", vectorizer=self._vectorizer)
+                    root = Path(self._settings.embedding_store_dir)
+                index = CatalogIndex(
+                    name,
+                    vectorizer=self._vectorizer,
+                    space=space,
+                    root=root,
+                    nprobe=self._settings.ann_nprobe,
+                    min_train=self._settings.ann_min_train,
+                )
+                self._indexes[name] = index
+            return index
+
+    def index_documents(self, entity: str, locale: str, documents: list[dict]) -> int:
+        """Добавляет или обновляет документы в ANN-индексе каталога."""
+
+        texts = [self._document_text(document) for document in documents]
+        return self._catalog(entity, locale).upsert(documents, texts)
+
+    def delete_documents(self, entity: str, locale: str, identifiers: list[str]) -> int:
+        return self._catalog(entity, locale).delete(identifiers)
+
+    def search_catalog(self, *, query: str, entity: str, locale: str, limit: int) -> dict:
+        """Поиск по всему проиндексированному каталогу сущности на языке запроса."""
+
+        q_vector = np.asarray(self._embedding(query), dtype=np.float64)
+        results = self._catalog(entity, locale).query(q_vector, limit)
+        fallback_needed = not results or results[0]["score"] < 0.1
+        return {"results": results, "fallback_triggered": fallback_needed}
+
+    def search(
+        self,
+        *,
+        query: str,
+        documents: list[dict],
+        limit: int,
+        entity: str | None = None,
+        locale: str = "ru",
+    ) -> dict:
+        if not documents and entity:
+            return self.search_catalog(query=query, entity=entity, locale=locale, limit=limit)
+        q_vector = np.asarray(self._embedding(query), dtype=np.float64)
+        scores = sequential_dot(self._document_vectors(documents, entity), q_vector)
         results = [
             {
-                "id": doc.get("id"),
-                "score": round(score, 4),
-                "snippet": (doc.get("tldr") or doc.get("body", ""))[:280],
+                "id": documents[row].get("id"),
+                "score": round(scores[row].item(), 4),
+                "snippet": (documents[row].get("tldr") or documents[row].get("body", ""))[:280],
             }
-            for score, doc in ranked[:limit]
+            for row in top_k_stable(scores, limit).tolist()
         ]
         fallback_needed = not results or results[0]["score"] < 0.1
         return {"results": results, "fallback_triggered": fallback_needed}
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 from textwrap import shorten
 
-from ..core.cache import TTLCache
+from ..core.cache import get_cache
+
+_TLDR_TTL = 60 * 60 * 6
 
 
 class TldrSummarizer:
     def __init__(self) -> None:
-        self._cache = TTLCache(ttl_seconds=60 * 60 * 6)
+        self._cache = get_cache()
 
     def _format(self, title: str, body: str, locale: str) -> str:
         base = f"{title.strip()}: {body.strip()}"
@@ -27,5 +29,5 @@ class TldrSummarizer:
         normalized = body.replace("\n", " ")
         truncated = shorten(normalized, width=200, placeholder="…")
         summary = self._format(title, truncated, locale)
-        self._cache[cache_key] = summary
+        self._cache.set(cache_key, summary, ttl=_TLDR_TTL)
         return summary
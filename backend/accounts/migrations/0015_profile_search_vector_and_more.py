@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+from django.db.models.functions import Lower
+
+# Снимок obsidian_backend.full_text на момент миграции: правки модуля не должны
+# менять то, что делает уже применённая миграция.
+UZ_SYNONYMS = {
+    "dizayn": "design",
+    "dizayner": "design",
+    "ishlab chiqish": "development",
+    "mobil": "mobile",
+    "veb": "web",
+}
+
+
+def _normalize_uz(field):
+    expression = Lower(F(field))
+    for source, target in UZ_SYNONYMS.items():
+        expression = Func(
+            expression,
+            Value(rf"\m{source}\M"),
+            Value(target),
+            Value("g"),
+            function="regexp_replace",
+            output_field=TextField(),
+        )
+    return expression
+
+
+def _search_vector(primary, secondary):
+    return (
+        SearchVector(primary, config="russian", weight="A")
+        + SearchVector(secondary, config="russian", weight="B")
+        + SearchVector(_normalize_uz(primary), config="simple", weight="A")
+        + SearchVector(_normalize_uz(secondary), config="simple", weight="B")
+    )
+
+
+def backfill_search_vectors(apps, schema_editor):
+    Profile = apps.get_model("accounts", "Profile")
+    Profile.objects.update(search_vector=_search_vector("headline", "bio"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0014_alter_auditevent_event_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="profile_search_vector_gin"),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -12,6 +12,7 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models, transaction
 from django.utils import timezone
 
@@ -247,13 +248,18 @@ class Profile(models.Model):
     is_completed = models.BooleanField(default=False)
     is_verified = models.BooleanField(default=False)
     last_activity_at = models.DateTimeField(null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Поля полнотекстового индекса: (вес A, вес B).
+    SEARCH_FIELDS = ("headline", "bio")
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             GinIndex(fields=["languages"], name="profile_languages_gin"),
+            GinIndex(fields=["search_vector"], name="profile_search_vector_gin"),
             models.Index(fields=["hourly_rate", "min_budget"], name="profile_rate_idx"),
             models.Index(fields=["is_verified", "visibility"], name="profile_verified_idx"),
             models.Index(fields=["last_activity_at"], name="profile_last_activity_idx"),
@@ -16,7 +16,7 @@ from google.oauth2 import id_token as google_id_token
 from rest_framework import serializers
 
 from marketplace.models import Skill
-from obsidian_backend.ai import tldr as tldr_cache
+from obsidian_backend.ai.serializers import TldrListSerializer, TldrSerializerMixin
 
 from .models import (
     AuditEvent,
@@ -731,7 +731,9 @@ class TwoFactorSetupSerializer(serializers.Serializer):
     otp_code = serializers.CharField(required=True)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TldrSerializerMixin, serializers.ModelSerializer):
+    tldr_entity = "profile"
+
     user = UserSerializer(read_only=True)
     skills = serializers.PrimaryKeyRelatedField(
         many=True, required=False, queryset=Skill.objects.none()
@@ -757,6 +759,7 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Profile
+        list_serializer_class = TldrListSerializer
         fields = (
             "id",
             "slug",
@@ -874,23 +877,6 @@ class ProfileSerializer(serializers.ModelSerializer):
             data["skill_details"] = []
         return data
 
-    def _resolve_locale(self) -> str:
-        request = self.context.get("request")
-        if request is not None:
-            header = request.headers.get("Accept-Language")
-            if header:
-                return header.split(",")[0].strip() or "ru"
-        return self.context.get("locale", "ru")
-
-    def get_tldr(self, instance: Profile) -> str | None:
-        locale = self._resolve_locale()
-        return tldr_cache.get_tldr(
-            entity="profile",
-            pk=instance.pk,
-            locale=locale,
-            fetcher=instance.get_tldr,
-        )
-
     def get_wallet(self, instance: Profile):
         wallet: Wallet | None = getattr(instance, "wallet", None)
         if wallet is None:
@@ -1,6 +1,8 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from obsidian_backend.full_text import refresh_search_vector
+
 from .models import Profile, Wallet
 
 
@@ -10,3 +12,12 @@ def ensure_wallet_for_profile(sender, instance: Profile, created: bool, **_: obj
 
     if created:
         Wallet.objects.get_or_create(profile=instance)
+
+
+@receiver(post_save, sender=Profile)
+def update_profile_search_vector(
+    sender, instance: Profile, update_fields=None, **_: object
+) -> None:
+    """Keep the full-text vector in sync with headline and bio."""
+
+    refresh_search_vector(instance, update_fields)
@@ -4,19 +4,22 @@ from decimal import Decimal
 import re
 
 from django.core import mail
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 
 from marketplace.models import Category, Order, Skill
 
 from obsidian_backend import jwt_settings as jwt_conf
+from obsidian_backend.rate_limit import Limit, check_limits
 
 from .models import PendingRegistration, Profile, User, VerificationRequest
 from .serializers import RegistrationStartSerializer
+from .throttling import EndpointIPRateThrottle
 
 
 class ProfileSerializerTests(APITestCase):
@@ -375,3 +378,31 @@ class VerificationRequestViewSetTests(APITestCase):
         self.assertEqual(verification.status, VerificationRequest.STATUS_APPROVED)
         self.assertEqual(verification.reviewed_by, admin_user)
         self.assertTrue(verification.profile.is_verified)
+
+
+class EndpointRateThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_ip_throttle_allows_burst_then_reports_wait(self):
+        view = type("LoginView", (), {"throttle_scope": "login"})()
+        request = APIRequestFactory().post("/api/accounts/login/", REMOTE_ADDR="10.0.0.1")
+        results = [EndpointIPRateThrottle().allow_request(request, view) for _ in range(10)]
+        self.assertTrue(all(results))
+        throttle = EndpointIPRateThrottle()
+        self.assertFalse(throttle.allow_request(request, view))
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), 6)
+
+    def test_denied_request_is_not_counted_against_other_limits(self):
+        limits = [Limit("test:sec", 5, 1), Limit("test:min", 2, 60)]
+        self.assertTrue(check_limits(limits).allowed)
+        self.assertTrue(check_limits(limits).allowed)
+        denied = check_limits(limits)
+        self.assertFalse(denied.allowed)
+        self.assertGreater(denied.retry_after, 20)
+        # Отказ по минутному лимиту не израсходовал секундный.
+        self.assertTrue(check_limits([Limit("test:sec", 5, 1)]).allowed)
+        self.assertTrue(check_limits([Limit("test:sec", 5, 1)]).allowed)
+        self.assertTrue(check_limits([Limit("test:sec", 5, 1)]).allowed)
+        self.assertFalse(check_limits([Limit("test:sec", 5, 1)]).allowed)
@@ -6,9 +6,16 @@ import re
 
 from rest_framework.throttling import SimpleRateThrottle
 
+from obsidian_backend.rate_limit import Limit, check_limits
+
 
 class EndpointRateThrottle(SimpleRateThrottle):
-    """Base class for throttles that respect per-endpoint scopes."""
+    """Base class for throttles that respect per-endpoint scopes.
+
+    Requests are counted by :mod:`obsidian_backend.rate_limit` (GCRA, one
+    atomic cache round-trip) instead of ``SimpleRateThrottle``'s list of
+    request timestamps per key.
+    """
 
     category_suffix = "generic"
 
@@ -17,10 +24,9 @@ class EndpointRateThrottle(SimpleRateThrottle):
         # which requires the ``scope`` attribute to be set. Our throttles
         # determine the scope dynamically per view, so we defer rate
         # resolution until the request cycle.
-        self.history = None
-        self.now = None
         self.num_requests = None
         self.duration = None
+        self.retry_after = None
 
     def allow_request(self, request, view):  # pragma: no cover - framework hook
         scope = getattr(view, "throttle_scope", None)
@@ -28,14 +34,19 @@ class EndpointRateThrottle(SimpleRateThrottle):
             return True
 
         self.scope = f"{scope}_{self.category_suffix}"
-        rate = self.get_rate()
-        # ``SimpleRateThrottle.allow_request`` expects ``self.rate`` to be set.
-        # ``get_rate`` defers to the scope we've just constructed, so store the
-        # resolved value before delegating to the parent implementation.
-        self.rate = rate
-        self.num_requests, self.duration = self.parse_rate(rate)
-
-        return super().allow_request(request, view)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        result = check_limits([Limit(key, self.num_requests, self.duration)])
+        self.retry_after = result.retry_after
+        return result.allowed
+
+    def wait(self):  # pragma: no cover - framework hook
+        return self.retry_after or None
 
     def get_cache_key(self, request, view):  # pragma: no cover - framework hook
         scope = getattr(view, "throttle_scope", None)
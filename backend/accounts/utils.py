@@ -31,3 +31,28 @@ def create_notification(
         channels=channels,
     )
     return emitted.event
+
+
+def create_notifications(
+    profiles: Sequence[Profile],
+    *,
+    title: str,
+    message: str,
+    category: str = NotificationEvent.CATEGORY_ACCOUNT,
+    event_type: str = NotificationEvent.EventType.ACCOUNT_GENERIC,
+    data: Mapping[str, Any] | None = None,
+    channels: Sequence[str] | None = None,
+) -> list[NotificationEvent]:
+    """Same as :func:`create_notification` for many profiles in one batch."""
+
+    emitted = notification_hub.emit_many(
+        recipients=[profile.user for profile in profiles],
+        profiles={profile.user_id: profile for profile in profiles},
+        title=title,
+        body=message,
+        category=category,
+        event_type=event_type,
+        data=data or {},
+        channels=channels,
+    )
+    return [item.event for item in emitted]
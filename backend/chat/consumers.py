@@ -1,20 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import time
+
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.conf import settings
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 
+from accounts.models import Profile
 from marketplace.models import Contract
 
+from . import presence
 from .exceptions import ChatBlockedError, ChatRateLimitError
-from .models import ChatMessage, ChatThread
-from .serializers import ChatMessageSerializer
-from .services import create_message, get_thread_for_user
+from .models import ChatEvent, ChatMessage, ChatThread
+from .services import (
+    SendContext,
+    get_thread_for_user,
+    load_send_context,
+    send_message,
+    thread_group_name,
+)
 
 
 class ContractChatConsumer(AsyncJsonWebsocketConsumer):
+    # Отдельный слой: свои ёмкость, сроки жизни групп и шардирование в Redis.
+    channel_layer_alias = "chat"
     thread_id: int | None = None
+    _presence_task: asyncio.Task | None = None
+    # Блокировка треда и ограничения отправителя; сбрасывается событием модерации.
+    _send_context: SendContext | None = None
+    _typing_state: str | None = None
+    _typing_sent_at: float = 0.0
 
     async def connect(self):
         user = self.scope.get("user")
@@ -34,32 +51,47 @@ class ContractChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close(code=4403)
             return
         self.thread_id = thread.id
-        self.group_name = f"chat.thread.{thread.id}"
+        self.group_name = thread_group_name(thread.id)
+        # Собеседники, чей статус показываем; сам пользователь и staff не входят.
+        self._peer_ids, self._send_context = await database_sync_to_async(
+            self._connection_state
+        )(thread, user)
+        self._peer_ids.discard(user.id)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
         if settings.CHAT_PRESENCE_ENABLED:
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "chat.presence",
-                    "user_id": user.id,
-                    "status": "online",
-                },
-            )
+            await presence.mark_online(self.thread_id, user.id)
+            self._online_peers = await presence.online_users(self.thread_id, self._peer_ids)
+            self._presence_task = asyncio.create_task(self._presence_loop())
 
     async def disconnect(self, code):
         user = self.scope.get("user")
+        if self._presence_task is not None:
+            self._presence_task.cancel()
         if self.thread_id:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
             if settings.CHAT_PRESENCE_ENABLED and user and user.is_authenticated:
-                await self.channel_layer.group_send(
-                    self.group_name,
+                await presence.mark_leaving(self.thread_id, user.id)
+
+    async def _presence_loop(self):
+        """Heartbeat своего статуса и рассылка изменений статусов собеседников."""
+
+        user_id = self.scope["user"].id
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_INTERVAL_SECONDS)
+            await presence.mark_online(self.thread_id, user_id)
+            online = await presence.online_users(self.thread_id, self._peer_ids)
+            for peer_id in sorted(online ^ self._online_peers):
+                await self.send_json(
                     {
-                        "type": "chat.presence",
-                        "user_id": user.id,
-                        "status": "offline",
-                    },
+                        "type": "presence",
+                        "payload": {
+                            "user_id": peer_id,
+                            "status": "online" if peer_id in online else "offline",
+                        },
+                    }
                 )
+            self._online_peers = online
 
     async def receive_json(self, content, **kwargs):
         action = content.get("action")
@@ -70,24 +102,50 @@ class ContractChatConsumer(AsyncJsonWebsocketConsumer):
         elif action == "mark_read":
             await self._handle_status(content, ChatMessage.STATUS_READ)
         elif action == "typing" and settings.CHAT_PRESENCE_ENABLED:
-            await self.channel_layer.group_send(
-                self.group_name,
+            await self._handle_typing(content.get("state", "typing"))
+        elif action == "presence_snapshot" and settings.CHAT_PRESENCE_ENABLED:
+            online = await presence.online_users(self.thread_id, self._peer_ids)
+            self._online_peers = online
+            await self.send_json(
                 {
-                    "type": "chat.typing",
-                    "user_id": self.scope["user"].id,
-                    "state": content.get("state", "typing"),
-                },
+                    "type": "presence_snapshot",
+                    "payload": {
+                        "online": sorted(online),
+                        "offline": sorted(self._peer_ids - online),
+                    },
+                }
             )
         else:  # pragma: no cover - unknown action fallback
             await self.send_json({"error": "unknown_action"})
 
+    async def _handle_typing(self, state: str) -> None:
+        # Повтор того же состояния в пределах окна не рассылаем: клиенты шлют
+        # typing на каждое нажатие клавиши.
+        now = time.monotonic()
+        if (
+            state == self._typing_state
+            and now - self._typing_sent_at < settings.CHAT_TYPING_DEBOUNCE_SECONDS
+        ):
+            return
+        self._typing_state = state
+        self._typing_sent_at = now
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                "type": "chat.typing",
+                "user_id": self.scope["user"].id,
+                "state": state,
+            },
+        )
+
     async def _handle_send(self, content):
         payload = content.get("payload") or content
         attachments = payload.get("attachments") or []
         body = payload.get("body", "")
         action_type = payload.get("action")
         try:
-            message = await database_sync_to_async(self._create_message)(
+            # Проверки, запись и сборка payload — один переход в синхронный поток.
+            event = await database_sync_to_async(self._send_message)(
                 body=body,
                 attachments=attachments,
                 action=action_type,
@@ -98,68 +156,82 @@ class ContractChatConsumer(AsyncJsonWebsocketConsumer):
         except ChatBlockedError as exc:
             await self.send_json({"type": "error", "code": "blocked", "detail": str(exc)})
             return
-        payload = await database_sync_to_async(self._serialize_message)(message)
+        except ValidationError as exc:
+            await self.send_json(
+                {"type": "error", "code": "invalid", "detail": " ".join(exc.messages)}
+            )
+            return
+        # Отправка сообщения завершает набор: следующий typing уйдёт сразу.
+        self._typing_state = None
         await self.channel_layer.group_send(
             self.group_name,
-            {"type": "chat.message", "payload": payload},
+            {"type": "chat.message", "seq": event.seq, "payload": event.payload},
         )
 
     async def _handle_status(self, content, status_value: str):
         message_id = content.get("message_id")
         if not message_id:
             return
-        await database_sync_to_async(self._apply_status)(message_id, status_value)
+        event = await database_sync_to_async(self._apply_status)(message_id, status_value)
+        if event is None:
+            return
         await self.channel_layer.group_send(
             self.group_name,
-            {
-                "type": "chat.status",
-                "payload": {
-                    "id": message_id,
-                    "status": status_value,
-                },
-            },
+            {"type": "chat.status", "seq": event.seq, "payload": event.payload},
         )
 
-    def _create_message(self, *, body: str, attachments: list[str], action: str | None):
+    def _send_message(
+        self, *, body: str, attachments: list[str], action: str | None
+    ) -> ChatEvent:
         if not self.thread_id:
             raise PermissionDenied
-        thread = ChatThread.objects.get(pk=self.thread_id)
-        return create_message(
-            thread=thread,
-            sender=self.scope["user"],
+        user = self.scope["user"]
+        if self._send_context is None:
+            thread = ChatThread.objects.get(pk=self.thread_id)
+            self._send_context = load_send_context(thread=thread, user=user)
+        _, event = send_message(
+            context=self._send_context,
+            sender=user,
             body=body,
             attachment_ids=attachments,
             action=action,
         )
+        return event
+
+    @staticmethod
+    def _connection_state(thread: ChatThread, user) -> tuple[set[int], SendContext]:
+        peer_ids = set(
+            Profile.objects.filter(
+                pk__in=[thread.client_id, thread.freelancer_id]
+            ).values_list("user_id", flat=True)
+        )
+        return peer_ids, load_send_context(thread=thread, user=user)
 
-    def _apply_status(self, message_id: int, status_value: str) -> None:
+    def _apply_status(self, message_id: int, status_value: str) -> ChatEvent | None:
         if not self.thread_id:
             raise PermissionDenied
         try:
             message = ChatMessage.objects.get(pk=message_id, thread_id=self.thread_id)
         except ChatMessage.DoesNotExist:
-            return
-        message.apply_status(status_value)
-
-    def _serialize_message(self, message: ChatMessage) -> dict:
-        serializer = ChatMessageSerializer(message)
-        return serializer.data
+            return None
+        return message.apply_status(status_value)
 
     async def chat_message(self, event):
         payload = event["payload"]
         if not self._can_view_payload(payload):
             return
-        await self.send_json({"type": "message", "payload": payload})
+        await self.send_json({"type": "message", "seq": event["seq"], "payload": payload})
 
     async def chat_status(self, event):
-        await self.send_json({"type": "status", "payload": event["payload"]})
-
-    async def chat_presence(self, event):
-        await self.send_json({"type": "presence", "payload": event})
+        await self.send_json({"type": "status", "seq": event["seq"], "payload": event["payload"]})
 
     async def chat_typing(self, event):
         await self.send_json({"type": "typing", "payload": event})
 
+    async def chat_moderation(self, event):
+        # Ограничения или блокировка треда изменились: перечитаем при следующей отправке.
+        self._send_context = None
+
     def _can_view_payload(self, payload: dict) -> bool:
         if not payload.get("is_shadow_blocked"):
             return True
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_alter_chatattachment_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatthread",
+            name="last_event_seq",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="ChatEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("seq", models.PositiveBigIntegerField()),
+                ("event_type", models.CharField(choices=[("message", "Message"), ("status", "Status"), ("hidden", "Hidden")], max_length=16)),
+                ("payload", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("message", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="events", to="chat.chatmessage")),
+                ("thread", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="events", to="chat.chatthread")),
+            ],
+            options={
+                "ordering": ("thread", "seq"),
+                "constraints": [models.UniqueConstraint(fields=("thread", "seq"), name="chat_event_thread_seq_uniq")],
+            },
+        ),
+    ]
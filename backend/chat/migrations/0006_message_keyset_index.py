@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_event_log"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["thread", "sent_at", "id"], include=("is_deleted", "is_hidden", "is_shadow_blocked", "sender"), name="chat_msg_thread_keyset_idx"),
+        ),
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="chat_chatme_thread__d53411_idx",
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+def mark_existing_clean(apps, schema_editor):
+    # Всё загруженное до карантина уже прошло синхронную проверку при загрузке.
+    ChatAttachment = apps.get_model("chat", "ChatAttachment")
+    ChatAttachment.objects.exclude(file="").update(scan_status="clean")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_message_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatattachment",
+            name="scan_status",
+            field=models.CharField(choices=[("pending_scan", "Pending scan"), ("clean", "Clean"), ("rejected", "Rejected")], default="pending_scan", max_length=16),
+        ),
+        migrations.RunPython(mark_existing_clean, migrations.RunPython.noop),
+    ]
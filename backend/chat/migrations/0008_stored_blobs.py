@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0007_scan_status"),
+        ("uploads", "0004_stored_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatattachment",
+            name="blob",
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="chat_attachments", to="uploads.storedblob"),
+        ),
+    ]
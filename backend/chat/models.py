@@ -6,14 +6,24 @@ import uuid
 from datetime import timedelta
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 from marketplace.models import Contract
+from uploads.models import FileNotScannedError, ScanStatus, StoredBlob
 from uploads.storage import private_storage
 
+from .payloads import hidden_payload, status_payload
+
 _LINK_PATTERN = re.compile(r"https?://", re.IGNORECASE)
+_EVENT_HEAD_KEY = "chat:events:{thread_id}:head"
+_EVENT_HEAD_TTL = 60 * 60
+
+
+def event_head_key(thread_id: int) -> str:
+    return _EVENT_HEAD_KEY.format(thread_id=thread_id)
 
 
 class ChatThread(models.Model):
@@ -46,6 +56,8 @@ class ChatThread(models.Model):
         on_delete=models.SET_NULL,
         related_name="blocked_threads",
     )
+    # Номер последнего события журнала ``ChatEvent`` этого треда.
+    last_event_seq = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         ordering = ("-last_message_at", "-updated_at")
@@ -150,7 +162,13 @@ class ChatMessage(models.Model):
     class Meta:
         ordering = ("sent_at", "pk")
         indexes = [
-            models.Index(fields=["thread", "sent_at"]),
+            # Ключ keyset-пагинации ленты; флаги видимости и отправитель лежат
+            # в листьях индекса, и фильтр ``visible_for_user`` не ходит в таблицу.
+            models.Index(
+                fields=["thread", "sent_at", "id"],
+                include=["is_deleted", "is_hidden", "is_shadow_blocked", "sender"],
+                name="chat_msg_thread_keyset_idx",
+            ),
             models.Index(fields=["thread", "status"]),
             models.Index(fields=["contains_link"]),
             models.Index(fields=["has_attachments"]),
@@ -159,9 +177,12 @@ class ChatMessage(models.Model):
     def __str__(self) -> str:  # pragma: no cover - debugging helper
         return f"ChatMessage<{self.pk}>"
 
-    def apply_status(self, status: str) -> None:
+    def apply_status(self, status: str) -> ChatEvent | None:
+        """Обновить статус; вернуть событие журнала или ``None``, если ничего не изменилось."""
+
         if status not in {self.STATUS_SENT, self.STATUS_DELIVERED, self.STATUS_READ}:
             raise ValidationError("Unknown chat message status")
+        before = (self.status, self.delivered_at, self.read_at)
         now = timezone.now()
         if status == self.STATUS_DELIVERED and self.delivered_at is None:
             self.status = status
@@ -171,7 +192,16 @@ class ChatMessage(models.Model):
             if self.delivered_at is None:
                 self.delivered_at = now
             self.read_at = now if self.read_at is None else self.read_at
-        self.save(update_fields=["status", "delivered_at", "read_at", "updated_at"])
+        if (self.status, self.delivered_at, self.read_at) == before:
+            return None
+        with transaction.atomic():
+            self.save(update_fields=["status", "delivered_at", "read_at", "updated_at"])
+            return ChatEvent.objects.append(
+                thread_id=self.thread_id,
+                message=self,
+                event_type=ChatEvent.TYPE_STATUS,
+                payload=status_payload(self),
+            )
 
     def soft_delete(self, *, by_user=None, reason: str = "") -> None:
         if self.is_deleted:
@@ -180,20 +210,32 @@ class ChatMessage(models.Model):
         self.deleted_at = timezone.now()
         self.hidden_reason = reason or self.hidden_reason
         self.hidden_by = by_user or self.hidden_by
-        self.save(update_fields=["is_deleted", "deleted_at", "hidden_reason", "hidden_by", "updated_at"])
+        with transaction.atomic():
+            self.save(update_fields=["is_deleted", "deleted_at", "hidden_reason", "hidden_by", "updated_at"])
+            self._append_hidden_event()
 
     def hide(self, *, by_user, reason: str) -> None:
         self.is_hidden = True
         self.hidden_by = by_user
         self.hidden_reason = reason
         self.hidden_at = timezone.now()
-        self.save(update_fields=[
-            "is_hidden",
-            "hidden_by",
-            "hidden_reason",
-            "hidden_at",
-            "updated_at",
-        ])
+        with transaction.atomic():
+            self.save(update_fields=[
+                "is_hidden",
+                "hidden_by",
+                "hidden_reason",
+                "hidden_at",
+                "updated_at",
+            ])
+            self._append_hidden_event()
+
+    def _append_hidden_event(self) -> None:
+        ChatEvent.objects.append(
+            thread_id=self.thread_id,
+            message=self,
+            event_type=ChatEvent.TYPE_HIDDEN,
+            payload=hidden_payload(self),
+        )
 
     @property
     def tag_labels(self) -> list[str]:
@@ -207,6 +249,110 @@ class ChatMessage(models.Model):
         return tags
 
 
+class ChatEventQuerySet(models.QuerySet):
+    def visible_for_user(self, user):
+        """События, которые клиент пользователя может показать.
+
+        Повторяет ``ChatMessage.visible_for_user`` и, как WebSocket, отдаёт
+        shadow-blocked сообщения только отправителю. События скрытия видны
+        всем участникам: по ним клиент убирает сообщение из ленты.
+        """
+
+        if getattr(user, "is_staff", False) or getattr(user, "is_superuser", False):
+            return self
+        if not getattr(user, "is_authenticated", False):
+            return self.none()
+        return self.filter(
+            models.Q(event_type=ChatEvent.TYPE_HIDDEN)
+            | models.Q(
+                message__is_deleted=False,
+                message__is_hidden=False,
+                message__is_shadow_blocked=False,
+            )
+            | (
+                models.Q(message__sender=user, message__is_deleted=False)
+                & (
+                    models.Q(message__is_hidden=False)
+                    | models.Q(message__is_shadow_blocked=True)
+                )
+            )
+        )
+
+
+class ChatEventManager(models.Manager.from_queryset(ChatEventQuerySet)):
+    def append(
+        self,
+        *,
+        thread_id: int,
+        message: ChatMessage,
+        event_type: str,
+        payload: dict,
+        last_message_at=None,
+    ) -> ChatEvent:
+        """Записать событие со следующим номером треда.
+
+        Номер выдаёт ``UPDATE`` счётчика в строке треда; её блокировка держится
+        до коммита, поэтому события треда становятся видны строго в порядке
+        номеров и читатель с курсором ничего не пропускает.
+        """
+
+        updates = {"last_event_seq": models.F("last_event_seq") + 1}
+        if last_message_at is not None:
+            updates.update(last_message_at=last_message_at, updated_at=last_message_at)
+        thread = ChatThread.objects.filter(pk=thread_id)
+        with transaction.atomic(savepoint=False):
+            thread.update(**updates)
+            # Строка уже заблокирована нашим UPDATE: перечитываем свой номер.
+            seq = thread.values_list("last_event_seq", flat=True).get()
+            event = self.create(
+                thread_id=thread_id,
+                seq=seq,
+                message=message,
+                event_type=event_type,
+                payload=payload,
+            )
+        # Подсказка для long-poll: ждущие запросы сверяют её вместо базы.
+        transaction.on_commit(
+            lambda: cache.set(event_head_key(thread_id), seq, _EVENT_HEAD_TTL)
+        )
+        return event
+
+
+class ChatEvent(models.Model):
+    """Журнал изменений треда только на добавление с монотонным ``seq``."""
+
+    TYPE_MESSAGE = "message"
+    TYPE_STATUS = "status"
+    TYPE_HIDDEN = "hidden"
+
+    TYPE_CHOICES = [
+        (TYPE_MESSAGE, "Message"),
+        (TYPE_STATUS, "Status"),
+        (TYPE_HIDDEN, "Hidden"),
+    ]
+
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="events")
+    seq = models.PositiveBigIntegerField()
+    event_type = models.CharField(max_length=16, choices=TYPE_CHOICES)
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name="events")
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChatEventManager()
+
+    class Meta:
+        ordering = ("thread", "seq")
+        constraints = [
+            models.UniqueConstraint(fields=["thread", "seq"], name="chat_event_thread_seq_uniq"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - debugging helper
+        return f"ChatEvent<{self.thread_id}:{self.seq}>"
+
+    def as_envelope(self) -> dict:
+        return {"type": self.event_type, "seq": self.seq, "payload": self.payload}
+
+
 class ChatAttachment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="attachments")
@@ -227,10 +373,22 @@ class ChatAttachment(models.Model):
         upload_to="chat/attachments/%Y/%m/%d",
         max_length=512,
     )
+    blob = models.ForeignKey(
+        StoredBlob,
+        on_delete=models.PROTECT,
+        related_name="chat_attachments",
+        null=True,
+        blank=True,
+    )
     original_name = models.CharField(max_length=255)
     mime_type = models.CharField(max_length=64)
     size = models.PositiveBigIntegerField()
     checksum = models.CharField(max_length=64)
+    scan_status = models.CharField(
+        max_length=16,
+        choices=ScanStatus.choices,
+        default=ScanStatus.PENDING,
+    )
     scanned_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -245,15 +403,26 @@ class ChatAttachment(models.Model):
     def __str__(self) -> str:  # pragma: no cover - debugging helper
         return f"ChatAttachment<{self.pk}>"
 
+    @property
+    def is_scanned(self) -> bool:
+        return self.scan_status == ScanStatus.CLEAN
+
     def mark_scanned(self) -> None:
+        self.scan_status = ScanStatus.CLEAN
         self.scanned_at = timezone.now()
-        self.save(update_fields=["scanned_at", "updated_at"])
+        self.save(update_fields=["scan_status", "scanned_at", "updated_at"])
+
+    def mark_scan_rejected(self) -> None:
+        self.scan_status = ScanStatus.REJECTED
+        self.save(update_fields=["scan_status", "updated_at"])
 
     def attach_to_message(self, message: ChatMessage) -> None:
         self.message = message
         self.save(update_fields=["message", "updated_at"])
 
     def build_presigned_link(self, *, ttl_seconds: int = 300) -> "ChatAttachmentLink":
+        if not self.is_scanned:
+            raise FileNotScannedError(f"Attachment {self.pk} has not passed scanning")
         link = ChatAttachmentLink(attachment=self)
         link.save(expires_in=ttl_seconds)
         return link
@@ -0,0 +1,62 @@
+"""Сборка JSON-конвертов чата без обхода полей DRF.
+
+Одни и те же словари уходят в WebSocket-группу и сохраняются в журнал
+``ChatEvent``, поэтому оба транспорта отдают клиенту одинаковые данные.
+Модуль не импортирует модели: его используют и ``models``, и ``services``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from rest_framework import serializers
+
+if TYPE_CHECKING:  # pragma: no cover - только для аннотаций
+    from .models import ChatAttachment, ChatMessage
+
+_DATETIME = serializers.DateTimeField()
+
+
+def message_payload(message: ChatMessage, attachments: Iterable[ChatAttachment]) -> dict:
+    """То же, что ``ChatMessageSerializer(message).data``, из уже загруженных объектов."""
+
+    datetime_repr = _DATETIME.to_representation
+    return {
+        "id": message.id,
+        "thread_id": message.thread_id,
+        "sender_id": message.sender_id,
+        "body": message.body,
+        "status": message.status,
+        "sent_at": datetime_repr(message.sent_at),
+        "delivered_at": datetime_repr(message.delivered_at),
+        "read_at": datetime_repr(message.read_at),
+        "action": message.action,
+        "tags": message.tag_labels,
+        "attachments": [
+            {
+                "id": str(attachment.id),
+                "original_name": attachment.original_name,
+                "mime_type": attachment.mime_type,
+                "size": attachment.size,
+                "scan_status": attachment.scan_status,
+                "created_at": datetime_repr(attachment.created_at),
+            }
+            for attachment in attachments
+        ],
+        "is_shadow_blocked": message.is_shadow_blocked,
+    }
+
+
+def status_payload(message: ChatMessage) -> dict:
+    datetime_repr = _DATETIME.to_representation
+    return {
+        "id": message.id,
+        "status": message.status,
+        "delivered_at": datetime_repr(message.delivered_at),
+        "read_at": datetime_repr(message.read_at),
+    }
+
+
+def hidden_payload(message: ChatMessage) -> dict:
+    return {"id": message.id}
@@ -0,0 +1,43 @@
+"""Онлайн-статус участников треда в общем кеше.
+
+Каждое подключение раз в ``CHAT_PRESENCE_INTERVAL_SECONDS`` продлевает ключ
+``chat:presence:{thread_id}:{user_id}`` и сверяет статусы собеседников. Изменения
+consumer отправляет только в свой сокет, поэтому presence не нагружает channel
+layer. При отключении ключ не удаляется, а доживает короткий grace-период:
+если у пользователя открыта другая вкладка, её heartbeat успеет продлить ключ,
+и собеседник не увидит ложного «оффлайн».
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+_KEY = "chat:presence:{thread_id}:{user_id}"
+
+
+def _key(thread_id: int, user_id: int) -> str:
+    return _KEY.format(thread_id=thread_id, user_id=user_id)
+
+
+def _ttl() -> int:
+    # Пропущенные два heartbeat'а подряд — сокет считается потерянным.
+    return settings.CHAT_PRESENCE_INTERVAL_SECONDS * 3
+
+
+async def mark_online(thread_id: int, user_id: int) -> None:
+    await cache.aset(_key(thread_id, user_id), 1, _ttl())
+
+
+async def mark_leaving(thread_id: int, user_id: int) -> None:
+    await cache.aset(
+        _key(thread_id, user_id), 1, settings.CHAT_PRESENCE_INTERVAL_SECONDS + 1
+    )
+
+
+async def online_users(thread_id: int, user_ids: Iterable[int]) -> set[int]:
+    keys = {_key(thread_id, user_id): user_id for user_id in user_ids}
+    found = await cache.aget_many(list(keys))
+    return {keys[key] for key in found}
@@ -3,6 +3,8 @@ from __future__ import annotations
 from django.urls import reverse
 from rest_framework import serializers
 
+from uploads.models import FileNotScannedError
+
 from .models import ChatAttachment, ChatMessage, ChatThread
 from .services import QUICK_ACTIONS, create_message, store_attachment
 
@@ -15,6 +17,7 @@ class ChatAttachmentSerializer(serializers.ModelSerializer):
             "original_name",
             "mime_type",
             "size",
+            "scan_status",
             "created_at",
         ]
         read_only_fields = fields
@@ -117,7 +120,10 @@ class ChatAttachmentPresignSerializer(serializers.Serializer):
     def create(self, validated_data):
         attachment = self.context["attachment"]
         ttl = validated_data.get("ttl", 300)
-        link = attachment.build_presigned_link(ttl_seconds=ttl)
+        try:
+            link = attachment.build_presigned_link(ttl_seconds=ttl)
+        except FileNotScannedError as exc:
+            raise serializers.ValidationError("Вложение ещё проходит проверку") from exc
         download_path = reverse(
             "chat-attachment-download",
             kwargs={"attachment_id": attachment.id},
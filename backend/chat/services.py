@@ -1,26 +1,44 @@
 from __future__ import annotations
 
-import hashlib
+import time
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Iterable, Sequence
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
 from django.utils import timezone
 
 from accounts import rbac
 from marketplace.models import Contract
-from uploads.scanner import scan_bytes
-from uploads.validators import detect_mime_type, scrub_exif_if_image
+from obsidian_backend.rate_limit import Limit, check_limits
+from uploads.ingest import ingest_upload, persist_upload
+from uploads.validators import FileTooLargeError, FileValidationError
 
-from moderation.services import apply_red_flag_detection, enforce_chat_safety
+from moderation.models import ChatParticipantRestriction
+from moderation.services import (
+    active_chat_restrictions,
+    apply_red_flag_detection,
+    enforce_chat_safety,
+    resolve_restrictions,
+)
 
 from .exceptions import ChatBlockedError, ChatRateLimitError
-from .models import ChatAttachment, ChatMessage, ChatThread, profile_id_matches, _LINK_PATTERN
+from .models import (
+    ChatAttachment,
+    ChatEvent,
+    ChatMessage,
+    ChatThread,
+    event_head_key,
+    profile_id_matches,
+    _LINK_PATTERN,
+)
+from .payloads import message_payload
 
 CHAT_ATTACHMENT_MAX_BYTES = 15 * 1024 * 1024
 CHAT_ATTACHMENT_ALLOWED_MIME_TYPES = {
@@ -36,6 +54,9 @@ QUICK_ACTIONS = {
     "open_dispute": "Открыть спор",
 }
 
+# Как часто long-poll сверяет голову журнала с базой, а не только с кешем.
+_HEAD_DB_CHECK_EVERY = 4
+
 
 @dataclass(frozen=True)
 class AttachmentUploadResult:
@@ -84,25 +105,74 @@ def get_thread_for_user(*, contract_id: int, user) -> ChatThread:
     return thread
 
 
+def thread_group_name(thread_id: int) -> str:
+    return f"chat.thread.{thread_id}"
+
+
+def notify_moderation_changed(thread_id: int) -> None:
+    """После коммита попросить открытые соединения треда перечитать ограничения."""
+
+    layer = get_channel_layer("chat")
+    if layer is None:
+        return
+    transaction.on_commit(
+        lambda: async_to_sync(layer.group_send)(
+            thread_group_name(thread_id), {"type": "chat.moderation"}
+        )
+    )
+
+
+@dataclass
+class SendContext:
+    """Блокировка треда и ограничения отправителя, закешированные на соединение.
+
+    Consumer держит контекст между сообщениями и сбрасывает его по событию
+    ``chat.moderation``; сроки действия ограничений проверяются при каждой
+    отправке, поэтому истечение бана не требует уведомления.
+    """
+
+    thread_id: int
+    blocked_until: datetime | None
+    blocked_reason: str
+    restrictions: list[ChatParticipantRestriction]
+
+    def check(self) -> bool:
+        """Поднять ``ChatBlockedError``, если отправка запрещена; вернуть признак shadow ban."""
+
+        if self.blocked_until and self.blocked_until > timezone.now():
+            raise ChatBlockedError(self.blocked_reason or "Отправка сообщений временно недоступна")
+        state = resolve_restrictions(self.restrictions)
+        if state.blocked:
+            raise ChatBlockedError(state.reason or "Отправка сообщений недоступна")
+        return state.shadow_banned
+
+
+def load_send_context(*, thread: ChatThread, user) -> SendContext:
+    profile = getattr(user, "profile", None)
+    return SendContext(
+        thread_id=thread.id,
+        blocked_until=thread.blocked_until,
+        blocked_reason=thread.blocked_reason,
+        restrictions=active_chat_restrictions(
+            thread_id=thread.id,
+            profile_id=profile.id if profile else None,
+        ),
+    )
+
+
 def enforce_message_rate_limits(*, user_id: int, thread_id: int) -> None:
-    now = timezone.now()
-    limits = [
-        (settings.CHAT_RATE_LIMIT_USER_PER_SECOND, 1, f"chat:user:{user_id}:sec"),
-        (settings.CHAT_RATE_LIMIT_USER_PER_MINUTE, 60, f"chat:user:{user_id}:min"),
-        (settings.CHAT_RATE_LIMIT_THREAD_PER_SECOND, 1, f"chat:thread:{thread_id}:sec"),
-        (settings.CHAT_RATE_LIMIT_THREAD_PER_MINUTE, 60, f"chat:thread:{thread_id}:min"),
-    ]
-    for limit, window, cache_key in limits:
-        if not limit:
-            continue
-        count = cache.get(cache_key, 0)
-        if count >= limit:
-            raise ChatRateLimitError(
-                "Превышен лимит отправки сообщений, повторите попытку чуть позже"
-            )
-        cache.set(cache_key, count + 1, timeout=window)
-    # Track last activity to mitigate flood storms on reconnect.
-    cache.set(f"chat:last:{thread_id}:{user_id}", now.isoformat(), timeout=300)
+    result = check_limits(
+        [
+            Limit(f"chat:user:{user_id}:sec", settings.CHAT_RATE_LIMIT_USER_PER_SECOND, 1),
+            Limit(f"chat:user:{user_id}:min", settings.CHAT_RATE_LIMIT_USER_PER_MINUTE, 60),
+            Limit(f"chat:thread:{thread_id}:sec", settings.CHAT_RATE_LIMIT_THREAD_PER_SECOND, 1),
+            Limit(f"chat:thread:{thread_id}:min", settings.CHAT_RATE_LIMIT_THREAD_PER_MINUTE, 60),
+        ]
+    )
+    if not result.allowed:
+        raise ChatRateLimitError(
+            "Превышен лимит отправки сообщений, повторите попытку чуть позже"
+        )
 
 
 def _ensure_thread_not_blocked(thread: ChatThread) -> None:
@@ -110,49 +180,168 @@ def _ensure_thread_not_blocked(thread: ChatThread) -> None:
         raise ChatBlockedError(thread.blocked_reason or "Отправка сообщений временно недоступна")
 
 
-@transaction.atomic
-def create_message(
+def _normalize_body(body: str, action: str | None) -> str:
+    if action and action not in QUICK_ACTIONS:
+        raise ValidationError("Неизвестное контекстное действие")
+    return (body or QUICK_ACTIONS.get(action, "")).strip()
+
+
+def _store_message(
     *,
-    thread: ChatThread,
+    thread_id: int,
     sender,
     body: str,
-    attachment_ids: Sequence[str] | None = None,
-    action: str | None = None,
-) -> ChatMessage:
-    _ensure_thread_not_blocked(thread)
-    enforce_message_rate_limits(user_id=sender.id, thread_id=thread.id)
-    if action and action not in QUICK_ACTIONS:
-        raise ValidationError("Неизвестное контекстное действие")
-    normalized_body = (body or QUICK_ACTIONS.get(action, "")).strip()
+    attachment_ids: Sequence[str] | None,
+    action: str | None,
+    shadow_ban: bool,
+) -> tuple[ChatMessage, ChatEvent]:
     attachments_query = ChatAttachment.objects.filter(
-        thread=thread,
+        thread_id=thread_id,
         uploaded_by=sender,
         message__isnull=True,
     )
     if attachment_ids:
         attachments_query = attachments_query.filter(id__in=attachment_ids)
     attachments = list(attachments_query)
-    if not normalized_body and not attachments:
+    if not body and not attachments:
         raise ValidationError("Нельзя отправить пустое сообщение")
-    contains_link = bool(_LINK_PATTERN.search(normalized_body)) if normalized_body else False
-    shadow_ban = enforce_chat_safety(thread=thread, sender=sender)
+    contains_link = bool(_LINK_PATTERN.search(body)) if body else False
     message = ChatMessage.objects.create(
-        thread=thread,
+        thread_id=thread_id,
         sender=sender,
-        body=normalized_body,
+        body=body,
         has_attachments=bool(attachments),
         contains_link=contains_link,
         action=action or "",
         is_shadow_blocked=shadow_ban,
     )
-    for attachment in attachments:
-        attachment.attach_to_message(message)
-    thread.last_message_at = message.sent_at
-    thread.save(update_fields=["last_message_at", "updated_at"])
+    if attachments:
+        ChatAttachment.objects.filter(pk__in=[item.pk for item in attachments]).update(
+            message=message, updated_at=message.sent_at
+        )
+        for attachment in attachments:
+            attachment.message = message
+    # Номер события и last_message_at — одним UPDATE, без загрузки треда.
+    event = ChatEvent.objects.append(
+        thread_id=thread_id,
+        message=message,
+        event_type=ChatEvent.TYPE_MESSAGE,
+        payload=message_payload(message, attachments),
+        last_message_at=message.sent_at,
+    )
     apply_red_flag_detection(message)
+    return message, event
+
+
+@transaction.atomic
+def create_message(
+    *,
+    thread: ChatThread,
+    sender,
+    body: str,
+    attachment_ids: Sequence[str] | None = None,
+    action: str | None = None,
+) -> ChatMessage:
+    _ensure_thread_not_blocked(thread)
+    enforce_message_rate_limits(user_id=sender.id, thread_id=thread.id)
+    normalized_body = _normalize_body(body, action)
+    shadow_ban = enforce_chat_safety(thread=thread, sender=sender)
+    message, _ = _store_message(
+        thread_id=thread.id,
+        sender=sender,
+        body=normalized_body,
+        attachment_ids=attachment_ids,
+        action=action,
+        shadow_ban=shadow_ban,
+    )
+    thread.last_message_at = message.sent_at
     return message
 
 
+def send_message(
+    *,
+    context: SendContext,
+    sender,
+    body: str,
+    attachment_ids: Sequence[str] | None = None,
+    action: str | None = None,
+) -> tuple[ChatMessage, ChatEvent]:
+    """Отправка из WebSocket: ограничения берутся из ``context``, тред не перечитывается.
+
+    Возвращает сообщение и его событие журнала с готовым payload для рассылки.
+    """
+
+    shadow_ban = context.check()
+    enforce_message_rate_limits(user_id=sender.id, thread_id=context.thread_id)
+    normalized_body = _normalize_body(body, action)
+    with transaction.atomic():
+        return _store_message(
+            thread_id=context.thread_id,
+            sender=sender,
+            body=normalized_body,
+            attachment_ids=attachment_ids,
+            action=action,
+            shadow_ban=shadow_ban,
+        )
+
+
+def fetch_events(
+    *, thread: ChatThread, user, cursor: int, limit: int
+) -> tuple[list[ChatEvent], int, bool]:
+    """События треда с ``seq > cursor``: страница, следующий курсор и ``has_more``.
+
+    Голову журнала читаем до выборки: если страница неполная, курсор
+    сдвигается до неё, и невидимые пользователю события не сканируются повторно.
+    """
+
+    head = ChatThread.objects.filter(pk=thread.pk).values_list("last_event_seq", flat=True).get()
+    events = list(
+        ChatEvent.objects.filter(thread=thread, seq__gt=cursor, seq__lte=head)
+        .visible_for_user(user)
+        .order_by("seq")[: limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    if has_more:
+        return events, events[-1].seq, True
+    return events, max(head, cursor), False
+
+
+def _event_head(thread_id: int) -> int | None:
+    return (
+        ChatThread.objects.filter(pk=thread_id)
+        .values_list("last_event_seq", flat=True)
+        .first()
+    )
+
+
+def wait_for_events(*, thread_id: int, cursor: int, timeout: float) -> None:
+    """Подождать до ``timeout`` секунд появления событий после ``cursor``.
+
+    Подсказка о голове журнала в кеше только ускоряет пробуждение: при
+    LocMemCache она своя у каждого процесса, а записи из ``on_commit`` могут
+    прийти не по порядку. Поэтому счётчик треда в базе перечитывается каждые
+    ``_HEAD_DB_CHECK_EVERY`` шагов опроса. Ожидание занимает поток воркера —
+    его предел задаёт ``CHAT_EVENT_POLL_MAX_WAIT_SECONDS``.
+    """
+
+    deadline = time.monotonic() + timeout
+    polls = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(settings.CHAT_EVENT_POLL_INTERVAL_SECONDS, remaining))
+        polls += 1
+        hint = cache.get(event_head_key(thread_id))
+        if hint is not None and hint > cursor:
+            return
+        if polls % _HEAD_DB_CHECK_EVERY == 0:
+            head = _event_head(thread_id)
+            if head is None or head > cursor:
+                return
+
+
 def store_attachment(
     *,
     thread: ChatThread,
@@ -161,28 +350,18 @@ def store_attachment(
 ) -> ChatAttachment:
     if not settings.CHAT_ATTACHMENTS_ENABLED:
         raise ValidationError("Отправка вложений временно недоступна")
-    raw = file_obj.read()
-    if len(raw) > CHAT_ATTACHMENT_MAX_BYTES:
-        raise ValidationError("Вложение превышает максимальный размер 15 МБ")
-    mime_type = detect_mime_type(raw)
-    if mime_type not in CHAT_ATTACHMENT_ALLOWED_MIME_TYPES:
-        raise ValidationError("Этот тип файла запрещён в чате")
-    scrubbed = scrub_exif_if_image(raw, mime_type)
-    if len(scrubbed) > CHAT_ATTACHMENT_MAX_BYTES:
-        raise ValidationError("Вложение превышает максимальный размер после обработки")
-    scan_bytes(scrubbed, filename=file_obj.name)
-    checksum = hashlib.sha256(scrubbed).hexdigest()
-    attachment = ChatAttachment.objects.create(
-        thread=thread,
-        uploaded_by=uploaded_by,
-        original_name=file_obj.name,
-        mime_type=mime_type,
-        size=len(scrubbed),
-        checksum=checksum,
-    )
-    content = ContentFile(scrubbed, name=file_obj.name)
-    attachment.file.save(file_obj.name, content, save=True)
-    attachment.mark_scanned()
+    try:
+        upload = ingest_upload(
+            file_obj,
+            max_bytes=CHAT_ATTACHMENT_MAX_BYTES,
+            allowed_mime_types=CHAT_ATTACHMENT_ALLOWED_MIME_TYPES,
+        )
+    except FileTooLargeError as exc:
+        raise ValidationError("Вложение превышает максимальный размер 15 МБ") from exc
+    except FileValidationError as exc:
+        raise ValidationError("Этот тип файла запрещён в чате") from exc
+    attachment = ChatAttachment(thread=thread, uploaded_by=uploaded_by)
+    persist_upload(attachment, upload)
     return attachment
 
 
@@ -192,8 +371,15 @@ __all__ = [
     "ChatMessage",
     "ChatThread",
     "QUICK_ACTIONS",
+    "SendContext",
     "create_message",
     "enforce_message_rate_limits",
+    "fetch_events",
     "get_thread_for_user",
+    "load_send_context",
+    "notify_moderation_changed",
+    "send_message",
     "store_attachment",
+    "thread_group_name",
+    "wait_for_events",
 ]
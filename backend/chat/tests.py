@@ -0,0 +1,194 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Profile, User
+from marketplace.models import Contract, Order, OrderApplication
+
+from .models import ChatEvent, ChatMessage, ChatThread, event_head_key
+from .services import create_message, wait_for_events
+
+_NO_RATE_LIMITS = {
+    "CHAT_RATE_LIMIT_USER_PER_SECOND": 0,
+    "CHAT_RATE_LIMIT_THREAD_PER_SECOND": 0,
+    "CHAT_RATE_LIMIT_USER_PER_MINUTE": 0,
+    "CHAT_RATE_LIMIT_THREAD_PER_MINUTE": 0,
+}
+
+
+class ChatThreadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(
+            nickname="chat-client",
+            email="chat-client@example.com",
+            first_name="Client",
+            last_name="User",
+        )
+        cls.freelancer_user = User.objects.create(
+            nickname="chat-freelancer",
+            email="chat-freelancer@example.com",
+            first_name="Free",
+            last_name="Lancer",
+        )
+        client_profile = Profile.objects.create(
+            user=cls.client_user, role=Profile.ROLE_CLIENT, is_completed=True
+        )
+        freelancer_profile = Profile.objects.create(
+            user=cls.freelancer_user, role=Profile.ROLE_FREELANCER, is_completed=True
+        )
+        order = Order.objects.create(
+            title="Telegram bot",
+            description="Нужен бот для приёма заказов",
+            deadline=timezone.now() + timedelta(days=7),
+            payment_type=Order.PAYMENT_FIXED,
+            budget=100,
+            order_type=Order.ORDER_TYPE_STANDARD,
+            client=client_profile,
+        )
+        application = OrderApplication.objects.create(
+            order=order, freelancer=freelancer_profile
+        )
+        cls.contract = Contract.objects.create(
+            order=order,
+            application=application,
+            client=client_profile,
+            freelancer=freelancer_profile,
+            budget_snapshot=100,
+        )
+        cls.thread = ChatThread.objects.create(
+            contract=cls.contract, client=client_profile, freelancer=freelancer_profile
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.freelancer_user)
+
+    def _send(self, body: str):
+        return create_message(thread=self.thread, sender=self.client_user, body=body)
+
+
+@override_settings(**_NO_RATE_LIMITS)
+class ChatEventLogTests(ChatThreadTestCase):
+    def test_append_allocates_consecutive_seq_per_thread(self):
+        messages = [self._send(f"m{index}") for index in range(3)]
+        messages[0].apply_status("read")
+
+        events = list(ChatEvent.objects.filter(thread=self.thread).order_by("seq"))
+        self.assertEqual([event.seq for event in events], [1, 2, 3, 4])
+        self.assertEqual(
+            [event.event_type for event in events],
+            [ChatEvent.TYPE_MESSAGE] * 3 + [ChatEvent.TYPE_STATUS],
+        )
+        thread = ChatThread.objects.get(pk=self.thread.pk)
+        self.assertEqual(thread.last_event_seq, 4)
+        self.assertEqual(thread.last_message_at, messages[-1].sent_at)
+
+    def test_head_hint_is_published_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._send("hello")
+        self.assertIsNone(cache.get(event_head_key(self.thread.id)))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(event_head_key(self.thread.id)), 1)
+
+    @override_settings(CHAT_EVENT_POLL_INTERVAL_SECONDS=0.001)
+    def test_wait_falls_back_to_database_head_when_hint_lags(self):
+        cache.set(event_head_key(self.thread.id), 0)
+        # Запись подсказки из on_commit не выполнена — в кеше остаётся 0.
+        with self.captureOnCommitCallbacks(execute=False):
+            self._send("hello")
+
+        with mock.patch("chat.services.time.sleep") as sleep:
+            wait_for_events(thread_id=self.thread.id, cursor=0, timeout=5)
+        self.assertEqual(sleep.call_count, 4)
+
+    @override_settings(CHAT_EVENT_POLL_INTERVAL_SECONDS=0.001)
+    def test_wait_returns_on_fresh_hint(self):
+        cache.set(event_head_key(self.thread.id), 1)
+        with mock.patch("chat.services.time.sleep") as sleep:
+            wait_for_events(thread_id=self.thread.id, cursor=0, timeout=5)
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_poll_returns_visible_events_after_cursor(self):
+        url = reverse("chat-events", kwargs={"contract_id": self.contract.id})
+        self.assertEqual(self.api.get(url).json()["next_cursor"], 0)
+        first = self._send("first")
+        self._send("second")
+        first.hide(by_user=None, reason="spam")
+
+        response = self.api.get(url, {"cursor": 1}).json()
+        self.assertEqual(
+            [(event["seq"], event["type"]) for event in response["events"]],
+            [(2, ChatEvent.TYPE_MESSAGE), (3, ChatEvent.TYPE_HIDDEN)],
+        )
+        self.assertEqual(response["next_cursor"], 3)
+        self.assertFalse(response["has_more"])
+
+    @override_settings(CHAT_EVENT_POLL_INTERVAL_SECONDS=0.001)
+    def test_poll_waits_until_timeout_without_events(self):
+        url = reverse("chat-events", kwargs={"contract_id": self.contract.id})
+        response = self.api.get(url, {"cursor": 0, "wait": 0.02}).json()
+        self.assertEqual(response, {"events": [], "next_cursor": 0, "has_more": False})
+
+
+@override_settings(**_NO_RATE_LIMITS)
+class ChatMessagePaginationTests(ChatThreadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("chat-messages", kwargs={"contract_id": self.contract.id})
+        messages = [self._send(f"m{index}") for index in range(7)]
+        # Одинаковое время у соседних сообщений: порядок решает id.
+        base = timezone.now() - timedelta(minutes=1)
+        for index, message in enumerate(messages):
+            ChatMessage.objects.filter(pk=message.pk).update(
+                sent_at=base + timedelta(seconds=index // 2)
+            )
+
+    def _page(self, **params) -> dict:
+        response = self.api.get(self.url, {"page_size": 3, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @staticmethod
+    def _bodies(page: dict) -> list[str]:
+        return [message["body"] for message in page["results"]]
+
+    def test_pages_backward_then_forward_to_an_empty_tail(self):
+        newest = self._page()
+        self.assertEqual(self._bodies(newest), ["m4", "m5", "m6"])
+        self.assertFalse(newest["has_after"])
+        self.assertIsNotNone(newest["after"])
+
+        pages = [newest]
+        while pages[0]["before"]:
+            pages.insert(0, self._page(before=pages[0]["before"]))
+        self.assertEqual(
+            [self._bodies(page) for page in pages],
+            [["m0"], ["m1", "m2", "m3"], ["m4", "m5", "m6"]],
+        )
+
+        seen = self._bodies(pages[0])
+        page = pages[0]
+        while page["has_after"]:
+            page = self._page(after=page["after"])
+            seen += self._bodies(page)
+        self.assertEqual(seen, [f"m{index}" for index in range(7)])
+
+        tail = self._page(after=page["after"])
+        self.assertEqual(tail["results"], [])
+        self.assertEqual(tail["after"], page["after"])
+        self.assertFalse(tail["has_after"])
+
+        self._send("m7")
+        self.assertEqual(self._bodies(self._page(after=tail["after"])), ["m7"])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.api.get(self.url, {"before": "zzz"}).status_code, 400)
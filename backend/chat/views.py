@@ -1,16 +1,19 @@
 from __future__ import annotations
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, timezone as dt_timezone
 
-from django.http import FileResponse, Http404
-from django.utils import timezone
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
 from rest_framework import generics, permissions, status
-from rest_framework.exceptions import PermissionDenied, Throttled
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import PermissionDenied, Throttled, ValidationError
+from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from marketplace.models import Contract
+from uploads.delivery import private_file_response
 
 from .exceptions import ChatBlockedError, ChatRateLimitError
 from .models import ChatAttachmentLink, ChatMessage
@@ -24,7 +27,7 @@ from .serializers import (
     ChatMessageStatusSerializer,
     ChatThreadSerializer,
 )
-from .services import get_thread_for_user
+from .services import fetch_events, get_thread_for_user, wait_for_events
 
 
 class ContractThreadMixin:
@@ -41,11 +44,92 @@ class ContractThreadMixin:
         return thread
 
 
-class ChatMessagePagination(PageNumberPagination):
+class ChatMessagePagination(BasePagination):
+    """Keyset-пагинация ленты по ``(sent_at, id)`` без ``COUNT(*)`` и ``OFFSET``.
+
+    Без курсора отдаётся последняя страница. ``before`` листает историю назад,
+    ``after`` — вперёд; страница начинается прямо с курсора по индексу
+    ``(thread, sent_at, id)``, поэтому её цена не зависит от глубины. Внутри
+    страницы сообщения идут по возрастанию времени.
+
+    Курсор ``after`` возвращается всегда, даже на последней или пустой
+    странице: с него клиент продолжит, когда появятся новые сообщения.
+    ``has_after`` говорит, есть ли они уже сейчас.
+    """
+
     page_size = 50
     page_size_query_param = "page_size"
     max_page_size = 100
 
+    def paginate_queryset(self, queryset, request, view=None):
+        size = self._page_size(request)
+        before = self._decode(request.query_params.get("before"))
+        after = self._decode(request.query_params.get("after"))
+        # Пустая страница возвращает курсор запроса, чтобы клиенту было откуда продолжить.
+        self.cursor = request.query_params.get("after") or request.query_params.get("before")
+        if after is not None:
+            rows = list(self._after(queryset, after).order_by("sent_at", "pk")[: size + 1])
+            self.has_after = len(rows) > size
+            self.has_before = True
+            rows = rows[:size]
+        else:
+            if before is not None:
+                queryset = self._before(queryset, before)
+            rows = list(queryset.order_by("-sent_at", "-pk")[: size + 1])
+            self.has_before = len(rows) > size
+            self.has_after = before is not None
+            rows = rows[:size][::-1]
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "before": self._encode(self.page[0]) if self.page and self.has_before else None,
+                "after": self._encode(self.page[-1]) if self.page else self.cursor or None,
+                "has_after": self.has_after,
+                "results": data,
+            }
+        )
+
+    def _page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def _after(queryset, position):
+        sent_at, pk = position
+        # Избыточное ``sent_at >= …`` даёт планировщику явную границу диапазона.
+        return queryset.filter(sent_at__gte=sent_at).filter(
+            Q(sent_at__gt=sent_at) | Q(pk__gt=pk)
+        )
+
+    @staticmethod
+    def _before(queryset, position):
+        sent_at, pk = position
+        return queryset.filter(sent_at__lte=sent_at).filter(
+            Q(sent_at__lt=sent_at) | Q(pk__lt=pk)
+        )
+
+    @staticmethod
+    def _encode(message: ChatMessage) -> str:
+        raw = f"{message.sent_at.isoformat()}|{message.pk}".encode()
+        return urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode(value: str | None) -> tuple[datetime, int] | None:
+        if not value:
+            return None
+        try:
+            raw = urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+            sent_at, pk = raw.split("|")
+            return datetime.fromisoformat(sent_at), int(pk)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ValidationError({"detail": "Некорректный курсор"}) from exc
+
 
 class ContractChatThreadView(ContractThreadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -118,44 +202,43 @@ class ChatMessageStatusView(ContractThreadMixin, APIView):
 
 
 class ChatEventPollView(ContractThreadMixin, APIView):
+    """Long-poll журнала событий треда по курсору ``seq``.
+
+    ``cursor`` — последний полученный ``seq``; без него ответ пуст и несёт
+    текущую голову журнала для начала синхронизации. ``wait`` — сколько секунд
+    подождать новых событий, если их пока нет.
+    """
+
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         thread = self.get_thread()
-        since_value = request.query_params.get("since")
-        events = []
-        boundary = None
-        if since_value:
-            try:
-                boundary = datetime.fromisoformat(since_value)
-                if boundary.tzinfo is None:
-                    boundary = boundary.replace(tzinfo=dt_timezone.utc)
-            except ValueError:
-                boundary = None
-        qs = (
-            ChatMessage.objects.visible_for_user(request.user)
-            .filter(thread=thread)
-            .select_related("sender")
-            .prefetch_related("attachments")
+        params = request.query_params
+        try:
+            cursor = int(params["cursor"]) if params.get("cursor") else None
+            limit = int(params.get("limit") or settings.CHAT_EVENT_PAGE_SIZE)
+            wait = float(params.get("wait") or 0)
+        except ValueError as exc:
+            raise ValidationError({"detail": "cursor, limit и wait должны быть числами"}) from exc
+        if cursor is None:
+            return Response({"events": [], "next_cursor": thread.last_event_seq, "has_more": False})
+        limit = max(1, min(limit, settings.CHAT_EVENT_PAGE_SIZE))
+        wait = max(0.0, min(wait, settings.CHAT_EVENT_POLL_MAX_WAIT_SECONDS))
+        events, next_cursor, has_more = fetch_events(
+            thread=thread, user=request.user, cursor=cursor, limit=limit
+        )
+        if not events and wait:
+            wait_for_events(thread_id=thread.id, cursor=next_cursor, timeout=wait)
+            events, next_cursor, has_more = fetch_events(
+                thread=thread, user=request.user, cursor=next_cursor, limit=limit
+            )
+        return Response(
+            {
+                "events": [event.as_envelope() for event in events],
+                "next_cursor": next_cursor,
+                "has_more": has_more,
+            }
         )
-        if boundary:
-            qs = qs.filter(updated_at__gte=boundary)
-        for message in qs:
-            if boundary is None or message.sent_at >= boundary:
-                events.append({"type": "message", "payload": ChatMessageSerializer(message).data})
-            elif message.status != ChatMessage.STATUS_SENT and message.updated_at >= (boundary or message.updated_at):
-                events.append(
-                    {
-                        "type": "status",
-                        "payload": {
-                            "id": message.id,
-                            "status": message.status,
-                            "delivered_at": message.delivered_at,
-                            "read_at": message.read_at,
-                        },
-                    }
-                )
-        return Response({"events": events, "next_cursor": timezone.now().isoformat()})
 
 
 class ChatAttachmentUploadView(ContractThreadMixin, generics.CreateAPIView):
@@ -205,14 +288,16 @@ class ChatAttachmentDownloadView(APIView):
         attachment = link.attachment
         if not attachment.thread.is_participant(request.user):
             raise PermissionDenied("Недостаточно прав для скачивания вложения")
-        response = FileResponse(
-            attachment.file.open("rb"),
-            as_attachment=True,
+        if not attachment.is_scanned:
+            # Файл ещё в карантине или не прошёл проверку.
+            raise Http404
+        return private_file_response(
+            request,
+            attachment.file,
             filename=attachment.original_name,
+            content_type=attachment.mime_type,
+            checksum=attachment.checksum,
         )
-        response["Content-Type"] = attachment.mime_type
-        response["X-Content-Type-Options"] = "nosniff"
-        return response
 
 
 class ChatMessageReportView(ContractThreadMixin, generics.CreateAPIView):
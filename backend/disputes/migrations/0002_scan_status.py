@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+def mark_existing_clean(apps, schema_editor):
+    # Всё загруженное до карантина уже прошло синхронную проверку при загрузке.
+    DisputeEvidence = apps.get_model("disputes", "DisputeEvidence")
+    stored = models.Q(file__isnull=False) & ~models.Q(file="")
+    DisputeEvidence.objects.filter(stored | models.Q(kind="link")).update(scan_status="clean")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("disputes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="disputeevidence",
+            name="scan_status",
+            field=models.CharField(choices=[("pending_scan", "Pending scan"), ("clean", "Clean"), ("rejected", "Rejected")], default="pending_scan", max_length=16),
+        ),
+        migrations.RunPython(mark_existing_clean, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,9 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from marketplace.models import Contract
+from uploads.models import ScanStatus, StoredBlob
 from uploads.storage import private_storage
 
 
@@ -120,9 +122,11 @@ class DisputeEvidence(models.Model):
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="uploaded_evidence")
     kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=KIND_FILE)
     file = models.FileField(storage=private_storage, upload_to="disputes/evidence/%Y/%m/%d", blank=True, null=True)
+    blob = models.ForeignKey(StoredBlob, on_delete=models.PROTECT, related_name="dispute_evidence", null=True, blank=True)
     link_url = models.URLField(blank=True)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    scan_status = models.CharField(max_length=16, choices=ScanStatus.choices, default=ScanStatus.PENDING)
     scanned_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -132,6 +136,15 @@ class DisputeEvidence(models.Model):
     def __str__(self):  # pragma: no cover
         return f"DisputeEvidence<{self.id}>"
 
+    def mark_scanned(self):
+        self.scan_status = ScanStatus.CLEAN
+        self.scanned_at = timezone.now()
+        self.save(update_fields=["scan_status", "scanned_at"])
+
+    def mark_scan_rejected(self):
+        self.scan_status = ScanStatus.REJECTED
+        self.save(update_fields=["scan_status"])
+
 
 class DisputeTimelineEvent(models.Model):
     EVENT_MESSAGE = "message"
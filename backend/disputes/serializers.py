@@ -16,6 +16,7 @@ class DisputeEvidenceSerializer(serializers.ModelSerializer):
             "description",
             "link_url",
             "created_at",
+            "scan_status",
             "scanned_at",
         ]
         read_only_fields = fields
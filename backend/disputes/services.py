@@ -2,12 +2,12 @@ from __future__ import annotations
 
 from datetime import timedelta
 
-from django.core.files.base import ContentFile
 from django.db import transaction
 from django.utils import timezone
 
 from moderation.services import log_staff_action
-from uploads.scanner import scan_bytes
+from uploads import processing
+from uploads.models import ScanStatus
 
 from .models import DisputeCase, DisputeEvidence, DisputeOutcome, DisputeTimelineEvent
 
@@ -42,16 +42,15 @@ def open_dispute(*, contract, opened_by, category: str, claim_summary: str = "")
 def add_evidence(*, case: DisputeCase, uploaded_by, file_obj=None, link_url: str = "", title: str = "", description: str = "") -> DisputeEvidence:
     evidence = DisputeEvidence(case=case, uploaded_by=uploaded_by, title=title or "Evidence", description=description)
     if file_obj:
-        raw = file_obj.read()
-        scan_bytes(raw, filename=file_obj.name)
-        content = ContentFile(raw, name=file_obj.name)
         evidence.kind = DisputeEvidence.KIND_FILE
-        evidence.file.save(file_obj.name, content, save=False)
-        evidence.scanned_at = timezone.now()
     elif link_url:
         evidence.kind = DisputeEvidence.KIND_LINK
         evidence.link_url = link_url
+        evidence.scan_status = ScanStatus.CLEAN
     evidence.save()
+    if file_obj:
+        # Доказательства не перекодируются: метаданные снимков могут быть важны для спора.
+        processing.enqueue(evidence, file_obj, filename=file_obj.name, scrub_image=False)
     DisputeTimelineEvent.objects.create(
         case=case,
         actor=uploaded_by,
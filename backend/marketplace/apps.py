@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MarketplaceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "marketplace"
+
+    def ready(self) -> None:  # pragma: no cover - import side effects
+        from . import signals  # noqa: F401
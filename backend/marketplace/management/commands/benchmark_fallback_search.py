@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import Profile
+from marketplace.models import Order
+from marketplace.services.semantic_search import _fallback_search
+from profiles.models import PortfolioItem
+
+_ENTITIES = ["orders", "profiles", "portfolio"]
+
+# Поля прежнего fallback на ``icontains`` — для сравнения.
+_ICONTAINS = {
+    "orders": (Order, "title", "description"),
+    "profiles": (Profile, "headline", "bio"),
+    "portfolio": (PortfolioItem, "title", "problem"),
+}
+
+
+def _icontains_search(query: str, entity: str) -> list[int]:
+    model, primary, secondary = _ICONTAINS[entity]
+    normalized = query.lower()
+    condition = Q(**{f"{primary}__icontains": normalized}) | Q(
+        **{f"{secondary}__icontains": normalized}
+    )
+    return list(model.objects.filter(condition).values_list("id", flat=True)[:20])
+
+
+class Command(BaseCommand):
+    help = "Сравнение fallback поиска: прежний icontains против полнотекстового по GIN-индексу"
+
+    def add_arguments(self, parser):
+        parser.add_argument("query", nargs="+")
+        parser.add_argument("--entity", choices=[*_ENTITIES, "all"], default="all")
+        parser.add_argument("--locale", default="ru")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        entities = _ENTITIES if options["entity"] == "all" else [options["entity"]]
+        query = " ".join(options["query"])
+        locale = options["locale"]
+        repeat = max(int(options["repeat"]), 1)
+        for entity in entities:
+            legacy, legacy_hits = self._measure(
+                lambda entity=entity: _icontains_search(query, entity), repeat
+            )
+            full_text, full_text_hits = self._measure(
+                lambda entity=entity: _fallback_search(query, entity, locale), repeat
+            )
+            self.stdout.write(
+                f"{entity}: icontains median={legacy:.2f}ms hits={legacy_hits} | "
+                f"full_text median={full_text:.2f}ms hits={full_text_hits}"
+            )
+
+    @staticmethod
+    def _measure(search, repeat: int) -> tuple[float, int]:
+        timings = []
+        hits = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = len(search())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), hits
@@ -1,17 +1,40 @@
 from __future__ import annotations
 
-from itertools import islice
+import asyncio
+import time
+from dataclasses import dataclass, field
 
+from asgiref.sync import sync_to_async
 from django.core.management.base import BaseCommand
 
 from accounts.models import Profile
-from marketplace.models import Order
+from marketplace.models import BackfillCheckpoint, Order
 from obsidian_backend.ai import tldr as tldr_cache
-from obsidian_backend.ai.client import AiGatewayClient, AiGatewayError
+from obsidian_backend.ai.client import AiGatewayError, AsyncAiGatewayClient
+
+
+@dataclass(slots=True)
+class _Progress:
+    label: str
+    started_at: float = field(default_factory=time.monotonic)
+    processed: int = 0
+    updated: int = 0
+    batches: int = 0
+
+    def line(self, in_flight: int) -> str:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return (
+            f"{self.label}: batches={self.batches} processed={self.processed} "
+            f"updated={self.updated} in_flight={in_flight} "
+            f"rate={self.processed / elapsed:.1f} items/s"
+        )
 
 
 class Command(BaseCommand):
-    help = "Синхронное формирование TL;DR для заказов и профилей"
+    help = (
+        "Возобновляемый конвейерный backfill TL;DR для заказов и профилей: keyset-чтение, "
+        "несколько параллельных батчей к ai-gateway и массовая запись"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -20,84 +43,203 @@ class Command(BaseCommand):
             default="all",
         )
         parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Сколько батчей одновременно обрабатывается в ai-gateway",
+        )
         parser.add_argument(
             "--locale",
             action="append",
             dest="locales",
             help="Языки, для которых пересчитываем TL;DR",
         )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Начать обход заново, игнорируя сохранённую позицию",
+        )
 
     def handle(self, *args, **options):
         entity = options["entity"]
-        batch_size = int(options["batch_size"])
         locales = options.get("locales") or ["ru", "uz"]
-        client = AiGatewayClient(timeout=5)
         targets = []
         if entity in {"orders", "all"}:
             targets.append("orders")
         if entity in {"profiles", "all"}:
             targets.append("profiles")
-        for locale in locales:
-            for target in targets:
-                self.stdout.write(f"Processing {target} ({locale})...")
-                queryset = self._load_queryset(target, locale)
-                chunk = list(islice(queryset, batch_size))
-                while chunk:
-                    payload = {
-                        "locale": locale,
-                        "items": [self._serialize_item(target, item, locale) for item in chunk],
-                    }
-                    try:
-                        response = client.generate_tldr(payload)
-                    except AiGatewayError as exc:  # pragma: no cover - network failure
-                        self.stderr.write(str(exc))
-                        break
-                    self._persist(target, response.get("items", []), locale)
-                    chunk = list(islice(queryset, batch_size))
-
-    def _load_queryset(self, entity: str, locale: str):
-        field = "tldr_ru" if locale.startswith("ru") else "tldr_uz"
-        filters = {field: ""}
-        if entity == "orders":
-            return (
+        asyncio.run(
+            self._run(
+                targets,
+                locales,
+                batch_size=max(int(options["batch_size"]), 1),
+                concurrency=max(int(options["concurrency"]), 1),
+                reset=options["reset"],
+            )
+        )
+
+    async def _run(
+        self,
+        targets: list[str],
+        locales: list[str],
+        *,
+        batch_size: int,
+        concurrency: int,
+        reset: bool,
+    ) -> None:
+        async with AsyncAiGatewayClient() as client:
+            for locale in locales:
+                for target in targets:
+                    self.stdout.write(f"Processing {target} ({locale})...")
+                    await self._backfill(
+                        client,
+                        target,
+                        locale,
+                        batch_size=batch_size,
+                        concurrency=concurrency,
+                        reset=reset,
+                    )
+
+    async def _backfill(
+        self,
+        client: AsyncAiGatewayClient,
+        target: str,
+        locale: str,
+        *,
+        batch_size: int,
+        concurrency: int,
+        reset: bool,
+    ) -> None:
+        checkpoint = await sync_to_async(self._checkpoint)(target, locale, reset)
+        if checkpoint.position:
+            self.stdout.write(f"Resuming {target} ({locale}) after id={checkpoint.position}")
+        progress = _Progress(label=f"{target} ({locale})")
+        resumed_from = checkpoint.processed
+        after = checkpoint.position
+        pending: dict[asyncio.Task, tuple[int, int]] = {}
+        dispatched: list[int] = []
+        completed: set[int] = set()
+        exhausted = False
+        failed = False
+        while True:
+            while not exhausted and not failed and len(pending) < concurrency:
+                chunk = await sync_to_async(self._fetch_page)(target, locale, after, batch_size)
+                if not chunk:
+                    exhausted = True
+                    break
+                after = chunk[-1]["id"]
+                task = asyncio.create_task(
+                    client.generate_tldr({"locale": locale, "items": chunk})
+                )
+                pending[task] = (after, len(chunk))
+                dispatched.append(after)
+            if not pending:
+                break
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                last_id, size = pending.pop(task)
+                try:
+                    response = task.result()
+                except AiGatewayError as exc:
+                    # Новые батчи не отправляем; позиция останется до этого батча.
+                    self.stderr.write(f"{progress.label}: {exc}")
+                    failed = True
+                    continue
+                progress.updated += await sync_to_async(self._persist)(
+                    target, response.get("items", []), locale
+                )
+                progress.processed += size
+                progress.batches += 1
+                completed.add(last_id)
+            # Позиция двигается только по непрерывному префиксу завершённых батчей.
+            position = checkpoint.position
+            while dispatched and dispatched[0] in completed:
+                position = dispatched.pop(0)
+            if position != checkpoint.position:
+                await sync_to_async(self._save_checkpoint)(
+                    checkpoint, position, resumed_from + progress.processed
+                )
+            self.stdout.write(progress.line(len(pending)))
+        if failed:
+            self.stdout.write(f"Stopped, rerun to resume: {progress.line(0)}")
+            return
+        # Обход завершён — следующий запуск снова пройдёт по всем пустым TL;DR.
+        await sync_to_async(checkpoint.delete)()
+        self.stdout.write(f"Done: {progress.line(0)}")
+
+    # ----------------------------------------------------------------- sync helpers
+    @staticmethod
+    def _checkpoint(target: str, locale: str, reset: bool) -> BackfillCheckpoint:
+        checkpoint, _ = BackfillCheckpoint.objects.get_or_create(name=f"tldr:{target}:{locale}")
+        if reset and checkpoint.position:
+            checkpoint.position = 0
+            checkpoint.processed = 0
+            checkpoint.save(update_fields=["position", "processed", "updated_at"])
+        return checkpoint
+
+    @staticmethod
+    def _save_checkpoint(checkpoint: BackfillCheckpoint, position: int, processed: int) -> None:
+        checkpoint.position = position
+        checkpoint.processed = processed
+        checkpoint.save(update_fields=["position", "processed", "updated_at"])
+
+    @staticmethod
+    def _field(locale: str) -> str:
+        return "tldr_ru" if locale.startswith("ru") else "tldr_uz"
+
+    def _fetch_page(self, target: str, locale: str, after: int, size: int) -> list[dict]:
+        filters = {self._field(locale): "", "pk__gt": after}
+        if target == "orders":
+            rows = (
                 Order.objects.filter(status=Order.STATUS_PUBLISHED, **filters)
-                .select_related("client", "client__user")
-                .prefetch_related("required_skills")
-                .iterator()
+                .order_by("pk")
+                .values_list("pk", "title", "description")[:size]
             )
-        return (
+            return [
+                {"id": pk, "type": "order", "title": title, "body": body, "locale": locale}
+                for pk, title, body in rows
+            ]
+        profiles = (
             Profile.objects.filter(role=Profile.ROLE_FREELANCER, **filters)
             .select_related("user")
-            .prefetch_related("skills")
-            .iterator()
+            .only(
+                "pk",
+                "headline",
+                "bio",
+                "user__first_name",
+                "user__last_name",
+                "user__patronymic",
+            )
+            .order_by("pk")[:size]
         )
-
-    def _serialize_item(self, entity: str, obj, locale: str) -> dict:
-        if entity == "orders":
-            return {
-                "id": obj.id,
-                "type": "order",
-                "title": obj.title,
-                "body": obj.description,
+        return [
+            {
+                "id": profile.pk,
+                "type": "profile",
+                "title": profile.headline or profile.user.full_name,
+                "body": profile.bio,
                 "locale": locale,
             }
-        return {
-            "id": obj.id,
-            "type": "profile",
-            "title": obj.headline or obj.user.full_name,
-            "body": obj.bio,
-            "locale": locale,
-        }
-
-    def _persist(self, entity: str, items: list[dict], locale: str) -> None:
-        for item in items:
-            text = item.get("tldr")
-            if not text:
-                continue
-            field = "ru" if locale.startswith("ru") else "uz"
-            if entity == "orders":
-                Order.objects.filter(pk=item["id"]).update(**{f"tldr_{field}": text})
-                tldr_cache.set_tldr(entity="order", pk=item["id"], locale=locale, value=text)
-            else:
-                Profile.objects.filter(pk=item["id"]).update(**{f"tldr_{field}": text})
-                tldr_cache.set_tldr(entity="profile", pk=item["id"], locale=locale, value=text)
+            for profile in profiles
+        ]
+
+    def _persist(self, target: str, items: list[dict], locale: str) -> int:
+        values = {item["id"]: item["tldr"] for item in items if item.get("tldr")}
+        if not values:
+            return 0
+        model = Order if target == "orders" else Profile
+        _bulk_update_column(model, self._field(locale), values)
+        tldr_cache.set_tldr_many(
+            entity="order" if target == "orders" else "profile",
+            locale=locale,
+            values=values,
+        )
+        return len(values)
+
+
+def _bulk_update_column(model, field_name: str, values: dict[int, str]) -> None:
+    """Один ``UPDATE ... SET column = CASE ...`` вместо запроса на каждую строку."""
+
+    rows = [model(pk=pk, **{field_name: text}) for pk, text in values.items()]
+    model.objects.bulk_update(rows, [field_name])
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from marketplace.services.materialized_recommendations import (
+    refresh_invites,
+    refresh_orders,
+)
+
+_KINDS = ["invites", "orders"]
+
+
+class Command(BaseCommand):
+    help = "Пересчёт материализованных рекомендаций (заказ → исполнители, исполнитель → заказы)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=[*_KINDS, "all"], default="all")
+        parser.add_argument("--locale", default="ru")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Инкрементальный режим: только строки, помеченные сигналами как устаревшие",
+        )
+
+    def handle(self, *args, **options):
+        kinds = _KINDS if options["kind"] == "all" else [options["kind"]]
+        locale = options["locale"]
+        stale_only = options["stale_only"]
+        if "invites" in kinds:
+            refreshed = refresh_invites(
+                locale=locale,
+                stale_only=stale_only,
+                batch_size=int(options["batch_size"]),
+            )
+            self.stdout.write(f"invites: refreshed={refreshed}")
+        if "orders" in kinds:
+            refreshed = refresh_orders(locale=locale, stale_only=stale_only)
+            self.stdout.write(f"orders: refreshed={refreshed}")
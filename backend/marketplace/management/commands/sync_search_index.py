@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from marketplace.services.semantic_search import (
+    iter_index_batches,
+    unsearchable_document_ids,
+)
+from obsidian_backend.ai.client import AiGatewayClient, AiGatewayError
+
+_ENTITIES = ["orders", "profiles", "portfolio"]
+_LOCALES = ["ru", "uz"]
+
+
+class Command(BaseCommand):
+    help = "Синхронизация ANN-индекса семантического поиска в ai-gateway"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--entity",
+            choices=[*_ENTITIES, "all"],
+            default="all",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--locale",
+            choices=[*_LOCALES, "all"],
+            default="all",
+            help="Каталог в ai-gateway ведётся отдельно для каждого языка",
+        )
+        parser.add_argument(
+            "--since-minutes",
+            type=int,
+            default=None,
+            help="Инкрементальный режим: только записи, изменённые за последние N минут",
+        )
+
+    def handle(self, *args, **options):
+        entities = _ENTITIES if options["entity"] == "all" else [options["entity"]]
+        batch_size = int(options["batch_size"])
+        locales = _LOCALES if options["locale"] == "all" else [options["locale"]]
+        since = None
+        if options["since_minutes"] is not None:
+            since = timezone.now() - timedelta(minutes=int(options["since_minutes"]))
+        client = AiGatewayClient(timeout=10)
+        for entity in entities:
+            stale = [] if since is None else unsearchable_document_ids(entity, since=since)
+            for locale in locales:
+                indexed = 0
+                try:
+                    for documents in iter_index_batches(
+                        entity, locale, batch_size=batch_size, since=since
+                    ):
+                        client.index_search_documents(
+                            {"entity": entity, "locale": locale, "documents": documents}
+                        )
+                        indexed += len(documents)
+                    for start in range(0, len(stale), batch_size):
+                        ids = stale[start : start + batch_size]
+                        client.delete_search_documents(
+                            {"entity": entity, "locale": locale, "ids": ids}
+                        )
+                except AiGatewayError as exc:  # pragma: no cover - network failure
+                    raise CommandError(f"{entity}/{locale}: {exc}") from exc
+                self.stdout.write(f"{entity}/{locale}: indexed={indexed} removed={len(stale)}")
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0006_order_tldr_ru_order_tldr_uz"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecommendationSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(choices=[("invites", "Order → freelancers"), ("orders", "Freelancer → orders")], max_length=16)),
+                ("subject_id", models.PositiveBigIntegerField()),
+                ("locale", models.CharField(default="ru", max_length=8)),
+                ("items", models.JSONField(blank=True, default=list)),
+                ("source", models.CharField(default="ai", max_length=16)),
+                ("is_stale", models.BooleanField(default=False)),
+                ("computed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["kind", "is_stale"], name="recommendation_stale_idx")],
+                "unique_together": {("kind", "subject_id", "locale")},
+            },
+        ),
+    ]
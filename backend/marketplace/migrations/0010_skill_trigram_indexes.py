@@ -0,0 +1,64 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations
+
+# Индексы живут только в базе, не в состоянии моделей: без pg_trgm их нет, и
+# автогенерированные миграции не должны на них рассчитывать.
+TRIGRAM_INDEXES = [
+    ("skill", "name", "skill_name_trgm"),
+    ("skill", "title_ru", "skill_title_ru_trgm"),
+    ("skill", "title_uz", "skill_title_uz_trgm"),
+    ("skillsynonym", "value", "skill_synonym_value_trgm"),
+]
+
+
+def _trigram_indexes(apps):
+    for model_name, field_name, index_name in TRIGRAM_INDEXES:
+        model = apps.get_model("marketplace", model_name)
+        index = GinIndex(fields=[field_name], name=index_name, opclasses=["gin_trgm_ops"])
+        yield model, index
+
+
+def _trigram_available(schema_editor) -> bool:
+    if schema_editor.connection.vendor != "postgresql":  # pragma: no cover - safety
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Enable pg_trgm and build the autocomplete indexes where the server ships it.
+
+    Without the extension autocomplete serves prefix matches from the in-process
+    trie only, so the migration must not fail on such databases.
+    """
+
+    if not _trigram_available(schema_editor):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for model, index in _trigram_indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":  # pragma: no cover - safety
+        return
+    for model, index in _trigram_indexes(apps):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        if index.name in constraints:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0009_order_search_vector_order_order_search_vector_gin"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0010_skill_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recommendationsnapshot",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["items"],
+                name="recommendation_items_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ),
+    ]
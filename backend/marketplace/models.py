@@ -1,5 +1,7 @@
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models, transaction
 from django.utils import timezone
 
@@ -45,6 +47,8 @@ class Skill(models.Model):
         indexes = [
             models.Index(fields=["slug"], name="marketplace_skill_slug_idx"),
             models.Index(fields=["category", "name"], name="marketplace_skill_category_idx"),
+            # Триграммные индексы автокомплита создаёт миграция 0010 и только при
+            # наличии pg_trgm, поэтому в состоянии модели их нет.
         ]
 
     def __str__(self) -> str:  # pragma: no cover - simple data representation
@@ -71,6 +75,7 @@ class SkillSynonym(models.Model):
         unique_together = ("skill", "language", "value")
         indexes = [
             models.Index(fields=["language", "value"], name="skill_synonym_language_idx"),
+            # Триграммный индекс по value — в миграции 0010, как и у Skill.
         ]
 
     def __str__(self) -> str:  # pragma: no cover - simple data representation
@@ -135,11 +140,18 @@ class Order(models.Model):
         on_delete=models.CASCADE,
         related_name="orders",
     )
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Поля полнотекстового индекса: (вес A, вес B).
+    SEARCH_FIELDS = ("title", "description")
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="order_search_vector_gin"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple data representation
         return f"{self.title} ({self.get_status_display()})"
@@ -360,3 +372,49 @@ class Contract(models.Model):
             )
             self._update_order_status(Order.STATUS_CANCELLED)
         return compensation
+
+
+class RecommendationSnapshot(models.Model):
+    """Материализованный рейтинг рекомендаций для заказа или исполнителя."""
+
+    KIND_INVITES = "invites"
+    KIND_ORDERS = "orders"
+    KIND_CHOICES = [
+        (KIND_INVITES, "Order → freelancers"),
+        (KIND_ORDERS, "Freelancer → orders"),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    subject_id = models.PositiveBigIntegerField()
+    locale = models.CharField(max_length=8, default="ru")
+    items = models.JSONField(default=list, blank=True)
+    source = models.CharField(max_length=16, default="ai")
+    is_stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("kind", "subject_id", "locale")
+        indexes = [
+            models.Index(fields=["kind", "is_stale"], name="recommendation_stale_idx"),
+            # Обратный индекс для инвалидации: ``items @> [{"identifier": id}]``.
+            GinIndex(
+                fields=["items"],
+                name="recommendation_items_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - simple data representation
+        return f"RecommendationSnapshot({self.kind}:{self.subject_id}:{self.locale})"
+
+
+class BackfillCheckpoint(models.Model):
+    """Позиция keyset-обхода для возобновляемых фоновых пересчётов."""
+
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover - simple data representation
+        return f"BackfillCheckpoint({self.name}@{self.position})"
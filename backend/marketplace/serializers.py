@@ -2,7 +2,7 @@ from rest_framework import serializers
 
 from accounts.models import Profile
 from accounts.serializers import ProfileSerializer
-from obsidian_backend.ai import tldr as tldr_cache
+from obsidian_backend.ai.serializers import TldrListSerializer, TldrSerializerMixin
 
 from .models import Category, Contract, Order, OrderApplication, Skill
 
@@ -25,7 +25,9 @@ class SkillSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "category")
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TldrSerializerMixin, serializers.ModelSerializer):
+    tldr_entity = "order"
+
     client = ProfileSerializer(read_only=True)
     client_id = serializers.PrimaryKeyRelatedField(
         source="client",
@@ -43,6 +45,7 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
+        list_serializer_class = TldrListSerializer
         fields = (
             "id",
             "title",
@@ -90,22 +93,11 @@ class OrderSerializer(serializers.ModelSerializer):
             order.required_skills.set(skills)
         return order
 
-    def _resolve_locale(self) -> str:
-        request = self.context.get("request")
-        if request is not None:
-            header = request.headers.get("Accept-Language")
-            if header:
-                return header.split(",")[0].strip() or "ru"
-        return self.context.get("locale", "ru")
-
-    def get_tldr(self, obj: Order) -> str | None:
-        locale = self._resolve_locale()
-        return tldr_cache.get_tldr(
-            entity="order",
-            pk=obj.pk,
-            locale=locale,
-            fetcher=obj.get_tldr,
-        )
+    def tldr_targets(self, instances: list):
+        # Вложенный ``client`` тоже показывает TL;DR — грузим его вместе с заказами.
+        for order in instances:
+            yield "order", order
+            yield "profile", order.client
 
 
 class OrderApplicationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,257 @@
+"""Материализованные рекомендации: чтение, инвалидация и пересчёт.
+
+Представления читают готовый рейтинг из ``RecommendationSnapshot`` и только при
+промахе (нет строки, она старше ``RECOMMENDATIONS_SNAPSHOT_TTL_SECONDS`` или
+помечена ``is_stale``) считают его вживую через ai-gateway. Если шлюз при этом
+недоступен, устаревший рейтинг всё равно лучше эвристики fallback и отдаётся
+как есть. Сигналы помечают затронутые строки ``is_stale`` после коммита;
+команда ``materialize_recommendations --stale-only`` пересчитывает их заранее,
+не дожидаясь запросов.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from accounts.models import Profile
+from marketplace.models import Order, RecommendationSnapshot
+
+from .recommendations import execute_match, execute_match_batch
+
+_INVITES = RecommendationSnapshot.KIND_INVITES
+_ORDERS = RecommendationSnapshot.KIND_ORDERS
+
+
+def snapshot_locale(locale: str) -> str:
+    return "uz" if (locale or "ru").lower().startswith("uz") else "ru"
+
+
+def _fresh_snapshot(kind: str, subject_id: int, locale: str) -> RecommendationSnapshot | None:
+    cutoff = timezone.now() - timedelta(seconds=settings.RECOMMENDATIONS_SNAPSHOT_TTL_SECONDS)
+    return (
+        RecommendationSnapshot.objects.filter(
+            kind=kind,
+            subject_id=subject_id,
+            locale=snapshot_locale(locale),
+            computed_at__gte=cutoff,
+        )
+        .only("items", "source", "is_stale")
+        .first()
+    )
+
+
+def _store(kind: str, subject_id: int, locale: str, items: list, source: str) -> None:
+    # Fallback-рейтинг не материализуем: следующий запрос попробует ai-gateway снова.
+    if source == "fallback":
+        return
+    RecommendationSnapshot.objects.update_or_create(
+        kind=kind,
+        subject_id=subject_id,
+        locale=snapshot_locale(locale),
+        defaults={
+            "items": items,
+            "source": source,
+            "is_stale": False,
+            "computed_at": timezone.now(),
+        },
+    )
+
+
+def _stored_or_live(
+    kind: str,
+    subject_id: int,
+    locale: str,
+    result_key: str,
+    compute: Callable[[], dict],
+) -> tuple[list, str]:
+    snapshot = _fresh_snapshot(kind, subject_id, locale)
+    if snapshot is not None and not snapshot.is_stale:
+        return snapshot.items, snapshot.source
+    result = compute()
+    items = result.get(result_key, [])
+    source = result.get("source", "ai")
+    if source == "fallback" and snapshot is not None:
+        return snapshot.items, snapshot.source
+    _store(kind, subject_id, locale, items, source)
+    return items, source
+
+
+def get_invite_recommendations(*, order: Order, locale: str) -> tuple[list, str]:
+    return _stored_or_live(
+        _INVITES,
+        order.id,
+        locale,
+        "invite_recommendations",
+        lambda: execute_match(order=order, profile=None, locale=locale),
+    )
+
+
+def get_order_recommendations(*, profile: Profile, locale: str) -> tuple[list, str]:
+    return _stored_or_live(
+        _ORDERS,
+        profile.id,
+        locale,
+        "order_recommendations",
+        lambda: execute_match(order=None, profile=profile, locale=locale),
+    )
+
+
+# ------------------------------------------------------------------ invalidation
+# Поля, попадающие в payload /match или в отбор кандидатов.
+_ORDER_RANKING_FIELDS = {
+    "title",
+    "description",
+    "budget",
+    "payment_type",
+    "order_type",
+    "status",
+    "required_skills",
+    "tldr_ru",
+    "tldr_uz",
+}
+_PROFILE_RANKING_FIELDS = {
+    "role",
+    "headline",
+    "bio",
+    "tldr_ru",
+    "tldr_uz",
+    "hourly_rate",
+    "min_budget",
+    "availability",
+    "languages",
+    "location",
+    "country",
+    "visibility",
+    "avatar",
+    "skills",
+    "is_completed",
+    "is_verified",
+}
+
+
+def _touches_ranking(update_fields, fields: set[str]) -> bool:
+    return update_fields is None or bool(set(update_fields) & fields)
+
+
+def _containing(kind: str, identifier: int) -> Q:
+    return Q(kind=kind, items__contains=[{"identifier": identifier}])
+
+
+def _mark_stale_for_order(order: Order) -> int:
+    snapshots = RecommendationSnapshot.objects.all()
+    if order.status != Order.STATUS_PUBLISHED:
+        snapshots.filter(kind=_INVITES, subject_id=order.id).delete()
+        return snapshots.filter(_containing(_ORDERS, order.id)).update(is_stale=True)
+    candidates = Profile.objects.filter(
+        role=Profile.ROLE_FREELANCER, skills__in=order.required_skills.all()
+    ).values("id")
+    return snapshots.filter(
+        Q(kind=_INVITES, subject_id=order.id)
+        | _containing(_ORDERS, order.id)
+        | Q(kind=_ORDERS, subject_id__in=candidates)
+    ).update(is_stale=True)
+
+
+def _mark_stale_for_profile(profile_id: int, own_ranking: bool) -> int:
+    matching_orders = Order.objects.filter(
+        status=Order.STATUS_PUBLISHED,
+        required_skills__profiles=profile_id,
+    ).values("id")
+    condition = _containing(_INVITES, profile_id) | Q(
+        kind=_INVITES, subject_id__in=matching_orders
+    )
+    if own_ranking:
+        condition |= Q(kind=_ORDERS, subject_id=profile_id)
+    return RecommendationSnapshot.objects.filter(condition).update(is_stale=True)
+
+
+def invalidate_for_order(order: Order, update_fields=None) -> None:
+    """Заказ изменился: его рейтинг и подборки исполнителей с пересекающимися навыками.
+
+    Пометка выполняется после коммита, вне транзакции сохранения заказа.
+    ``save(update_fields=...)`` без полей рейтинга ничего не помечает.
+    """
+
+    if not _touches_ranking(update_fields, _ORDER_RANKING_FIELDS):
+        return
+    transaction.on_commit(lambda: _mark_stale_for_order(order))
+
+
+def invalidate_for_profile(
+    profile_id: int, *, own_ranking: bool, update_fields=None
+) -> None:
+    """Профиль изменился: рейтинги заказов, где он есть или может появиться.
+
+    ``own_ranking`` помечает и подборку заказов самого профиля.
+    """
+
+    if not _touches_ranking(update_fields, _PROFILE_RANKING_FIELDS):
+        return
+    transaction.on_commit(lambda: _mark_stale_for_profile(profile_id, own_ranking))
+
+
+# ------------------------------------------------------------------- refresh
+def _chunks(queryset: QuerySet, size: int) -> Iterator[list]:
+    batch: list = []
+    for item in queryset.iterator(chunk_size=size):
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _stale_ids(kind: str, locale: str) -> QuerySet:
+    return RecommendationSnapshot.objects.filter(
+        kind=kind, locale=snapshot_locale(locale), is_stale=True
+    ).values("subject_id")
+
+
+def refresh_invites(*, locale: str, stale_only: bool, batch_size: int) -> int:
+    """Пересчитать рейтинги исполнителей для опубликованных заказов через /match/batch."""
+
+    orders = Order.objects.filter(status=Order.STATUS_PUBLISHED).select_related(
+        "client", "client__user"
+    )
+    if stale_only:
+        orders = orders.filter(id__in=_stale_ids(_INVITES, locale))
+    refreshed = 0
+    for chunk in _chunks(orders.order_by("pk"), batch_size):
+        results = execute_match_batch(orders=chunk, locale=locale)
+        for order_id, result in results.items():
+            _store(
+                _INVITES,
+                order_id,
+                locale,
+                result["invite_recommendations"],
+                result["source"],
+            )
+        refreshed += len(chunk)
+    return refreshed
+
+
+def refresh_orders(*, locale: str, stale_only: bool) -> int:
+    """Пересчитать подборки заказов для исполнителей."""
+
+    profiles = Profile.objects.filter(role=Profile.ROLE_FREELANCER, is_completed=True)
+    if stale_only:
+        profiles = profiles.filter(id__in=_stale_ids(_ORDERS, locale))
+    refreshed = 0
+    for profile in profiles.order_by("pk").iterator(chunk_size=200):
+        result = execute_match(order=None, profile=profile, locale=locale)
+        _store(
+            _ORDERS,
+            profile.id,
+            locale,
+            result.get("order_recommendations", []),
+            result.get("source", "ai"),
+        )
+        refreshed += 1
+    return refreshed
@@ -2,16 +2,17 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict, dataclass
 from datetime import timedelta
-from typing import Iterable
 
-from django.db.models import Prefetch, Q
+from django.db.models import Q
 
 from accounts.models import Profile
 from marketplace.models import Order
 from obsidian_backend.ai.client import AiGatewayClient, AiGatewayError
-from profiles.models import ProfileStats
+from profiles.models import ProfileBadge, ProfileStats
 
 _MATCH_LIMIT = 200
 
@@ -47,44 +48,116 @@ def _response_minutes(stats: ProfileStats | None) -> float:
     return float(stats.response_time)
 
 
-def _serialize_profile(profile: Profile, *, locale: str) -> dict:
-    stats = getattr(profile, "stats", None)
-    skill_slugs = list(profile.skills.values_list("slug", flat=True))
-    badges = list(profile.badges.values_list("badge_type", flat=True))
+def _skill_slugs_by_profile(profile_ids: Sequence[int]) -> dict[int, list[str]]:
+    slugs: dict[int, list[str]] = defaultdict(list)
+    rows = (
+        Profile.skills.through.objects.filter(profile_id__in=profile_ids)
+        .order_by("skill__name")
+        .values_list("profile_id", "skill__slug")
+    )
+    for profile_id, slug in rows:
+        slugs[profile_id].append(slug)
+    return slugs
+
+
+def _badges_by_profile(profile_ids: Sequence[int]) -> dict[int, list[str]]:
+    badges: dict[int, list[str]] = defaultdict(list)
+    rows = ProfileBadge.objects.filter(profile_id__in=profile_ids).values_list(
+        "profile_id", "badge_type"
+    )
+    for profile_id, badge_type in rows:
+        badges[profile_id].append(badge_type)
+    return badges
+
+
+def _stats_by_profile(profile_ids: Sequence[int]) -> dict[int, ProfileStats]:
     return {
-        "id": profile.id,
-        "slug": profile.slug,
-        "skills": skill_slugs,
-        "hourly_rate": float(profile.hourly_rate or 0),
-        "min_budget": float(profile.min_budget or 0),
-        "availability": profile.availability,
-        "location": profile.location,
-        "languages": profile.languages,
-        "profile_score": _profile_score(profile, stats),
-        "historical_conversion": {
-            "view_to_invite": _safe_ratio(getattr(stats, "invites", 0), getattr(stats, "views", 0)),
-            "invite_to_hire": float(getattr(stats, "hire_rate", 0)) / 100,
-        },
-        "escrow_share": float(getattr(stats, "escrow_share", 0)) / 100,
-        "response_time_minutes": _response_minutes(stats),
-        "tldr": profile.get_tldr(locale),
-        "badges": badges,
+        stats.profile_id: stats
+        for stats in ProfileStats.objects.filter(profile_id__in=profile_ids)
     }
 
 
+def _skill_slugs_by_order(order_ids: Sequence[int]) -> dict[int, list[str]]:
+    slugs: dict[int, list[str]] = defaultdict(list)
+    rows = (
+        Order.required_skills.through.objects.filter(order_id__in=order_ids)
+        .order_by("skill__name")
+        .values_list("order_id", "skill__slug")
+    )
+    for order_id, slug in rows:
+        slugs[order_id].append(slug)
+    return slugs
+
+
+def serialize_profiles(profiles: Iterable[Profile], *, locale: str) -> list[dict]:
+    """Payload-строки для профилей: навыки, бейджи и статистика — тремя запросами."""
+
+    profiles = list(profiles)
+    ids = [profile.id for profile in profiles]
+    if not ids:
+        return []
+    skills = _skill_slugs_by_profile(ids)
+    badges = _badges_by_profile(ids)
+    stats_map = _stats_by_profile(ids)
+    rows = []
+    for profile in profiles:
+        stats = stats_map.get(profile.id)
+        rows.append(
+            {
+                "id": profile.id,
+                "slug": profile.slug,
+                "skills": skills.get(profile.id, []),
+                "hourly_rate": float(profile.hourly_rate or 0),
+                "min_budget": float(profile.min_budget or 0),
+                "availability": profile.availability,
+                "location": profile.location,
+                "languages": profile.languages,
+                "profile_score": _profile_score(profile, stats),
+                "historical_conversion": {
+                    "view_to_invite": _safe_ratio(
+                        getattr(stats, "invites", 0), getattr(stats, "views", 0)
+                    ),
+                    "invite_to_hire": float(getattr(stats, "hire_rate", 0)) / 100,
+                },
+                "escrow_share": float(getattr(stats, "escrow_share", 0)) / 100,
+                "response_time_minutes": _response_minutes(stats),
+                "tldr": profile.get_tldr(locale),
+                "badges": badges.get(profile.id, []),
+            }
+        )
+    return rows
+
+
+def serialize_orders(orders: Iterable[Order], *, locale: str) -> list[dict]:
+    """Payload-строки для заказов; навыки всех заказов — одним запросом."""
+
+    orders = list(orders)
+    if not orders:
+        return []
+    skills = _skill_slugs_by_order([order.id for order in orders])
+    return [
+        {
+            "id": order.id,
+            "title": order.title,
+            "description": order.description,
+            "budget": float(order.budget),
+            "payment_type": order.payment_type,
+            "order_type": order.order_type,
+            "availability": getattr(order.client, "availability", None),
+            "location": getattr(order.client, "location", {}),
+            "skills": skills.get(order.id, []),
+            "tldr": order.get_tldr(locale),
+        }
+        for order in orders
+    ]
+
+
+def _serialize_profile(profile: Profile, *, locale: str) -> dict:
+    return serialize_profiles([profile], locale=locale)[0]
+
+
 def _serialize_order(order: Order, *, locale: str) -> dict:
-    return {
-        "id": order.id,
-        "title": order.title,
-        "description": order.description,
-        "budget": float(order.budget),
-        "payment_type": order.payment_type,
-        "order_type": order.order_type,
-        "availability": getattr(order.client, "availability", None),
-        "location": getattr(order.client, "location", {}),
-        "skills": list(order.required_skills.values_list("slug", flat=True)),
-        "tldr": order.get_tldr(locale),
-    }
+    return serialize_orders([order], locale=locale)[0]
 
 
 def _collect_profiles(order: Order) -> Iterable[Profile]:
@@ -95,11 +168,6 @@ def _collect_profiles(order: Order) -> Iterable[Profile]:
             visibility=Profile.VISIBILITY_PUBLIC,
         )
         .select_related("user")
-        .prefetch_related(
-            "skills",
-            "badges",
-            Prefetch("stats", ProfileStats.objects.all()),
-        )
     )
     if order.required_skills.exists():
         base_queryset = base_queryset.filter(skills__in=order.required_skills.all())
@@ -114,7 +182,6 @@ def _collect_orders(profile: Profile) -> Iterable[Order]:
     queryset = (
         Order.objects.filter(status=Order.STATUS_PUBLISHED)
         .select_related("client", "client__user")
-        .prefetch_related("required_skills")
     )
     if profile.skills.exists():
         queryset = queryset.filter(required_skills__in=profile.skills.all())
@@ -138,11 +205,15 @@ def _jaccard(a: set[str], b: set[str]) -> float:
 
 
 def _fallback_rank(order: Order, profiles: Iterable[Profile]) -> list[RankedItem]:
-    order_skills = set(order.required_skills.values_list("slug", flat=True))
+    profiles = list(profiles)
+    ids = [profile.id for profile in profiles]
+    order_skills = set(_skill_slugs_by_order([order.id]).get(order.id, []))
+    skills = _skill_slugs_by_profile(ids) if ids else {}
+    stats_map = _stats_by_profile(ids) if ids else {}
     ranked: list[RankedItem] = []
     for profile in profiles:
-        stats = getattr(profile, "stats", None)
-        skill_score = _jaccard(order_skills, set(profile.skills.values_list("slug", flat=True)))
+        stats = stats_map.get(profile.id)
+        skill_score = _jaccard(order_skills, set(skills.get(profile.id, [])))
         budget_penalty = 0.0
         if profile.hourly_rate and order.payment_type == Order.PAYMENT_HOURLY:
             budget_penalty = min(float(profile.hourly_rate) / float(order.budget or 1), 2)
@@ -165,10 +236,12 @@ def _fallback_rank(order: Order, profiles: Iterable[Profile]) -> list[RankedItem
 
 
 def _fallback_rank_orders(profile: Profile, orders: Iterable[Order]) -> list[RankedItem]:
-    profile_skills = set(profile.skills.values_list("slug", flat=True))
+    orders = list(orders)
+    profile_skills = set(_skill_slugs_by_profile([profile.id]).get(profile.id, []))
+    skills = _skill_slugs_by_order([order.id for order in orders]) if orders else {}
     ranked: list[RankedItem] = []
     for order in orders:
-        overlap = _jaccard(profile_skills, set(order.required_skills.values_list("slug", flat=True)))
+        overlap = _jaccard(profile_skills, set(skills.get(order.id, [])))
         budget_alignment = 1.0
         if profile.hourly_rate and order.payment_type == Order.PAYMENT_HOURLY:
             budget_alignment = min(float(order.budget or 0) / float(profile.hourly_rate), 2)
@@ -194,32 +267,93 @@ def build_match_payload(
     orders = list(_collect_orders(profile)) if profile else []
     return {
         "job": _serialize_order(order, locale=locale) if order else None,
-        "profiles": [_serialize_profile(p, locale=locale) for p in profiles],
+        "profiles": serialize_profiles(profiles, locale=locale),
         "freelancer": _serialize_profile(profile, locale=locale) if profile else None,
-        "orders": [_serialize_order(o, locale=locale) for o in orders],
+        "orders": serialize_orders(orders, locale=locale),
         "locale": locale,
     }
 
 
+def _fallback_match(*, order: Order | None, profile: Profile | None) -> dict:
+    fallback_profiles = list(_collect_profiles(order)) if order else []
+    fallback_orders = list(_collect_orders(profile)) if profile else []
+    return {
+        "invite_recommendations": [
+            asdict(item) for item in _fallback_rank(order, fallback_profiles)
+        ]
+        if order
+        else [],
+        "order_recommendations": [
+            asdict(item) for item in _fallback_rank_orders(profile, fallback_orders)
+        ]
+        if profile
+        else [],
+        "source": "fallback",
+    }
+
+
 def execute_match(*, order: Order | None, profile: Profile | None, locale: str) -> dict:
-    payload = build_match_payload(order=order, profile=profile, locale=locale)
     client = AiGatewayClient()
+    if not client.is_available:
+        # Breaker разомкнут — не тратим время на сборку payload.
+        return _fallback_match(order=order, profile=profile)
+    payload = build_match_payload(order=order, profile=profile, locale=locale)
     try:
         return client.match(payload)
     except AiGatewayError:
-        fallback_profiles = list(_collect_profiles(order)) if order else []
-        fallback_orders = list(_collect_orders(profile)) if profile else []
-        return {
-            "invite_recommendations": [
-                item.__dict__
-                for item in _fallback_rank(order, fallback_profiles)
-            ]
-            if order
-            else [],
-            "order_recommendations": [
-                item.__dict__ for item in _fallback_rank_orders(profile, fallback_orders)
-            ]
-            if profile
-            else [],
+        return _fallback_match(order=order, profile=profile)
+
+
+def build_match_batch_payload(*, orders: Iterable[Order], locale: str) -> dict:
+    """Payload для /match/batch: каждый профиль сериализуется один раз."""
+
+    orders = list(orders)
+    jobs = serialize_orders(orders, locale=locale)
+    pool: dict[int, Profile] = {}
+    for order, job in zip(orders, jobs, strict=True):
+        candidates = list(_collect_profiles(order))
+        for candidate in candidates:
+            pool.setdefault(candidate.id, candidate)
+        job["candidate_ids"] = [candidate.id for candidate in candidates]
+    return {
+        "jobs": jobs,
+        "profiles": serialize_profiles(pool.values(), locale=locale),
+        "locale": locale,
+    }
+
+
+def execute_match_batch(*, orders: Iterable[Order], locale: str) -> dict[int, dict]:
+    """Рекомендации исполнителей для нескольких заказов за один вызов шлюза.
+
+    Возвращает ``{order_id: {"invite_recommendations": [...], "source": ...}}``;
+    при недоступности ai-gateway каждый заказ ранжируется fallback-алгоритмом.
+    """
+
+    orders = list(orders)
+    if not orders:
+        return {}
+    client = AiGatewayClient()
+    if client.is_available:
+        payload = build_match_batch_payload(orders=orders, locale=locale)
+        try:
+            response = client.match_batch(payload)
+        except AiGatewayError:
+            pass
+        else:
+            source = response.get("source", "ai")
+            return {
+                item["job_id"]: {
+                    "invite_recommendations": item["invite_recommendations"],
+                    "source": source,
+                }
+                for item in response.get("results", [])
+            }
+    return {
+        order.id: {
+            "invite_recommendations": _fallback_match(order=order, profile=None)[
+                "invite_recommendations"
+            ],
             "source": "fallback",
         }
+        for order in orders
+    }
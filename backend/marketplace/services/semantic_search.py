@@ -1,126 +1,329 @@
-"""Сбор данных и fallback для семантического поиска."""
+"""Сбор данных и fallback для семантического поиска.
+
+Документы для ai-gateway берутся из снимка в общем кеше: до ``_MAX_DOCS``
+сериализованных строк на сущность с номером версии. Сохранение заказа,
+профиля или кейса увеличивает версию и точечно правит снимок; если правка
+не удалась (занят лок, снимок устарел), снимок перестраивается при следующем
+поиске. TL;DR в снимок не входят — они зависят от языка и обновляются
+backfill'ом в обход сигналов, поэтому подставляются при чтении одним
+``get_many``.
+"""
 
 from __future__ import annotations
 
-from typing import Iterable
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from datetime import datetime
 
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model, QuerySet
 
 from accounts.models import Profile
 from marketplace.models import Order
-from obsidian_backend.ai.client import AiGatewayClient, AiGatewayError
 from obsidian_backend.ai import tldr as tldr_cache
+from obsidian_backend.ai.client import AiGatewayClient, AiGatewayError
+from obsidian_backend.feature_flags import is_feature_enabled
+from obsidian_backend.full_text import search_query, search_rank
 from profiles.models import PortfolioItem
 
+from .recommendations import _skill_slugs_by_order, _skill_slugs_by_profile
+
 _MAX_DOCS = 200
 
+_ID_PREFIX = {"orders": "order", "profiles": "profile", "portfolio": "portfolio"}
+_MODELS = {"orders": Order, "profiles": Profile, "portfolio": PortfolioItem}
+_ENTITIES = {model: entity for entity, model in _MODELS.items()}
+# Поля, попадающие в документ или его позицию в снимке.
+_DOCUMENT_FIELDS = {
+    "orders": {"title", "description", "budget", "payment_type", "status", "created_at"},
+    "profiles": {
+        "headline",
+        "bio",
+        "hourly_rate",
+        "location",
+        "role",
+        "visibility",
+        "updated_at",
+    },
+    "portfolio": {"title", "problem", "solution", "result", "tags", "status", "created_at"},
+}
+_SNAPSHOT_KEY = "search:documents:{entity}"
+_VERSION_KEY = "search:documents:{entity}:version"
+_LOCK_KEY = "search:documents:{entity}:lock"
+_LOCK_TIMEOUT = 10
 
-def _serialize_order(order: Order, locale: str) -> dict:
-    return {
-        "id": f"order:{order.id}",
-        "title": order.title,
-        "body": order.description,
-        "tldr": tldr_cache.get_tldr(
-            entity="order",
-            pk=order.pk,
-            locale=locale,
-            fetcher=order.get_tldr,
-        ),
-        "metadata": {
-            "budget": str(order.budget),
-            "payment_type": order.payment_type,
-            "skills": list(order.required_skills.values_list("slug", flat=True)),
-        },
-    }
 
+def _serialize_orders(orders: list[Order]) -> list[dict]:
+    skills = _skill_slugs_by_order([order.id for order in orders])
+    return [
+        {
+            "id": f"order:{order.id}",
+            "title": order.title,
+            "body": order.description,
+            "tldr": None,
+            "metadata": {
+                "budget": str(order.budget),
+                "payment_type": order.payment_type,
+                "skills": skills.get(order.id, []),
+            },
+        }
+        for order in orders
+    ]
 
-def _serialize_profile(profile: Profile, locale: str) -> dict:
-    return {
-        "id": f"profile:{profile.id}",
-        "title": profile.headline or profile.user.full_name,
-        "body": profile.bio,
-        "tldr": tldr_cache.get_tldr(
-            entity="profile",
-            pk=profile.pk,
-            locale=locale,
-            fetcher=profile.get_tldr,
-        ),
-        "metadata": {
-            "skills": list(profile.skills.values_list("slug", flat=True)),
-            "hourly_rate": str(profile.hourly_rate or ""),
-            "location": profile.location,
-        },
-    }
 
+def _serialize_profiles(profiles: list[Profile]) -> list[dict]:
+    skills = _skill_slugs_by_profile([profile.id for profile in profiles])
+    return [
+        {
+            "id": f"profile:{profile.id}",
+            "title": profile.headline or profile.user.full_name,
+            "body": profile.bio,
+            "tldr": None,
+            "metadata": {
+                "skills": skills.get(profile.id, []),
+                "hourly_rate": str(profile.hourly_rate or ""),
+                "location": profile.location,
+            },
+        }
+        for profile in profiles
+    ]
 
-def _serialize_portfolio(item: PortfolioItem) -> dict:
-    return {
-        "id": f"portfolio:{item.id}",
-        "title": item.title,
-        "body": "\n".join(filter(None, [item.problem, item.solution, item.result])),
-        "tldr": None,
-        "metadata": {"tags": item.tags, "status": item.status},
-    }
+
+def _serialize_portfolio(items: list[PortfolioItem]) -> list[dict]:
+    return [
+        {
+            "id": f"portfolio:{item.id}",
+            "title": item.title,
+            "body": "\n".join(filter(None, [item.problem, item.solution, item.result])),
+            "tldr": None,
+            "metadata": {"tags": item.tags, "status": item.status},
+        }
+        for item in items
+    ]
 
 
-def _load_documents(entity: str, locale: str) -> Iterable[dict]:
+def _searchable_queryset(entity: str) -> QuerySet:
     if entity == "orders":
-        queryset = (
-            Order.objects.filter(status=Order.STATUS_PUBLISHED)
-            .select_related("client", "client__user")
-            .prefetch_related("required_skills")
-            .order_by("-created_at")[:_MAX_DOCS]
-        )
-        return [_serialize_order(order, locale) for order in queryset]
+        return Order.objects.filter(status=Order.STATUS_PUBLISHED)
+    if entity == "profiles":
+        return Profile.objects.filter(
+            role=Profile.ROLE_FREELANCER, visibility=Profile.VISIBILITY_PUBLIC
+        ).select_related("user")
+    return PortfolioItem.objects.filter(status=PortfolioItem.STATUS_PUBLISHED)
+
+
+def _serialize_many(entity: str, objects: Iterable) -> list[dict]:
+    """Документы без TL;DR; навыки всех строк — одним запросом."""
+
+    objects = list(objects)
+    if not objects:
+        return []
+    if entity == "orders":
+        return _serialize_orders(objects)
     if entity == "profiles":
-        queryset = (
-            Profile.objects.filter(role=Profile.ROLE_FREELANCER, visibility=Profile.VISIBILITY_PUBLIC)
-            .select_related("user")
-            .prefetch_related("skills")
-            .order_by("-updated_at")[:_MAX_DOCS]
+        return _serialize_profiles(objects)
+    return _serialize_portfolio(objects)
+
+
+def _attach_tldrs(entity: str, documents: list[dict], locale: str) -> list[dict]:
+    if entity == "portfolio" or not documents:
+        return documents
+    model = _MODELS[entity]
+
+    def load(pks: list) -> dict:
+        rows = model.objects.filter(pk__in=pks).only("pk", "tldr_ru", "tldr_uz")
+        return {obj.pk: obj.get_tldr(locale) for obj in rows}
+
+    pks = [int(document["id"].split(":", 1)[1]) for document in documents]
+    tldrs = tldr_cache.get_tldr_many(
+        entity=_ID_PREFIX[entity], locale=locale, pks=pks, loader=load
+    )
+    return [
+        {**document, "tldr": tldrs.get(pk)}
+        for pk, document in zip(pks, documents, strict=True)
+    ]
+
+
+# ------------------------------------------------------------------ snapshot
+def _ordering_field(entity: str) -> str:
+    return "updated_at" if entity == "profiles" else "created_at"
+
+
+def _entries(entity: str, objects: list) -> list[list]:
+    """Пары ``[-timestamp, документ]`` в порядке выдачи."""
+
+    field = _ordering_field(entity)
+    documents = _serialize_many(entity, objects)
+    return [
+        [-getattr(obj, field).timestamp(), document]
+        for obj, document in zip(objects, documents, strict=True)
+    ]
+
+
+def _current_version(entity: str) -> int:
+    key = _VERSION_KEY.format(entity=entity)
+    cache.add(key, 0, None)
+    return cache.get(key, 0)
+
+
+def _build_snapshot(entity: str) -> list[list]:
+    version = _current_version(entity)
+    objects = list(
+        _searchable_queryset(entity).order_by(f"-{_ordering_field(entity)}")[:_MAX_DOCS]
+    )
+    entries = _entries(entity, objects)
+    cache.set(
+        _SNAPSHOT_KEY.format(entity=entity),
+        {"version": version, "entries": entries},
+        settings.SEMANTIC_SEARCH_SNAPSHOT_TTL_SECONDS,
+    )
+    return entries
+
+
+def _snapshot_entries(entity: str) -> list[list]:
+    snapshot_key = _SNAPSHOT_KEY.format(entity=entity)
+    version_key = _VERSION_KEY.format(entity=entity)
+    cached = cache.get_many([snapshot_key, version_key])
+    snapshot = cached.get(snapshot_key)
+    if snapshot is not None and snapshot["version"] == cached.get(version_key, 0):
+        return snapshot["entries"]
+    return _build_snapshot(entity)
+
+
+def _load_documents(entity: str, locale: str) -> Iterable[dict]:
+    documents = [document for _, document in _snapshot_entries(entity)]
+    return _attach_tldrs(entity, documents, locale)
+
+
+def _patch_snapshot(entity: str, pk: int) -> None:
+    version_key = _VERSION_KEY.format(entity=entity)
+    cache.add(version_key, 0, None)
+    version = cache.incr(version_key)
+    lock_key = _LOCK_KEY.format(entity=entity)
+    if not cache.add(lock_key, 1, _LOCK_TIMEOUT):
+        # Другая правка в процессе: снимок уже невалиден по версии.
+        return
+    try:
+        snapshot_key = _SNAPSHOT_KEY.format(entity=entity)
+        snapshot = cache.get(snapshot_key)
+        if snapshot is None or snapshot["version"] != version - 1:
+            return
+        document_id = f"{_ID_PREFIX[entity]}:{pk}"
+        entries = [entry for entry in snapshot["entries"] if entry[1]["id"] != document_id]
+        obj = _searchable_queryset(entity).filter(pk=pk).first()
+        if obj is None and len(entries) < len(snapshot["entries"]) == _MAX_DOCS:
+            # Из полного снимка выпал документ — его место займёт неизвестный следующий.
+            cache.delete(snapshot_key)
+            return
+        if obj is not None:
+            [entry] = _entries(entity, [obj])
+            position = bisect_left([key for key, _ in entries], entry[0])
+            entries.insert(position, entry)
+            del entries[_MAX_DOCS:]
+        cache.set(
+            snapshot_key,
+            {"version": version, "entries": entries},
+            settings.SEMANTIC_SEARCH_SNAPSHOT_TTL_SECONDS,
         )
-        return [_serialize_profile(profile, locale) for profile in queryset]
-    queryset = (
-        PortfolioItem.objects.filter(status=PortfolioItem.STATUS_PUBLISHED)
-        .select_related("profile", "profile__user")
-        .order_by("-created_at")[:_MAX_DOCS]
+    finally:
+        cache.delete(lock_key)
+
+
+def refresh_search_document(instance: Model, update_fields=None) -> None:
+    """Обновить документ в снимке после коммита; без изменений полей — ничего."""
+
+    entity = _ENTITIES[type(instance)]
+    if update_fields is not None and not set(update_fields) & _DOCUMENT_FIELDS[entity]:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: _patch_snapshot(entity, pk))
+
+
+def iter_index_batches(
+    entity: str,
+    locale: str,
+    *,
+    batch_size: int = 500,
+    since: datetime | None = None,
+) -> Iterator[list[dict]]:
+    """Документы для ANN-индекса ai-gateway пачками с keyset-пагинацией по pk."""
+
+    queryset = _searchable_queryset(entity)
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield _attach_tldrs(entity, _serialize_many(entity, batch), locale)
+
+
+def unsearchable_document_ids(entity: str, *, since: datetime) -> list[str]:
+    """Id документов, изменённых с ``since`` и выпавших из поиска (для удаления из индекса)."""
+
+    model = _MODELS[entity]
+    searchable = _searchable_queryset(entity).values("pk")
+    pks = (
+        model.objects.filter(updated_at__gte=since)
+        .exclude(pk__in=searchable)
+        .values_list("pk", flat=True)
     )
-    return [_serialize_portfolio(item) for item in queryset]
+    return [f"{_ID_PREFIX[entity]}:{pk}" for pk in pks]
+
+
+def _snippet(text: str | None) -> str:
+    return (text or "")[:280]
 
 
 def _fallback_search(query: str, entity: str, locale: str) -> list[dict]:
-    normalized = query.lower()
-    results: list[dict] = []
+    """Ранжированный полнотекстовый поиск по GIN-индексу ``search_vector``."""
+
+    search = search_query(query, locale)
     if entity == "orders":
-        orders = Order.objects.filter(Q(title__icontains=normalized) | Q(description__icontains=normalized))[:20]
-        for order in orders:
-            results.append({
-                "id": order.id,
-                "score": 0.4,
-                "snippet": order.description[:280],
-            })
-        return results
-    if entity == "profiles":
-        profiles = Profile.objects.filter(
-            Q(headline__icontains=normalized) | Q(bio__icontains=normalized)
-        )[:20]
-        for profile in profiles:
-            results.append({
-                "id": profile.id,
-                "score": 0.35,
-                "snippet": profile.bio[:280],
-            })
-        return results
-    items = PortfolioItem.objects.filter(
-        Q(title__icontains=normalized) | Q(problem__icontains=normalized)
-    )[:20]
-    for item in items:
-        results.append({"id": item.id, "score": 0.3, "snippet": item.problem[:280]})
-    return results
+        queryset = Order.objects.only("id", "description")
+        text_field = "description"
+    elif entity == "profiles":
+        queryset = Profile.objects.only("id", "bio")
+        text_field = "bio"
+    else:
+        queryset = PortfolioItem.objects.only("id", "problem")
+        text_field = "problem"
+    matches = (
+        queryset.filter(search_vector=search)
+        .annotate(rank=search_rank(search))
+        .order_by("-rank", "-pk")[:20]
+    )
+    return [
+        {
+            "id": item.id,
+            "score": round(float(item.rank), 4),
+            "snippet": _snippet(getattr(item, text_field)),
+        }
+        for item in matches
+    ]
+
+
+def _fallback_response(query: str, entity: str, locale: str, limit: int) -> dict:
+    return {
+        "results": _fallback_search(query, entity, locale)[:limit],
+        "source": "fallback",
+    }
 
 
 def execute_semantic_search(*, query: str, entity: str, locale: str, limit: int) -> dict:
-    documents = list(_load_documents(entity, locale))
+    client = AiGatewayClient()
+    if not client.is_available:
+        # Breaker разомкнут — не грузим документы для заведомо неудачного вызова.
+        return _fallback_response(query, entity, locale, limit)
+    # С индексом каталога ai-gateway ищет по всем документам сам — payload без documents.
+    if is_feature_enabled("ai.search_index"):
+        documents: list[dict] = []
+    else:
+        documents = list(_load_documents(entity, locale))
     payload = {
         "query": query,
         "entity": entity,
@@ -128,11 +331,7 @@ def execute_semantic_search(*, query: str, entity: str, locale: str, limit: int)
         "limit": min(limit, 50),
         "documents": documents,
     }
-    client = AiGatewayClient()
     try:
         return client.semantic_search(payload)
     except AiGatewayError:
-        return {
-            "results": _fallback_search(query, entity, locale)[:limit],
-            "source": "fallback",
-        }
+        return _fallback_response(query, entity, locale, limit)
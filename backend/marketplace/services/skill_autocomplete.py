@@ -0,0 +1,235 @@
+"""Автокомплит навыков без выгрузки всего каталога на клиент.
+
+Префиксные совпадения по ``name``, ``title_ru``, ``title_uz`` и синонимам
+отдаёт префиксное дерево в памяти процесса: в каждом узле заранее лежат
+лучшие по ``popularity`` навыки. Если их меньше ``limit``, добор идёт
+триграммным запросом pg_trgm (опечатки, совпадения в середине слова) по
+GIN-индексам. Дерево перестраивается лениво: сигналы меняют версию каталога в
+общем кеше, и каждый процесс сверяет её при запросе.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from marketplace.models import Skill, SkillSynonym
+
+MAX_LIMIT = 20
+# Триграммы короче трёх символов почти ничего не отсекают.
+_TRIGRAM_MIN_LENGTH = 3
+_VERSION_KEY = "marketplace:skills:autocomplete:version"
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass(slots=True)
+class SkillSuggestion:
+    id: int
+    slug: str
+    name: str
+    title: str
+    popularity: int
+    score: float
+
+
+@dataclass(slots=True)
+class _SkillEntry:
+    id: int
+    slug: str
+    name: str
+    title_ru: str
+    title_uz: str
+    popularity: int
+
+    def title(self, locale: str) -> str:
+        localized = self.title_uz if locale.startswith("uz") else self.title_ru
+        return localized or self.name
+
+
+class _Node:
+    __slots__ = ("children", "skill_ids")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.skill_ids: set[int] | list[int] = set()
+
+
+def normalize_term(text: str) -> str:
+    return _SPACES.sub(" ", text.strip().lower())
+
+
+def _term_suffixes(term: str) -> list[str]:
+    """Сам термин и его хвосты с начала каждого слова: «react native» → «native»."""
+
+    words = term.split(" ")
+    return [" ".join(words[index:]) for index in range(len(words))]
+
+
+class SkillTrie:
+    """Префиксное дерево с топ-``MAX_LIMIT`` навыков в каждом узле."""
+
+    def __init__(self, entries: dict[int, _SkillEntry], terms: list[tuple[str, int]]):
+        self.entries = entries
+        self._root = _Node()
+        for term, skill_id in terms:
+            for suffix in _term_suffixes(term):
+                self._insert(suffix, skill_id)
+        self._finalize()
+
+    def _insert(self, term: str, skill_id: int) -> None:
+        node = self._root
+        for char in term:
+            node = node.children.setdefault(char, _Node())
+            node.skill_ids.add(skill_id)
+
+    def _finalize(self) -> None:
+        def rank(skill_id: int) -> tuple[int, str]:
+            entry = self.entries[skill_id]
+            return -entry.popularity, entry.name
+
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            node.skill_ids = sorted(node.skill_ids, key=rank)[:MAX_LIMIT]
+            stack.extend(node.children.values())
+
+    def lookup(self, prefix: str) -> list[int]:
+        node = self._root
+        for char in normalize_term(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return list(node.skill_ids)
+
+
+_trie: SkillTrie | None = None
+_trie_version: int | None = None
+_trie_lock = threading.Lock()
+
+
+def _build_trie() -> SkillTrie:
+    entries = {
+        row["id"]: _SkillEntry(**row)
+        for row in Skill.objects.filter(is_active=True).values(
+            "id", "slug", "name", "title_ru", "title_uz", "popularity"
+        )
+    }
+    terms: list[tuple[str, int]] = []
+    for entry in entries.values():
+        for text in (entry.name, entry.title_ru, entry.title_uz):
+            if text:
+                terms.append((normalize_term(text), entry.id))
+    synonyms = SkillSynonym.objects.filter(skill_id__in=entries).values_list(
+        "value", "skill_id"
+    )
+    terms.extend((normalize_term(value), skill_id) for value, skill_id in synonyms if value)
+    return SkillTrie(entries, terms)
+
+
+def get_skill_trie() -> SkillTrie:
+    global _trie, _trie_version
+    version = cache.get(_VERSION_KEY, 0)
+    trie = _trie
+    if trie is not None and _trie_version == version:
+        return trie
+    with _trie_lock:
+        if _trie is None or _trie_version != version:
+            _trie = _build_trie()
+            _trie_version = version
+        return _trie
+
+
+def invalidate_skill_autocomplete() -> None:
+    """Каталог навыков изменился: все процессы перестроят дерево при запросе."""
+
+    global _trie
+    cache.set(_VERSION_KEY, time.time_ns(), None)
+    _trie = None
+
+
+@lru_cache(maxsize=1)
+def trigram_available() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def _trigram_matches(query: str, *, exclude: list[int], limit: int) -> list[tuple[int, float]]:
+    synonym_similarity = (
+        SkillSynonym.objects.filter(skill=OuterRef("pk"))
+        .annotate(similarity=TrigramWordSimilarity(query, "value"))
+        .order_by("-similarity")
+        .values("similarity")[:1]
+    )
+    matching_synonyms = SkillSynonym.objects.filter(
+        value__trigram_word_similar=query
+    ).values("skill_id")
+    rows = (
+        Skill.objects.filter(is_active=True)
+        .filter(
+            Q(name__trigram_word_similar=query)
+            | Q(title_ru__trigram_word_similar=query)
+            | Q(title_uz__trigram_word_similar=query)
+            | Q(pk__in=matching_synonyms)
+        )
+        .exclude(pk__in=exclude)
+        .annotate(
+            similarity=Greatest(
+                TrigramWordSimilarity(query, "name"),
+                TrigramWordSimilarity(query, "title_ru"),
+                TrigramWordSimilarity(query, "title_uz"),
+                Coalesce(
+                    Subquery(synonym_similarity, output_field=FloatField()),
+                    Value(0.0),
+                ),
+            )
+        )
+        .order_by("-similarity", "-popularity", "name")
+        .values_list("pk", "similarity")[:limit]
+    )
+    return list(rows)
+
+
+def autocomplete_skills(query: str, *, locale: str, limit: int = 10) -> list[SkillSuggestion]:
+    """Префиксные совпадения из дерева, затем добор триграммами."""
+
+    term = normalize_term(query)
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not term:
+        return []
+    trie = get_skill_trie()
+    hits = [(skill_id, 1.0) for skill_id in trie.lookup(term)[:limit]]
+    if len(hits) < limit and len(term) >= _TRIGRAM_MIN_LENGTH and trigram_available():
+        hits.extend(
+            _trigram_matches(
+                term, exclude=[skill_id for skill_id, _ in hits], limit=limit - len(hits)
+            )
+        )
+    suggestions = []
+    for skill_id, score in hits:
+        entry = trie.entries.get(skill_id)
+        if entry is None:
+            # Навык появился после сборки дерева — сигнал уже сменил версию.
+            continue
+        suggestions.append(
+            SkillSuggestion(
+                id=entry.id,
+                slug=entry.slug,
+                name=entry.name,
+                title=entry.title(locale),
+                popularity=entry.popularity,
+                score=round(float(score), 4),
+            )
+        )
+    return suggestions
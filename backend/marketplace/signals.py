@@ -0,0 +1,92 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Profile
+from obsidian_backend.full_text import refresh_search_vector
+from profiles.models import PortfolioItem, ProfileStats
+
+from .models import Order, Skill, SkillSynonym
+from .services.materialized_recommendations import (
+    invalidate_for_order,
+    invalidate_for_profile,
+)
+from .services.semantic_search import refresh_search_document
+from .services.skill_autocomplete import invalidate_skill_autocomplete
+
+_M2M_ACTIONS = {"post_add", "post_remove", "post_clear"}
+
+
+@receiver(post_save, sender=Order)
+def invalidate_order_recommendations(
+    sender, instance: Order, update_fields=None, **_: object
+) -> None:
+    """Publishing or editing an order makes dependent rankings stale."""
+
+    invalidate_for_order(instance, update_fields)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_recommendations(
+    sender, instance: Profile, update_fields=None, **_: object
+) -> None:
+    """Edits to matching inputs make the profile's rankings stale."""
+
+    invalidate_for_profile(instance.id, own_ranking=True, update_fields=update_fields)
+
+
+@receiver(post_save, sender=Order)
+def update_order_search_vector(
+    sender, instance: Order, update_fields=None, **_: object
+) -> None:
+    """Keep the full-text vector in sync with title and description."""
+
+    refresh_search_vector(instance, update_fields)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=PortfolioItem)
+def update_search_document(sender, instance, update_fields=None, **_: object) -> None:
+    """Patch the cached semantic search snapshot once the change is committed."""
+
+    refresh_search_document(instance, update_fields)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=PortfolioItem)
+def remove_search_document(sender, instance, **_: object) -> None:
+    refresh_search_document(instance)
+
+
+@receiver(m2m_changed, sender=Order.required_skills.through)
+def invalidate_order_skills(
+    sender, instance: Order, action: str, reverse: bool, **_: object
+) -> None:
+    if action in _M2M_ACTIONS and not reverse:
+        invalidate_for_order(instance)
+        refresh_search_document(instance)
+
+
+@receiver(m2m_changed, sender=Profile.skills.through)
+def invalidate_profile_skills(
+    sender, instance: Profile, action: str, reverse: bool, **_: object
+) -> None:
+    if action in _M2M_ACTIONS and not reverse:
+        invalidate_for_profile(instance.id, own_ranking=True)
+        refresh_search_document(instance)
+
+
+@receiver(post_save, sender=ProfileStats)
+def invalidate_profile_stats(sender, instance: ProfileStats, **_: object) -> None:
+    invalidate_for_profile(instance.profile_id, own_ranking=False)
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=SkillSynonym)
+@receiver(post_delete, sender=SkillSynonym)
+def invalidate_skill_catalogue(sender, **_: object) -> None:
+    """Any catalogue edit rebuilds the autocomplete trie on next lookup."""
+
+    invalidate_skill_autocomplete()
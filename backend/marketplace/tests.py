@@ -1,3 +1,425 @@
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Profile, User
+from obsidian_backend.ai import tldr as tldr_cache
+from profiles.models import ProfileBadge, ProfileStats
+
+from .models import Category, Order, RecommendationSnapshot, Skill, SkillSynonym
+from .serializers import OrderSerializer
+from .services.materialized_recommendations import get_invite_recommendations
+from .services.recommendations import build_match_payload
+from .services.semantic_search import _load_documents
+from .services.skill_autocomplete import (
+    autocomplete_skills,
+    invalidate_skill_autocomplete,
+)
+
+
+class MatchPayloadQueryCountTests(TestCase):
+    # exists() по навыкам заказа, выборка кандидатов и по запросу на навыки,
+    # бейджи и статистику кандидатов, плюс навыки самого заказа.
+    EXPECTED_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Development", slug="development")
+        cls.skills = [
+            Skill.objects.create(name=f"Skill {index}", slug=f"skill-{index}", category=category)
+            for index in range(3)
+        ]
+        client_user = User.objects.create(
+            nickname="client",
+            email="client@example.com",
+            first_name="Client",
+            last_name="User",
+        )
+        cls.client_profile = Profile.objects.create(
+            user=client_user, role=Profile.ROLE_CLIENT, is_completed=True
+        )
+        cls.order = Order.objects.create(
+            title="Telegram bot",
+            description="Нужен бот для приёма заказов",
+            deadline=timezone.now() + timedelta(days=7),
+            payment_type=Order.PAYMENT_FIXED,
+            budget=100,
+            order_type=Order.ORDER_TYPE_STANDARD,
+            client=cls.client_profile,
+        )
+        cls.order.required_skills.set(cls.skills[:2])
+
+    def _add_candidates(self, count: int, offset: int = 0) -> None:
+        for index in range(offset, offset + count):
+            user = User.objects.create(
+                nickname=f"freelancer{index}",
+                email=f"freelancer{index}@example.com",
+                first_name="Free",
+                last_name="Lancer",
+            )
+            profile = Profile.objects.create(
+                user=user, role=Profile.ROLE_FREELANCER, is_completed=True, hourly_rate=20
+            )
+            profile.skills.set(self.skills)
+            ProfileStats.objects.create(profile=profile, views=10, invites=2)
+            ProfileBadge.objects.create(
+                profile=profile,
+                badge_type=ProfileBadge.BADGE_VERIFIED,
+                issued_at=timezone.now(),
+            )
+
+    def _payload_queries(self) -> tuple[dict, int]:
+        order = Order.objects.select_related("client").get(pk=self.order.pk)
+        with CaptureQueriesContext(connection) as context:
+            payload = build_match_payload(order=order, profile=None, locale="ru")
+        return payload, len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_candidates(self):
+        self._add_candidates(3)
+        payload, small = self._payload_queries()
+        self.assertEqual(len(payload["profiles"]), 3)
+
+        self._add_candidates(20, offset=3)
+        payload, large = self._payload_queries()
+        self.assertEqual(len(payload["profiles"]), 23)
+
+        self.assertEqual(small, self.EXPECTED_QUERIES)
+        self.assertEqual(large, self.EXPECTED_QUERIES)
+
+    def test_payload_rows_include_related_data(self):
+        self._add_candidates(1)
+        payload, _ = self._payload_queries()
+        row = payload["profiles"][0]
+        self.assertEqual(row["skills"], ["skill-0", "skill-1", "skill-2"])
+        self.assertEqual(row["badges"], [ProfileBadge.BADGE_VERIFIED])
+        self.assertAlmostEqual(row["historical_conversion"]["view_to_invite"], 0.2)
+        self.assertEqual(payload["job"]["skills"], ["skill-0", "skill-1"])
+
+
+class SkillAutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Development", slug="development")
+        cls.zephyr = Skill.objects.create(
+            name="Zephyr RTOS", slug="zephyr-rtos", category=category, popularity=50
+        )
+        cls.zeplin = Skill.objects.create(
+            name="Zeplin", slug="zeplin", category=category, popularity=5
+        )
+        cls.ionic = Skill.objects.create(
+            name="Ionic Native",
+            slug="ionic-native",
+            category=category,
+            title_ru="Гибридные приложения на Ionic",
+            popularity=20,
+        )
+        SkillSynonym.objects.create(
+            skill=cls.ionic, language=SkillSynonym.LANGUAGE_UZ, value="gibrid ilova"
+        )
+
+    def setUp(self):
+        invalidate_skill_autocomplete()
+
+    def _slugs(self, query: str, **kwargs) -> list[str]:
+        return [item.slug for item in autocomplete_skills(query, locale="ru", **kwargs)]
+
+    def test_prefix_ranked_by_popularity(self):
+        self.assertEqual(self._slugs("ze"), ["zephyr-rtos", "zeplin"])
+        self.assertEqual(self._slugs("ze", limit=1), ["zephyr-rtos"])
+
+    def test_matches_word_starts_titles_and_synonyms(self):
+        self.assertEqual(self._slugs("native"), ["ionic-native"])
+        self.assertEqual(self._slugs("гибридные"), ["ionic-native"])
+        self.assertEqual(self._slugs("Gibrid  IL"), ["ionic-native"])
+
+    def test_catalogue_changes_rebuild_trie(self):
+        self.assertEqual(self._slugs("zeph"), ["zephyr-rtos"])
+        Skill.objects.create(
+            name="Zephyr Cloud",
+            slug="zephyr-cloud",
+            category=self.zephyr.category,
+            popularity=80,
+        )
+        self.assertEqual(self._slugs("zeph"), ["zephyr-cloud", "zephyr-rtos"])
+        self.zephyr.is_active = False
+        self.zephyr.save()
+        self.assertEqual(self._slugs("zeph"), ["zephyr-cloud"])
+
+    def test_endpoint_localizes_titles(self):
+        response = self.client.get(
+            "/api/marketplace/skills/autocomplete/",
+            {"q": "ionic"},
+            HTTP_ACCEPT_LANGUAGE="ru",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"][0]["title"], "Гибридные приложения на Ionic"
+        )
+
+
+class SearchDocumentSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client_user = User.objects.create(
+            nickname="snapshot-client",
+            email="snapshot-client@example.com",
+            first_name="Client",
+            last_name="User",
+        )
+        cls.client_profile = Profile.objects.create(
+            user=client_user, role=Profile.ROLE_CLIENT, is_completed=True
+        )
+        cls.orders = [cls._create_order(f"Order {index}") for index in range(3)]
+
+    @classmethod
+    def _create_order(cls, title: str) -> Order:
+        return Order.objects.create(
+            title=title,
+            description="Описание",
+            deadline=timezone.now() + timedelta(days=7),
+            payment_type=Order.PAYMENT_FIXED,
+            budget=100,
+            order_type=Order.ORDER_TYPE_STANDARD,
+            client=cls.client_profile,
+            status=Order.STATUS_PUBLISHED,
+            tldr_ru=f"Кратко: {title}",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _titles(self) -> list[str]:
+        return [document["title"] for document in _load_documents("orders", "ru")]
+
+    def test_snapshot_is_reused_between_searches(self):
+        self.assertEqual(self._titles(), ["Order 2", "Order 1", "Order 0"])
+        with CaptureQueriesContext(connection) as context:
+            documents = list(_load_documents("orders", "ru"))
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(documents[0]["tldr"], "Кратко: Order 2")
+
+    def test_saves_patch_snapshot_in_place(self):
+        self._titles()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_order("Order 3")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orders[0].title = "Order 0 (edited)"
+            self.orders[0].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orders[1].status = Order.STATUS_CANCELLED
+            self.orders[1].save()
+        with CaptureQueriesContext(connection) as context:
+            titles = self._titles()
+        # Снимок не пересобирался; единственный запрос — TL;DR нового заказа.
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(titles, ["Order 3", "Order 2", "Order 0 (edited)"])
+
+
+class TldrBatchSerializationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client_user = User.objects.create(
+            nickname="tldr-client",
+            email="tldr-client@example.com",
+            first_name="Client",
+            last_name="User",
+        )
+        cls.client_profile = Profile.objects.create(
+            user=client_user, role=Profile.ROLE_CLIENT, is_completed=True, tldr_ru="Заказчик"
+        )
+        for index in range(5):
+            Order.objects.create(
+                title=f"Order {index}",
+                description="Описание",
+                deadline=timezone.now() + timedelta(days=7),
+                payment_type=Order.PAYMENT_FIXED,
+                budget=100,
+                order_type=Order.ORDER_TYPE_STANDARD,
+                client=cls.client_profile,
+                tldr_ru=f"Кратко {index}",
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_reads_every_tldr_in_bulk(self):
+        orders = Order.objects.select_related("client", "client__user").order_by("pk")
+        with mock.patch.object(
+            tldr_cache, "get_tldr", wraps=tldr_cache.get_tldr
+        ) as get_one, mock.patch.object(
+            tldr_cache, "get_tldr_many", wraps=tldr_cache.get_tldr_many
+        ) as get_many:
+            data = OrderSerializer(orders, many=True, context={"locale": "ru"}).data
+        self.assertEqual([row["tldr"] for row in data], [f"Кратко {i}" for i in range(5)])
+        self.assertEqual({row["client"]["tldr"] for row in data}, {"Заказчик"})
+        get_one.assert_not_called()
+        # Одна выборка на сущность: заказы и их заказчики.
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_empty_tldr_is_not_cached(self):
+        order = Order.objects.order_by("pk").first()
+        Order.objects.filter(pk=order.pk).update(tldr_ru="")
+
+        def load(pks):
+            return {
+                row.pk: row.get_tldr("uz")
+                for row in Order.objects.filter(pk__in=pks).only("tldr_ru", "tldr_uz")
+            }
+
+        values = tldr_cache.get_tldr_many(entity="order", locale="uz", pks=[order.pk], loader=load)
+        self.assertEqual(values, {order.pk: ""})
+
+        # Backfill пишет только ru, а uz подставляет его через ``get_tldr``.
+        Order.objects.filter(pk=order.pk).update(tldr_ru="Новое")
+        tldr_cache.set_tldr_many(entity="order", locale="ru", values={order.pk: "Новое"})
+        values = tldr_cache.get_tldr_many(entity="order", locale="uz", pks=[order.pk], loader=load)
+        self.assertEqual(values, {order.pk: "Новое"})
+
+    def test_entry_is_refreshed_before_expiry(self):
+        tldr_cache.set_tldr(entity="order", pk=1, locale="ru", value="Старое")
+        key = tldr_cache._build_key("order", 1, "ru")
+        value, _, delta = cache.get(key)
+        fetcher = mock.Mock(return_value="Новое")
+
+        cache.set(key, (value, time.time() + 3600, delta))
+        self.assertEqual(
+            tldr_cache.get_tldr(entity="order", pk=1, locale="ru", fetcher=fetcher), "Старое"
+        )
+        fetcher.assert_not_called()
+
+        cache.set(key, (value, time.time(), delta))
+        self.assertEqual(
+            tldr_cache.get_tldr(entity="order", pk=1, locale="ru", fetcher=fetcher), "Новое"
+        )
+        self.assertEqual(cache.get(key)[0], "Новое")
+
+
+class RecommendationSnapshotTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client_user = User.objects.create(
+            nickname="ranking-client",
+            email="ranking-client@example.com",
+            first_name="Client",
+            last_name="User",
+        )
+        client_profile = Profile.objects.create(
+            user=client_user, role=Profile.ROLE_CLIENT, is_completed=True
+        )
+        cls.order = Order.objects.create(
+            title="Landing page",
+            description="Описание",
+            deadline=timezone.now() + timedelta(days=7),
+            payment_type=Order.PAYMENT_FIXED,
+            budget=100,
+            order_type=Order.ORDER_TYPE_STANDARD,
+            client=client_profile,
+            status=Order.STATUS_PUBLISHED,
+        )
+        freelancer_user = User.objects.create(
+            nickname="ranking-freelancer",
+            email="ranking-freelancer@example.com",
+            first_name="Free",
+            last_name="Lancer",
+        )
+        cls.freelancer = Profile.objects.create(
+            user=freelancer_user, role=Profile.ROLE_FREELANCER, is_completed=True
+        )
+
+    def _snapshot(self, **kwargs) -> RecommendationSnapshot:
+        defaults = {
+            "kind": RecommendationSnapshot.KIND_INVITES,
+            "subject_id": self.order.id,
+            "items": [{"identifier": 1}],
+        }
+        return RecommendationSnapshot.objects.create(**{**defaults, **kwargs})
+
+
+class RecommendationSnapshotTests(RecommendationSnapshotTestCase):
+    def _read(self, result: dict) -> tuple[list, str]:
+        with mock.patch(
+            "marketplace.services.materialized_recommendations.execute_match",
+            return_value=result,
+        ) as execute:
+            items, source = get_invite_recommendations(order=self.order, locale="ru")
+        self.execute_calls = execute.call_count
+        return items, source
+
+    def test_fresh_snapshot_is_served_without_scoring(self):
+        self._snapshot()
+        items, source = self._read({"invite_recommendations": [], "source": "ai"})
+        self.assertEqual(items, [{"identifier": 1}])
+        self.assertEqual(self.execute_calls, 0)
+
+    def test_stale_snapshot_is_recomputed_on_read(self):
+        snapshot = self._snapshot(is_stale=True)
+        items, source = self._read(
+            {"invite_recommendations": [{"identifier": 2}], "source": "ai"}
+        )
+        self.assertEqual(items, [{"identifier": 2}])
+        snapshot.refresh_from_db()
+        self.assertFalse(snapshot.is_stale)
+        self.assertEqual(snapshot.items, [{"identifier": 2}])
+
+    def test_stale_snapshot_beats_fallback_ranking(self):
+        self._snapshot(is_stale=True)
+        items, source = self._read(
+            {"invite_recommendations": [{"identifier": 3}], "source": "fallback"}
+        )
+        self.assertEqual(items, [{"identifier": 1}])
+        self.assertEqual(source, "ai")
+
+
+@skipUnless(connection.vendor == "postgresql", "items__contains needs jsonb")
+class RecommendationInvalidationTests(RecommendationSnapshotTestCase):
+    def _orders_snapshot(self, subject_id: int, identifier: int) -> RecommendationSnapshot:
+        return self._snapshot(
+            kind=RecommendationSnapshot.KIND_ORDERS,
+            subject_id=subject_id,
+            items=[{"identifier": identifier}],
+        )
+
+    def _is_stale(self, snapshot: RecommendationSnapshot) -> bool:
+        snapshot.refresh_from_db()
+        return snapshot.is_stale
+
+    def test_invalidation_runs_after_commit(self):
+        snapshot = self._orders_snapshot(999, self.order.id)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.order.save()
+        self.assertFalse(self._is_stale(snapshot))
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self._is_stale(snapshot))
+
+    def test_order_save_without_ranking_fields_keeps_snapshots(self):
+        snapshot = self._orders_snapshot(999, self.order.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.save(update_fields=["search_vector", "updated_at"])
+        self.assertFalse(self._is_stale(snapshot))
+
+    def test_profile_edit_marks_own_and_containing_snapshots(self):
+        own = self._orders_snapshot(self.freelancer.id, self.order.id)
+        invites = self._snapshot(items=[{"identifier": self.freelancer.id}])
+        other = self._snapshot(subject_id=self.order.id + 1)
+
+        self.freelancer.headline = "Django developer"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.freelancer.save(update_fields=["headline"])
+        self.assertTrue(self._is_stale(own))
+        self.assertTrue(self._is_stale(invites))
+        self.assertFalse(self._is_stale(other))
 
-# Create your tests here.
+    def test_profile_bookkeeping_save_keeps_snapshots(self):
+        own = self._orders_snapshot(self.freelancer.id, self.order.id)
+        self.freelancer.last_activity_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.freelancer.save(update_fields=["last_activity_at"])
+        self.assertFalse(self._is_stale(own))
@@ -1,3 +1,4 @@
+from dataclasses import asdict
 from decimal import Decimal
 
 from django.conf import settings
@@ -13,7 +14,7 @@ from accounts import rbac
 from accounts.models import Profile
 from notifications.models import NotificationEvent
 from accounts.permissions import RoleBasedAccessPermission
-from accounts.utils import create_notification
+from accounts.utils import create_notification, create_notifications
 from .models import Category, Contract, Order, OrderApplication, Skill
 from .serializers import (
     CategorySerializer,
@@ -22,8 +23,21 @@ from .serializers import (
     OrderSerializer,
     SkillSerializer,
 )
-from .services.recommendations import execute_match
+from .services.materialized_recommendations import (
+    get_invite_recommendations,
+    get_order_recommendations,
+)
 from .services.semantic_search import execute_semantic_search
+from .services.skill_autocomplete import autocomplete_skills
+
+
+class _LocaleMixin:
+    @staticmethod
+    def resolve_locale(request) -> str:
+        header = request.headers.get("Accept-Language") if request else None
+        if header:
+            return header.split(",")[0].strip() or "ru"
+        return "ru"
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,7 +47,7 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     lookup_field = "slug"
 
 
-class SkillViewSet(viewsets.ReadOnlyModelViewSet):
+class SkillViewSet(_LocaleMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SkillSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = "slug"
@@ -45,6 +59,20 @@ class SkillViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(category__slug=category)
         return queryset
 
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response(
+                {"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        suggestions = autocomplete_skills(
+            query, locale=self.resolve_locale(request), limit=limit
+        )
+        return Response({"results": [asdict(item) for item in suggestions]})
+
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
@@ -298,16 +326,8 @@ class ContractViewSet(viewsets.ReadOnlyModelViewSet):
             data={"contract_id": contract.id, "order_id": contract.order.id},
         )
         if contract.status == Contract.STATUS_ACTIVE:
-            create_notification(
-                contract.client,
-                title="Контракт активирован",
-                message=f"Контракт по заказу '{contract.order.title}' подписан обеими сторонами.",
-                category=NotificationEvent.CATEGORY_CONTRACT,
-                event_type=NotificationEvent.EventType.CONTRACT_CREATED,
-                data={"contract_id": contract.id},
-            )
-            create_notification(
-                contract.freelancer,
+            create_notifications(
+                [contract.client, contract.freelancer],
                 title="Контракт активирован",
                 message=f"Контракт по заказу '{contract.order.title}' подписан обеими сторонами.",
                 category=NotificationEvent.CATEGORY_CONTRACT,
@@ -318,15 +338,6 @@ class ContractViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class _LocaleMixin:
-    @staticmethod
-    def resolve_locale(request) -> str:
-        header = request.headers.get("Accept-Language") if request else None
-        if header:
-            return header.split(",")[0].strip() or "ru"
-        return "ru"
-
-
 class InviteRecommendationView(_LocaleMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -344,8 +355,8 @@ class InviteRecommendationView(_LocaleMixin, APIView):
         if actor is None or actor != order.client:
             raise PermissionDenied("Можно рекомендовать только для своих заказов.")
         locale = self.resolve_locale(request)
-        result = execute_match(order=order, profile=None, locale=locale)
-        return Response({"invite_recommendations": result.get("invite_recommendations", []), "source": result.get("source", "ai")})
+        items, source = get_invite_recommendations(order=order, locale=locale)
+        return Response({"invite_recommendations": items, "source": source})
 
 
 class FreelancerRecommendationView(_LocaleMixin, APIView):
@@ -356,8 +367,8 @@ class FreelancerRecommendationView(_LocaleMixin, APIView):
         if profile is None or profile.role != Profile.ROLE_FREELANCER:
             raise PermissionDenied("Требуется профиль исполнителя.")
         locale = self.resolve_locale(request)
-        result = execute_match(order=None, profile=profile, locale=locale)
-        return Response({"order_recommendations": result.get("order_recommendations", []), "source": result.get("source", "ai")})
+        items, source = get_order_recommendations(profile=profile, locale=locale)
+        return Response({"order_recommendations": items, "source": source})
 
 
 class SemanticSearchView(_LocaleMixin, APIView):
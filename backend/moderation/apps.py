@@ -5,3 +5,6 @@ class ModerationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "moderation"
     verbose_name = "Moderation & Safety"
+
+    def ready(self) -> None:  # pragma: no cover - import side effects
+        from . import signals  # noqa: F401
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import timedelta
 
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 
@@ -30,6 +34,7 @@ PRIORITY_SLA_MINUTES = {
     ChatModerationCase.PRIORITY_MEDIUM: 120,
     ChatModerationCase.PRIORITY_HIGH: 30,
 }
+_RED_FLAGS_VERSION_KEY = "moderation:red_flags:version"
 
 
 @dataclass
@@ -39,20 +44,27 @@ class RestrictionState:
     reason: str = ""
 
 
-def evaluate_chat_restrictions(*, thread, sender) -> RestrictionState:
-    profile = getattr(sender, "profile", None)
-    if not profile:
-        return RestrictionState(blocked=False, shadow_banned=False)
-    restrictions = list(
+def active_chat_restrictions(*, thread_id: int, profile_id: int | None) -> list[ChatParticipantRestriction]:
+    """Действующие ограничения участника в треде."""
+
+    if not profile_id:
+        return []
+    return list(
         ChatParticipantRestriction.objects.active().filter(
-            thread=thread,
-            profile=profile,
+            thread_id=thread_id,
+            profile_id=profile_id,
         )
     )
+
+
+def resolve_restrictions(restrictions: Iterable[ChatParticipantRestriction]) -> RestrictionState:
     blocked = False
     reason = ""
     shadow_banned = False
     for restriction in restrictions:
+        # Список может быть загружен заранее: истёкшие за это время пропускаем.
+        if not restriction.is_active:
+            continue
         if restriction.restriction_type == ChatParticipantRestriction.TYPE_SEND_BLOCK:
             blocked = True
             reason = restriction.reason
@@ -61,13 +73,61 @@ def evaluate_chat_restrictions(*, thread, sender) -> RestrictionState:
     return RestrictionState(blocked=blocked, shadow_banned=shadow_banned, reason=reason)
 
 
+def evaluate_chat_restrictions(*, thread, sender) -> RestrictionState:
+    profile = getattr(sender, "profile", None)
+    if not profile:
+        return RestrictionState(blocked=False, shadow_banned=False)
+    return resolve_restrictions(
+        active_chat_restrictions(thread_id=thread.id, profile_id=profile.id)
+    )
+
+
+_red_flags: list[ChatRedFlagPattern] | None = None
+_red_flags_version: int | None = None
+_red_flags_lock = threading.Lock()
+
+
+def _warm_compiled_patterns(patterns: list[ChatRedFlagPattern]) -> None:
+    """Скомпилировать регулярки сразу: список живёт между запросами."""
+
+    for pattern in patterns:
+        # ``compiled_regex`` кеширует ``re.compile`` на экземпляре при первом обращении.
+        _ = pattern.compiled_regex
+
+
+def active_red_flag_patterns() -> list[ChatRedFlagPattern]:
+    """Активные шаблоны с уже скомпилированными регулярками, общие для процесса.
+
+    Сигналы меняют версию в общем кеше, и каждый процесс перечитывает шаблоны
+    при следующей проверке сообщения.
+    """
+
+    global _red_flags, _red_flags_version
+    version = cache.get(_RED_FLAGS_VERSION_KEY, 0)
+    patterns = _red_flags
+    if patterns is not None and _red_flags_version == version:
+        return patterns
+    with _red_flags_lock:
+        if _red_flags is None or _red_flags_version != version:
+            loaded = list(ChatRedFlagPattern.objects.filter(is_active=True))
+            _warm_compiled_patterns(loaded)
+            _red_flags = loaded
+            _red_flags_version = version
+        return _red_flags
+
+
+def invalidate_red_flag_patterns() -> None:
+    global _red_flags
+    cache.set(_RED_FLAGS_VERSION_KEY, time.time_ns(), None)
+    _red_flags = None
+
+
 def apply_red_flag_detection(message) -> list[ChatMessageFlag]:
     body = message.body or ""
     if not body:
         return []
     flags: list[ChatMessageFlag] = []
-    patterns = ChatRedFlagPattern.objects.filter(is_active=True)
-    for pattern in patterns:
+    for pattern in active_red_flag_patterns():
         if not pattern.compiled_regex.search(body):
             continue
         flag, _ = ChatMessageFlag.objects.get_or_create(
@@ -161,10 +221,13 @@ def enforce_chat_safety(thread, sender) -> bool:
 
 
 __all__ = [
+    "active_chat_restrictions",
     "apply_red_flag_detection",
     "enforce_chat_safety",
     "escalate_case",
     "file_user_report",
+    "invalidate_red_flag_patterns",
     "log_staff_action",
+    "resolve_restrictions",
     "RestrictionState",
 ]
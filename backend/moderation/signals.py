@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chat.models import ChatThread
+from chat.services import notify_moderation_changed
+
+from .models import ChatParticipantRestriction, ChatRedFlagPattern
+from .services import invalidate_red_flag_patterns
+
+_THREAD_BLOCK_FIELDS = {"blocked_until", "blocked_reason"}
+
+
+@receiver(post_save, sender=ChatParticipantRestriction)
+@receiver(post_delete, sender=ChatParticipantRestriction)
+def push_restriction_change(sender, instance: ChatParticipantRestriction, **_: object) -> None:
+    """Open chat connections cache restrictions; tell them to reload."""
+
+    notify_moderation_changed(instance.thread_id)
+
+
+@receiver(post_save, sender=ChatThread)
+def push_thread_block_change(
+    sender, instance: ChatThread, created: bool, update_fields=None, **_: object
+) -> None:
+    if created:
+        return
+    if update_fields is not None and not _THREAD_BLOCK_FIELDS & set(update_fields):
+        return
+    notify_moderation_changed(instance.id)
+
+
+@receiver(post_save, sender=ChatRedFlagPattern)
+@receiver(post_delete, sender=ChatRedFlagPattern)
+def reset_red_flag_patterns(sender, **_: object) -> None:
+    invalidate_red_flag_patterns()
@@ -59,52 +59,130 @@ class NotificationHub:
         throttle_for: timedelta | None = None,
         digest_window: timedelta | None = None,
     ) -> EmittedNotification:
-        now = timezone.now()
-        selected_channels = self._resolve_channels(channels)
-        throttle_for = throttle_for or timedelta(minutes=5)
-        dedupe_key = dedupe_key or self._build_dedupe_key(
+        (emitted,) = self.emit_many(
+            recipients=[recipient],
+            profiles={recipient.id: profile} if profile is not None else None,
+            title=title,
+            body=body,
+            category=category,
             event_type=event_type,
-            recipient_id=getattr(recipient, "id", None),
+            actor=actor,
             data=data,
+            channels=channels,
+            priority=priority,
+            dedupe_key=dedupe_key,
+            throttle_for=throttle_for,
+            digest_window=digest_window,
         )
+        return emitted
+
+    def emit_many(
+        self,
+        *,
+        recipients: Sequence,
+        title: str,
+        body: str,
+        category: str,
+        event_type: str,
+        actor=None,
+        profiles: Mapping[int, object] | None = None,
+        data: Mapping | None = None,
+        channels: Sequence[str] | None = None,
+        priority: str | None = None,
+        dedupe_key: str | None = None,
+        throttle_for: timedelta | None = None,
+        digest_window: timedelta | None = None,
+    ) -> list[EmittedNotification]:
+        """Emit the same event to many recipients with a constant number of queries.
+
+        Throttle state and preferences are loaded for all recipients at once;
+        events, deliveries and digest links are written with ``bulk_create``.
+        ``profiles`` maps recipient ids to the profile stored on their event.
+        Results follow the order of ``recipients``; repeated recipients are
+        emitted once.
+        """
+
+        now = timezone.now()
+        selected_channels = self._resolve_channels(channels)
+        throttle_for = throttle_for or timedelta(minutes=5)
+        profiles = profiles or {}
+        unique = list({recipient.id: recipient for recipient in recipients}.values())
+        if not unique:
+            return []
+        dedupe_keys = {
+            recipient.id: dedupe_key
+            or self._build_dedupe_key(event_type=event_type, recipient_id=recipient.id, data=data)
+            for recipient in unique
+        }
+
         with transaction.atomic():
-            existing = self._should_throttle(recipient, dedupe_key, now)
-            if existing:
-                delivery = NotificationDelivery(
+            throttled = self._find_throttled(dedupe_keys, now)
+            results: dict[int, EmittedNotification] = {}
+            throttled_deliveries = [
+                NotificationDelivery(
                     event=existing,
                     channel=NotificationDelivery.CHANNEL_IN_APP,
                     status=NotificationDelivery.STATUS_THROTTLED,
                     metadata={"detail": "duplicate suppressed"},
                 )
-                delivery.save()
-                return EmittedNotification(existing, [delivery])
-
-            event = NotificationEvent.objects.create(
-                recipient=recipient,
-                profile=profile,
-                actor=actor,
-                category=category,
-                event_type=event_type,
-                title=title,
-                body=body,
-                data=dict(data or {}),
-                priority=priority or NotificationEvent.Priority.MEDIUM,
-                dedupe_key=dedupe_key,
-                throttle_until=now + throttle_for,
-                digest_window=digest_window,
-            )
-
-            deliveries: list[NotificationDelivery] = []
-            for channel in selected_channels:
-                deliveries.append(
-                    self._route_delivery(
-                        event=event,
-                        channel=channel,
-                        requested_at=now,
+                for existing in throttled.values()
+            ]
+            NotificationDelivery.objects.bulk_create(throttled_deliveries)
+            for delivery in throttled_deliveries:
+                results[delivery.event.recipient_id] = EmittedNotification(delivery.event, [delivery])
+
+            events = NotificationEvent.objects.bulk_create(
+                [
+                    NotificationEvent(
+                        recipient=recipient,
+                        profile=profiles.get(recipient.id),
+                        actor=actor,
+                        category=category,
+                        event_type=event_type,
+                        title=title,
+                        body=body,
+                        data=dict(data or {}),
+                        priority=priority or NotificationEvent.Priority.MEDIUM,
+                        dedupe_key=dedupe_keys[recipient.id],
+                        throttle_until=now + throttle_for,
                         digest_window=digest_window,
                     )
+                    for recipient in unique
+                    if recipient.id not in throttled
+                ]
+            )
+            if events:
+                preferences = self._load_preferences(
+                    [event.recipient for event in events], category, selected_channels
+                )
+                planned: list[tuple[NotificationDelivery, tuple | None]] = []
+                for event in events:
+                    for channel in selected_channels:
+                        planned.append(
+                            self._plan_delivery(
+                                event=event,
+                                channel=channel,
+                                pref=preferences[(event.recipient_id, channel)],
+                                requested_at=now,
+                                digest_window=digest_window,
+                            )
+                        )
+                digests = self._attach_to_digests(
+                    [(delivery.event, bucket) for delivery, bucket in planned if bucket is not None]
                 )
-        return EmittedNotification(event, deliveries)
+                for delivery, bucket in planned:
+                    if bucket is not None:
+                        delivery.digest = digests[bucket]
+                        delivery.metadata = {"digest_id": delivery.digest.id}
+                deliveries = NotificationDelivery.objects.bulk_create(
+                    [delivery for delivery, _ in planned]
+                )
+                per_event: dict[int, list[NotificationDelivery]] = {}
+                for delivery in deliveries:
+                    per_event.setdefault(delivery.event_id, []).append(delivery)
+                for event in events:
+                    results[event.recipient_id] = EmittedNotification(event, per_event.get(event.id, []))
+        return [results[recipient.id] for recipient in unique]
 
     # Core helpers ---------------------------------------------------------
 
@@ -128,74 +206,116 @@ class NotificationHub:
                 suffix = f"thread:{data['thread_id']}"
         return f"{recipient_id}:{event_type}:{suffix}"
 
-    def _should_throttle(self, recipient, dedupe_key: str, now: datetime):
-        if not dedupe_key:
-            return None
-        existing = (
+    def _find_throttled(self, dedupe_keys: Mapping[int, str], now: datetime) -> dict[int, NotificationEvent]:
+        """Latest still-throttled event per recipient, keyed by recipient id."""
+
+        keyed = {recipient_id: key for recipient_id, key in dedupe_keys.items() if key}
+        if not keyed:
+            return {}
+        candidates = (
             NotificationEvent.objects.filter(
-                recipient=recipient,
-                dedupe_key=dedupe_key,
+                recipient_id__in=keyed,
+                dedupe_key__in=set(keyed.values()),
                 throttle_until__gte=now,
             )
-            .order_by("-created_at")
-            .first()
+            .order_by("recipient_id", "-created_at")
         )
-        return existing
+        throttled: dict[int, NotificationEvent] = {}
+        for event in candidates:
+            if event.recipient_id not in throttled and keyed[event.recipient_id] == event.dedupe_key:
+                throttled[event.recipient_id] = event
+        return throttled
 
-    def _route_delivery(
+    def _load_preferences(
+        self,
+        users: Sequence,
+        category: str,
+        channels: Sequence[str],
+    ) -> dict[tuple[int, str], NotificationPreference]:
+        """Preferences for every (user, channel), creating defaults that are missing."""
+
+        def fetch() -> dict[tuple[int, str], NotificationPreference]:
+            return {
+                (pref.user_id, pref.channel): pref
+                for pref in NotificationPreference.objects.filter(
+                    user_id__in=[user.id for user in users],
+                    category=category,
+                    channel__in=channels,
+                )
+            }
+
+        preferences = fetch()
+        missing = [
+            NotificationPreference(
+                user=user,
+                category=category,
+                channel=channel,
+                enabled=True,
+                frequency=NotificationPreference.FREQUENCY_IMMEDIATE,
+                language=getattr(user, "locale", "ru"),
+            )
+            for user in users
+            for channel in channels
+            if (user.id, channel) not in preferences
+        ]
+        if missing:
+            NotificationPreference.objects.bulk_create(missing, ignore_conflicts=True)
+            preferences = fetch()
+        return preferences
+
+    def _plan_delivery(
         self,
         *,
         event: NotificationEvent,
         channel: str,
+        pref: NotificationPreference,
         requested_at: datetime,
         digest_window: timedelta | None,
-    ) -> NotificationDelivery:
-        pref = self._get_preference(event.recipient, event.category, channel)
+    ) -> tuple[NotificationDelivery, tuple | None]:
+        """Unsaved delivery for ``channel`` and its digest bucket, if it is digested."""
+
         if not pref.enabled:
-            return NotificationDelivery.objects.create(
+            delivery = NotificationDelivery(
                 event=event,
                 channel=channel,
                 status=NotificationDelivery.STATUS_SUPPRESSED,
                 metadata={"detail": "channel disabled by user"},
             )
+            return delivery, None
 
         if channel != NotificationDelivery.CHANNEL_IN_APP:
             if pref.frequency != NotificationPreference.FREQUENCY_IMMEDIATE:
-                digest = self._attach_to_digest(
-                    event=event,
-                    channel=channel,
-                    pref=pref,
-                    requested_at=requested_at,
-                    custom_window=digest_window,
-                )
-                return NotificationDelivery.objects.create(
+                period_start, period_end = self._digest_period(pref, requested_at, digest_window)
+                delivery = NotificationDelivery(
                     event=event,
                     channel=channel,
                     status=NotificationDelivery.STATUS_DIGESTED,
-                    digest=digest,
-                    metadata={"digest_id": digest.id},
                 )
+                bucket = (event.recipient_id, channel, event.category, period_start, period_end)
+                return delivery, bucket
 
             schedule_at = self._respect_quiet_hours(pref, requested_at)
             if schedule_at and schedule_at > requested_at:
-                return NotificationDelivery.objects.create(
+                delivery = NotificationDelivery(
                     event=event,
                     channel=channel,
                     status=NotificationDelivery.STATUS_SCHEDULED,
                     scheduled_for=schedule_at,
                 )
+                return delivery, None
 
         # In-app is immediate delivery.
-        return NotificationDelivery.objects.create(
+        delivery = NotificationDelivery(
             event=event,
             channel=channel,
             status=NotificationDelivery.STATUS_SENT
             if channel == NotificationDelivery.CHANNEL_IN_APP
             else NotificationDelivery.STATUS_PENDING,
-            sent_at=timezone.now()
+            sent_at=requested_at
             if channel == NotificationDelivery.CHANNEL_IN_APP
             else None,
         )
+        return delivery, None
 
     def _respect_quiet_hours(
         self,
@@ -232,15 +352,12 @@ class NotificationHub:
             return target_date.astimezone(dt_timezone.utc)
         return None
 
-    def _attach_to_digest(
+    def _digest_period(
         self,
-        *,
-        event: NotificationEvent,
-        channel: str,
         pref: NotificationPreference,
         requested_at: datetime,
         custom_window: timedelta | None,
-    ) -> NotificationDigest:
+    ) -> tuple[datetime, datetime]:
         window = custom_window or DIGEST_WINDOWS.get(pref.frequency)
         if not window:
             window = timedelta(minutes=15)
@@ -265,41 +382,76 @@ class NotificationHub:
                 microsecond=0,
             )
             period_end = period_start + window
-        period_start = period_start.astimezone(dt_timezone.utc)
-        period_end = period_end.astimezone(dt_timezone.utc)
-        digest, _ = NotificationDigest.objects.get_or_create(
-            user=event.recipient,
-            channel=channel,
-            category=event.category,
-            period_start=period_start,
-            period_end=period_end,
-            defaults={
-                "title": f"{event.profile or event.recipient} digest",
-                "summary": {},
-                "scheduled_for": period_end,
-            },
+        return period_start.astimezone(dt_timezone.utc), period_end.astimezone(dt_timezone.utc)
+
+    def _attach_to_digests(
+        self,
+        entries: Sequence[tuple[NotificationEvent, tuple]],
+    ) -> dict[tuple, NotificationDigest]:
+        """Add events to their digest buckets with one query per step, not per bucket.
+
+        A bucket is ``(user_id, channel, category, period_start, period_end)``.
+        """
+
+        if not entries:
+            return {}
+        grouped: dict[tuple, list[NotificationEvent]] = {}
+        for event, bucket in entries:
+            grouped.setdefault(bucket, []).append(event)
+
+        digests: dict[tuple, NotificationDigest] = {}
+        existing = NotificationDigest.objects.filter(
+            user_id__in={bucket[0] for bucket in grouped},
+            channel__in={bucket[1] for bucket in grouped},
+            category__in={bucket[2] for bucket in grouped},
+            period_start__in={bucket[3] for bucket in grouped},
+        ).order_by("created_at")
+        for digest in existing:
+            key = (digest.user_id, digest.channel, digest.category, digest.period_start, digest.period_end)
+            if key in grouped:
+                digests.setdefault(key, digest)
+
+        created = NotificationDigest.objects.bulk_create(
+            [
+                NotificationDigest(
+                    user_id=bucket[0],
+                    channel=bucket[1],
+                    category=bucket[2],
+                    period_start=bucket[3],
+                    period_end=bucket[4],
+                    title=f"{events[0].profile or events[0].recipient} digest",
+                    summary={},
+                    scheduled_for=bucket[4],
+                )
+                for bucket, events in grouped.items()
+                if bucket not in digests
+            ]
         )
-        digest.events.add(event)
-        summary = digest.summary or {}
-        summary.setdefault("events", 0)
-        summary["events"] += 1
-        digest.summary = summary
-        digest.status = NotificationDigest.STATUS_SCHEDULED
-        digest.save(update_fields=["summary", "status", "scheduled_for"])
-        return digest
-
-    def _get_preference(self, user, category: str, channel: str) -> NotificationPreference:
-        pref, _ = NotificationPreference.objects.get_or_create(
-            user=user,
-            category=category,
-            channel=channel,
-            defaults={
-                "enabled": True,
-                "frequency": NotificationPreference.FREQUENCY_IMMEDIATE,
-                "language": getattr(user, "locale", "ru"),
-            },
+        for digest in created:
+            digests[(digest.user_id, digest.channel, digest.category, digest.period_start, digest.period_end)] = digest
+
+        NotificationDigest.events.through.objects.bulk_create(
+            [
+                NotificationDigest.events.through(
+                    notificationdigest_id=digests[bucket].id,
+                    notificationevent_id=event.id,
+                )
+                for bucket, events in grouped.items()
+                for event in events
+            ],
+            ignore_conflicts=True,
+        )
+        for bucket, events in grouped.items():
+            digest = digests[bucket]
+            summary = digest.summary or {}
+            summary.setdefault("events", 0)
+            summary["events"] += len(events)
+            digest.summary = summary
+            digest.status = NotificationDigest.STATUS_SCHEDULED
+        NotificationDigest.objects.bulk_update(
+            list(digests.values()), ["summary", "status", "scheduled_for"]
         )
-        return pref
+        return digests
 
     # Digest processing ----------------------------------------------------
 
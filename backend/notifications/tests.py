@@ -1,3 +1,92 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from accounts.models import User
+
+from .models import (
+    NotificationDelivery,
+    NotificationDigest,
+    NotificationEvent,
+    NotificationPreference,
+)
+from .services import notification_hub
+
+
+class EmitManyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                nickname=f"applicant{index}",
+                email=f"applicant{index}@example.com",
+                first_name="App",
+                last_name="Licant",
+            )
+            for index in range(8)
+        ]
+
+    def _emit(self, recipients, **kwargs):
+        return notification_hub.emit_many(
+            recipients=recipients,
+            title="Заказ закрыт",
+            body="Заказчик выбрал исполнителя.",
+            category=NotificationEvent.CATEGORY_CONTRACT,
+            event_type=NotificationEvent.EventType.CONTRACT_APPLICATION_DECISION,
+            data={"order_id": 1},
+            **kwargs,
+        )
+
+    def _count_queries(self, recipients) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            self._emit(recipients)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        few = self._count_queries(self.users[:2])
+        NotificationEvent.objects.all().delete()
+        NotificationPreference.objects.all().delete()
+        many = self._count_queries(self.users)
+        self.assertEqual(few, many)
+
+    def test_emits_event_and_delivery_per_channel(self):
+        emitted = self._emit(self.users[:3] + self.users[:1])
+
+        self.assertEqual([item.event.recipient_id for item in emitted], [user.id for user in self.users[:3]])
+        for item in emitted:
+            self.assertEqual(
+                [delivery.channel for delivery in item.deliveries],
+                [NotificationDelivery.CHANNEL_IN_APP, NotificationDelivery.CHANNEL_EMAIL],
+            )
+        self.assertEqual(NotificationEvent.objects.count(), 3)
+        self.assertEqual(NotificationPreference.objects.count(), 6)
+
+    def test_duplicate_within_throttle_window_is_suppressed(self):
+        first = self._emit(self.users[:2])
+        second = self._emit(self.users[:3])
+
+        self.assertEqual(second[0].event.id, first[0].event.id)
+        self.assertEqual(second[0].deliveries[0].status, NotificationDelivery.STATUS_THROTTLED)
+        self.assertNotEqual(second[2].event.id, first[1].event.id)
+        self.assertEqual(NotificationEvent.objects.count(), 3)
+
+    def test_digest_preferences_group_events_per_bucket(self):
+        for user in self.users[:2]:
+            NotificationPreference.objects.create(
+                user=user,
+                category=NotificationEvent.CATEGORY_CONTRACT,
+                channel=NotificationDelivery.CHANNEL_EMAIL,
+                frequency=NotificationPreference.FREQUENCY_DAILY,
+            )
+
+        self._emit(self.users[:2], dedupe_key="order:1:first")
+        emitted = self._emit(self.users[:2], dedupe_key="order:1:second")
+
+        self.assertEqual(NotificationDigest.objects.count(), 2)
+        for item in emitted:
+            email = item.deliveries[1]
+            self.assertEqual(email.status, NotificationDelivery.STATUS_DIGESTED)
+            digest = NotificationDigest.objects.get(pk=email.digest_id)
+            self.assertEqual(digest.user_id, item.event.recipient_id)
+            self.assertEqual(digest.summary["events"], 2)
+            self.assertEqual(digest.events.count(), 2)
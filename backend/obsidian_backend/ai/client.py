@@ -1,13 +1,38 @@
-"""HTTP клиент для взаимодействия с сервисом ai-gateway."""
+"""HTTP клиент для взаимодействия с сервисом ai-gateway.
+
+Соединения переиспользуются: синхронный ``httpx.Client`` общий на процесс, а
+``httpx.AsyncClient`` — на каждый event loop (ASGI/Channels). Короткоживущий
+loop (``asyncio.run`` в командах) закрывает свой пул через
+``AsyncAiGatewayClient.aclose()`` или ``async with``. Ретраи с джиттером
+выполняются только для идемпотентных вычислительных эндпоинтов и укладываются
+в один общий на все попытки таймаут эндпоинта; запрос, упавший по таймауту,
+не повторяется. Общий на процесс
+circuit breaker после серии сбоев сразу отвечает ``AiGatewayUnavailable``, и
+вызывающий код уходит в fallback, не дожидаясь таймаута.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
 from dataclasses import dataclass
 from typing import Any
 
 import httpx
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
+# Чистые вычисления без побочных эффектов — их безопасно повторять.
+_IDEMPOTENT_PATHS = frozenset(
+    {"/match", "/match/batch", "/semantic_search", "/summaries/tldr"}
+)
+_RETRY_STATUSES = frozenset({502, 503, 504})
+
 
 @dataclass(slots=True)
 class AiGatewayError(Exception):
@@ -20,13 +45,141 @@ class AiGatewayError(Exception):
         return f"AI gateway error {self.status_code}: {self.payload}"  # noqa: EM101
 
 
-class AiGatewayClient:
-    """Неблокирующий клиент ai-gateway с таймаутами и ретраями."""
+class AiGatewayUnavailable(AiGatewayError):
+    """Шлюз недоступен: сетевой сбой, таймаут или открытый circuit breaker."""
+
+
+class CircuitBreaker:
+    """Классический breaker closed → open → half-open.
+
+    После ``threshold`` подряд неудачных вызовов цепь размыкается на
+    ``reset_seconds``; затем пропускается один пробный запрос, и по его
+    результату цепь замыкается или снова размыкается.
+    """
+
+    def __init__(self, *, threshold: int, reset_seconds: float) -> None:
+        self._threshold = threshold
+        self._reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self._opened_at is not None
+                and time.monotonic() - self._opened_at < self._reset_seconds
+            )
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self._reset_seconds:
+                return False
+            # Пробный запрос; остальные ждут ещё один интервал или его успеха.
+            self._opened_at = now
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self._threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        "ai_gateway.circuit_open", extra={"failures": self._failures}
+                    )
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_breaker: CircuitBreaker | None = None
+_sync_client: httpx.Client | None = None
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if not settings.AI_GATEWAY_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ModuleNotFoundError:  # pragma: no cover - опциональная зависимость
+        logger.warning("ai_gateway.http2_unavailable")
+        return False
+    return True
+
+
+def _client_options() -> dict[str, Any]:
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=settings.AI_GATEWAY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_GATEWAY_MAX_KEEPALIVE,
+        ),
+        "timeout": settings.AI_GATEWAY_TIMEOUT,
+    }
 
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _breaker
+    with _clients_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                threshold=settings.AI_GATEWAY_BREAKER_THRESHOLD,
+                reset_seconds=settings.AI_GATEWAY_BREAKER_RESET_SECONDS,
+            )
+        return _breaker
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _clients_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(**_client_options())
+        return _sync_client
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(**_client_options())
+            _async_clients[loop] = client
+        return client
+
+
+def reset_gateway_clients() -> None:
+    """Закрыть пулы и сбросить breaker (для тестов и после fork)."""
+
+    global _breaker, _sync_client
+    with _clients_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+        _async_clients.clear()
+        _breaker = None
+
+
+class _GatewayClientBase:
     def __init__(self, *, timeout: float | None = None) -> None:
-        self._timeout = timeout or settings.AI_GATEWAY_TIMEOUT
+        self._timeout = timeout
         self._base_url = settings.AI_GATEWAY_URL
         self._api_key = settings.AI_GATEWAY_API_KEY
+        self._breaker = get_circuit_breaker()
 
     def _headers(self) -> dict[str, str]:
         headers = {
@@ -39,25 +192,190 @@ class AiGatewayClient:
             headers["X-AI-Telemetry"] = "1"
         return headers
 
+    @property
+    def is_available(self) -> bool:
+        """``False``, пока breaker разомкнут — можно сразу отдавать fallback."""
+
+        return not self._breaker.is_open
+
+    def _request_timeout(self, path: str) -> float:
+        if self._timeout is not None:
+            return self._timeout
+        return settings.AI_GATEWAY_ENDPOINT_TIMEOUTS.get(path, settings.AI_GATEWAY_TIMEOUT)
+
+    def _attempts(self, path: str) -> int:
+        return 1 + (settings.AI_GATEWAY_RETRIES if path in _IDEMPOTENT_PATHS else 0)
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        return max(deadline - time.monotonic(), 0.0)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter: равномерно в [0, base * 2^attempt].
+        return random.uniform(0, settings.AI_GATEWAY_RETRY_BACKOFF * (2**attempt))
+
+    def _check_breaker(self, path: str) -> None:
+        if not self._breaker.allow():
+            raise AiGatewayUnavailable(503, {"detail": "circuit open", "path": path})
+
+    def _handle(self, response: httpx.Response) -> Any:
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        if response.status_code >= 400:
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = response.text
+            if response.status_code in _RETRY_STATUSES:
+                raise AiGatewayUnavailable(response.status_code, payload)
+            raise AiGatewayError(response.status_code, payload)
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise AiGatewayError(response.status_code, response.text) from exc
+
+    def _transport_failure(self, path: str, exc: httpx.TransportError) -> AiGatewayUnavailable:
+        self._breaker.record_failure()
+        logger.warning("ai_gateway.transport_error", extra={"path": path, "error": repr(exc)})
+        return AiGatewayUnavailable(503, {"detail": type(exc).__name__, "path": path})
+
+
+class AiGatewayClient(_GatewayClientBase):
+    """Синхронный клиент ai-gateway поверх общего пула соединений."""
+
     def _post(self, path: str, payload: dict[str, Any]) -> Any:
         url = f"{self._base_url}{path}"
-        with httpx.Client(timeout=self._timeout) as client:
-            response = client.post(url, json=payload, headers=self._headers())
-        if response.status_code >= 400:
-            raise AiGatewayError(response.status_code, response.json())
-        return response.json()
+        attempts = self._attempts(path)
+        # Таймаут эндпоинта — бюджет на все попытки вместе с паузами между ними.
+        deadline = time.monotonic() + self._request_timeout(path)
+        for attempt in range(attempts):
+            self._check_breaker(path)
+            try:
+                response = _get_sync_client().post(
+                    url,
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=self._remaining(deadline),
+                )
+                return self._handle(response)
+            except httpx.TimeoutException as exc:
+                # Бюджет уже израсходован — повтор только удлинил бы ожидание.
+                raise self._transport_failure(path, exc) from exc
+            except httpx.TransportError as exc:
+                error = self._transport_failure(path, exc)
+            except AiGatewayUnavailable as exc:
+                error = exc
+            delay = self._backoff(attempt)
+            if attempt + 1 == attempts or self._remaining(deadline) <= delay:
+                raise error
+            time.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
 
     def match(self, payload: dict[str, Any]) -> Any:
         """Вызов /match."""
 
         return self._post("/match", payload)
 
+    def match_batch(self, payload: dict[str, Any]) -> Any:
+        """Вызов /match/batch: несколько заказов на общем пуле кандидатов."""
+
+        return self._post("/match/batch", payload)
+
     def semantic_search(self, payload: dict[str, Any]) -> Any:
         """Вызов /semantic_search."""
 
         return self._post("/semantic_search", payload)
 
+    def index_search_documents(self, payload: dict[str, Any]) -> Any:
+        """Вызов /semantic_search/index."""
+
+        return self._post("/semantic_search/index", payload)
+
+    def delete_search_documents(self, payload: dict[str, Any]) -> Any:
+        """Вызов /semantic_search/index/delete."""
+
+        return self._post("/semantic_search/index/delete", payload)
+
     def generate_tldr(self, payload: dict[str, Any]) -> Any:
         """Вызов /summaries/tldr."""
 
         return self._post("/summaries/tldr", payload)
+
+    def upsert_embeddings(self, payload: dict[str, Any]) -> Any:
+        """Вызов /embeddings/upsert для прогрева хранилища эмбеддингов."""
+
+        return self._post("/embeddings/upsert", payload)
+
+
+class AsyncAiGatewayClient(_GatewayClientBase):
+    """Асинхронный вариант для ASGI-представлений и consumers Channels."""
+
+    async def __aenter__(self) -> AsyncAiGatewayClient:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Закрыть пул соединений текущего event loop.
+
+        Пул общий для всех клиентов этого loop'а, поэтому закрывать его нужно,
+        когда loop завершается, а не после каждого запроса.
+        """
+
+        loop = asyncio.get_running_loop()
+        with _clients_lock:
+            client = _async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    async def _post(self, path: str, payload: dict[str, Any]) -> Any:
+        url = f"{self._base_url}{path}"
+        attempts = self._attempts(path)
+        # Таймаут эндпоинта — бюджет на все попытки вместе с паузами между ними.
+        deadline = time.monotonic() + self._request_timeout(path)
+        for attempt in range(attempts):
+            self._check_breaker(path)
+            try:
+                response = await _get_async_client().post(
+                    url,
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=self._remaining(deadline),
+                )
+                return self._handle(response)
+            except httpx.TimeoutException as exc:
+                # Бюджет уже израсходован — повтор только удлинил бы ожидание.
+                raise self._transport_failure(path, exc) from exc
+            except httpx.TransportError as exc:
+                error = self._transport_failure(path, exc)
+            except AiGatewayUnavailable as exc:
+                error = exc
+            delay = self._backoff(attempt)
+            if attempt + 1 == attempts or self._remaining(deadline) <= delay:
+                raise error
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    async def match(self, payload: dict[str, Any]) -> Any:
+        """Вызов /match."""
+
+        return await self._post("/match", payload)
+
+    async def match_batch(self, payload: dict[str, Any]) -> Any:
+        """Вызов /match/batch."""
+
+        return await self._post("/match/batch", payload)
+
+    async def semantic_search(self, payload: dict[str, Any]) -> Any:
+        """Вызов /semantic_search."""
+
+        return await self._post("/semantic_search", payload)
+
+    async def generate_tldr(self, payload: dict[str, Any]) -> Any:
+        """Вызов /summaries/tldr."""
+
+        return await self._post("/summaries/tldr", payload)
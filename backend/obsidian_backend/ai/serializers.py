@@ -0,0 +1,82 @@
+"""Пакетная подстановка TL;DR в DRF-сериализаторы списков."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from django.db.models import Manager
+from rest_framework import serializers
+
+from . import tldr as tldr_cache
+
+_PREFETCH_KEY = "tldr_prefetch"
+
+
+class TldrListSerializer(serializers.ListSerializer):
+    """Перед сериализацией страницы загружает все её TL;DR разом."""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+        self.child.prefetch_tldrs(items)
+        return super().to_representation(items)
+
+
+class TldrSerializerMixin:
+    """``get_tldr`` через кеш; в списках значения берутся из общей предзагрузки.
+
+    Предзагрузка хранится в ``context`` корневого сериализатора, поэтому её
+    видят и вложенные сериализаторы (например, ``client`` у заказа).
+    """
+
+    tldr_entity: str
+
+    def _resolve_locale(self) -> str:
+        request = self.context.get("request")
+        if request is not None:
+            header = request.headers.get("Accept-Language")
+            if header:
+                return header.split(",")[0].strip() or "ru"
+        return self.context.get("locale", "ru")
+
+    def tldr_targets(self, instances: list) -> Iterable[tuple[str, Any]]:
+        """Пары ``(entity, объект)``, чьи TL;DR нужны для страницы."""
+
+        return ((self.tldr_entity, instance) for instance in instances)
+
+    def prefetch_tldrs(self, instances: list) -> None:
+        locale = self._resolve_locale()
+        grouped: dict[str, dict[Any, Any]] = defaultdict(dict)
+        for entity, instance in self.tldr_targets(instances):
+            if instance is not None:
+                grouped[entity][instance.pk] = instance
+        prefetched = self.context.setdefault(_PREFETCH_KEY, {})
+        for entity, objects in grouped.items():
+            values = tldr_cache.get_tldr_many(
+                entity=entity,
+                locale=locale,
+                pks=objects,
+                loader=lambda pks, objects=objects: {
+                    pk: objects[pk].get_tldr(locale) for pk in pks
+                },
+            )
+            prefetched.update(
+                {(entity, locale, pk): value for pk, value in values.items()}
+            )
+
+    def cached_tldr(self, entity: str, instance) -> str | None:
+        locale = self._resolve_locale()
+        prefetched = self.context.get(_PREFETCH_KEY, {})
+        key = (entity, locale, instance.pk)
+        if key in prefetched:
+            return prefetched[key]
+        return tldr_cache.get_tldr(
+            entity=entity,
+            pk=instance.pk,
+            locale=locale,
+            fetcher=instance.get_tldr,
+        )
+
+    def get_tldr(self, instance) -> str | None:
+        return self.cached_tldr(self.tldr_entity, instance)
@@ -1,19 +1,53 @@
-"""Утилиты для хранения TL;DR в кеше и моделях."""
+"""Утилиты для хранения TL;DR в кеше и моделях.
+
+Запись в кеше — ``(value, expires_at, delta)``: мягкий срок жизни и время,
+которое заняло вычисление. Чтение пересчитывает значение заранее с
+вероятностью, растущей к ``expires_at`` (XFetch), поэтому у горячего ключа
+до истечения успевает обновиться один запрос, а не все одновременно.
+"""
 
 from __future__ import annotations
 
-from typing import Callable
+import math
+import random
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
 
 from django.core.cache import cache
 
 _CACHE_KEY = "ai:tldr:{entity}:{pk}:{locale}"
 _CACHE_TTL = 60 * 60 * 6  # 6 часов — достаточно для списков
+# Жёсткий TTL чуть длиннее мягкого: ранний пересчёт успевает до вытеснения.
+_HARD_TTL_GRACE = 60
+_EARLY_REFRESH_BETA = 1.0
+# Запись из backfill'а не знает цены пересчёта — берём типичную выборку из базы.
+_DEFAULT_DELTA = 0.05
 
 
 def _build_key(entity: str, pk: int | str, locale: str) -> str:
     return _CACHE_KEY.format(entity=entity, pk=pk, locale=locale.lower())
 
 
+def _entry(value: str, delta: float = _DEFAULT_DELTA) -> tuple[str, float, float]:
+    return value, time.time() + _CACHE_TTL, max(delta, _DEFAULT_DELTA)
+
+
+def _fresh_value(entry: Any) -> str | None:
+    """Значение из записи кеша или ``None``, если пора пересчитать."""
+
+    if entry is None:
+        return None
+    if isinstance(entry, str):
+        # Записи старого формата живут до своего TTL.
+        return entry
+    value, expires_at, delta = entry
+    jitter = -delta * _EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+    if time.time() + jitter >= expires_at:
+        return None
+    return value
+
+
 def get_tldr(
     *,
     entity: str,
@@ -24,12 +58,14 @@ def get_tldr(
     """Получить TL;DR из кэша либо из модели."""
 
     key = _build_key(entity, pk, locale)
-    cached = cache.get(key)
+    cached = _fresh_value(cache.get(key))
     if cached is not None:
         return cached
+    started = time.monotonic()
     value = fetcher(locale)
     if value:
-        cache.set(key, value, _CACHE_TTL)
+        entry = _entry(value, time.monotonic() - started)
+        cache.set(key, entry, _CACHE_TTL + _HARD_TTL_GRACE)
     return value
 
 
@@ -37,4 +73,55 @@ def set_tldr(*, entity: str, pk: int | str, locale: str, value: str) -> None:
     """Обновить кеш после записи в базу."""
 
     key = _build_key(entity, pk, locale)
-    cache.set(key, value, _CACHE_TTL)
+    cache.set(key, _entry(value), _CACHE_TTL + _HARD_TTL_GRACE)
+
+
+def set_tldr_many(
+    *,
+    entity: str,
+    locale: str,
+    values: dict[int | str, str],
+    delta: float = _DEFAULT_DELTA,
+) -> None:
+    """Пакетно обновить кеш после массовой записи в базу."""
+
+    if values:
+        cache.set_many(
+            {
+                _build_key(entity, pk, locale): _entry(value, delta)
+                for pk, value in values.items()
+            },
+            _CACHE_TTL + _HARD_TTL_GRACE,
+        )
+
+
+def get_tldr_many(
+    *,
+    entity: str,
+    locale: str,
+    pks: Iterable[int | str],
+    loader: Callable[[list[int | str]], dict[int | str, str]],
+) -> dict[int | str, str | None]:
+    """TL;DR для набора объектов одним ``get_many``; промахи догружаются ``loader`` разом."""
+
+    keys = {pk: _build_key(entity, pk, locale) for pk in pks}
+    if not keys:
+        return {}
+    cached = cache.get_many(list(keys.values()))
+    values: dict[int | str, str | None] = {
+        pk: _fresh_value(cached.get(key)) for pk, key in keys.items()
+    }
+    missing = [pk for pk, value in values.items() if value is None]
+    if missing:
+        started = time.monotonic()
+        loaded = loader(missing)
+        values.update(loaded)
+        # Пустые значения не кешируем, как и ``get_tldr``: модель подставляет
+        # TL;DR другого языка, а backfill обновляет ключи только своей локали.
+        set_tldr_many(
+            entity=entity,
+            locale=locale,
+            values={pk: value for pk, value in loaded.items() if value},
+            delta=time.monotonic() - started,
+        )
+    return values
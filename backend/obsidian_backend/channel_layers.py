@@ -0,0 +1,53 @@
+"""Конфигурация channel layers.
+
+В production слой работает на Redis (``channels_redis``): при нескольких
+адресах в ``CHANNEL_REDIS_URLS`` группы и каналы распределяются по инстансам
+консистентным хешированием имени, поэтому ``chat.thread.{id}`` разных тредов
+живут на разных шардах. Чат получает отдельный alias ``chat`` со своими
+ёмкостью, сроками жизни и префиксом ключей. Локально и в тестах те же
+алиасы строятся на ``InMemoryChannelLayer`` с теми же лимитами.
+
+Модуль импортируется из ``settings``, поэтому не обращается к ``django.conf``.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKEND_MEMORY = "memory"
+BACKEND_REDIS = "redis"
+
+_BACKENDS = {
+    BACKEND_MEMORY: "channels.layers.InMemoryChannelLayer",
+    BACKEND_REDIS: "channels_redis.core.RedisChannelLayer",
+}
+
+
+def build_channel_layers(
+    *,
+    backend: str,
+    redis_urls: list[str],
+    default: dict[str, Any],
+    chat: dict[str, Any],
+) -> dict[str, dict[str, Any]]:
+    """Словарь ``CHANNEL_LAYERS`` с алиасами ``default`` и ``chat``.
+
+    ``default`` и ``chat`` — параметры слоя (``capacity``, ``expiry``,
+    ``group_expiry``, ``channel_capacity``), общие для обоих бэкендов.
+    """
+
+    if backend not in _BACKENDS:
+        raise ImproperlyConfigured(f"Unknown channel layer backend: {backend}")
+    if backend == BACKEND_REDIS and not redis_urls:
+        raise ImproperlyConfigured("CHANNEL_REDIS_URLS is required for the redis channel layer")
+    layers = {}
+    for alias, options in (("default", default), ("chat", chat)):
+        config = dict(options)
+        if backend == BACKEND_REDIS:
+            config["hosts"] = list(redis_urls)
+            config["prefix"] = f"asgi:{alias}"
+        layers[alias] = {"BACKEND": _BACKENDS[backend], "CONFIG": config}
+    return layers
+
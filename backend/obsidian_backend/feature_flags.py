@@ -31,6 +31,7 @@ FEATURE_FLAGS: Mapping[str, bool] = {
     "ai.scam_filter": _get_bool_env("FEATURE_AI_SCAM_FILTER", default=False),
     "ai.dispute_triage": _get_bool_env("FEATURE_AI_DISPUTE_TRIAGE", default=False),
     "ai.search": _get_bool_env("FEATURE_AI_SEARCH", default=False),
+    "ai.search_index": _get_bool_env("FEATURE_AI_SEARCH_INDEX", default=False),
     "ai.summaries": _get_bool_env("FEATURE_AI_SUMMARIES", default=False),
 }
 
@@ -0,0 +1,108 @@
+"""Полнотекстовый поиск PostgreSQL для fallback семантического поиска.
+
+Каждая индексируемая модель хранит ``search_vector`` (GIN) из двух частей:
+
+* конфигурация ``russian`` — стемминг русского текста;
+* конфигурация ``simple`` по тексту, где узбекские синонимы заменены на
+  канонические формы (тот же словарь, что ``_SYNONYMS`` в ai-gateway).
+
+Синонимы раскрываются ``regexp_replace()`` по границам слов прямо в SQL, а не
+словарём ``tsearch_data``: файлы словарей на управляемом PostgreSQL недоступны.
+Вектор пересчитывается сигналами одним ``UPDATE`` по строке.
+"""
+
+from __future__ import annotations
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Func, TextField, Value
+from django.db.models.functions import Lower
+
+__all__ = [
+    "UZ_SYNONYMS",
+    "normalize_uz",
+    "rebuild_search_vectors",
+    "refresh_search_vector",
+    "search_query",
+    "search_rank",
+    "search_vector",
+]
+
+# Синхронизирован с ai_gateway/services/search.py::_SYNONYMS.
+UZ_SYNONYMS: dict[str, str] = {
+    "dizayn": "design",
+    "dizayner": "design",
+    "ishlab chiqish": "development",
+    "mobil": "mobile",
+    "veb": "web",
+}
+
+_RU_CONFIG = "russian"
+_UZ_CONFIG = "simple"
+# ts_rank / (ts_rank + 1): баллы в диапазоне [0, 1).
+_RANK_NORMALIZATION = 32
+
+
+def _normalize_uz_sql(expression):
+    expression = Lower(expression)
+    for source, target in UZ_SYNONYMS.items():
+        expression = Func(
+            expression,
+            Value(rf"\m{source}\M"),
+            Value(target),
+            Value("g"),
+            function="regexp_replace",
+            output_field=TextField(),
+        )
+    return expression
+
+
+def normalize_uz(text: str) -> str:
+    lowered = text.lower()
+    for source, target in UZ_SYNONYMS.items():
+        lowered = re.sub(rf"\b{re.escape(source)}\b", target, lowered)
+    return lowered
+
+
+def search_vector(*, primary: str, secondary: str) -> SearchVector:
+    """Выражение вектора: поле ``primary`` с весом A, ``secondary`` с весом B."""
+
+    return (
+        SearchVector(primary, config=_RU_CONFIG, weight="A")
+        + SearchVector(secondary, config=_RU_CONFIG, weight="B")
+        + SearchVector(_normalize_uz_sql(F(primary)), config=_UZ_CONFIG, weight="A")
+        + SearchVector(_normalize_uz_sql(F(secondary)), config=_UZ_CONFIG, weight="B")
+    )
+
+
+def search_query(text: str, locale: str) -> SearchQuery:
+    uz_query = SearchQuery(normalize_uz(text), config=_UZ_CONFIG, search_type="websearch")
+    if (locale or "ru").lower().startswith("uz"):
+        return uz_query
+    return SearchQuery(text, config=_RU_CONFIG, search_type="websearch") | uz_query
+
+
+def search_rank(query: SearchQuery) -> SearchRank:
+    return SearchRank(F("search_vector"), query, normalization=Value(_RANK_NORMALIZATION))
+
+
+def refresh_search_vector(instance, update_fields=None) -> None:
+    """Пересчитать ``search_vector`` строки, если изменились индексируемые поля."""
+
+    fields = type(instance).SEARCH_FIELDS
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    primary, secondary = fields
+    type(instance)._default_manager.filter(pk=instance.pk).update(
+        search_vector=search_vector(primary=primary, secondary=secondary)
+    )
+
+
+def rebuild_search_vectors(model) -> int:
+    """Пересчитать векторы всех строк модели одним ``UPDATE``."""
+
+    primary, secondary = model.SEARCH_FIELDS
+    return model._default_manager.update(
+        search_vector=search_vector(primary=primary, secondary=secondary)
+    )
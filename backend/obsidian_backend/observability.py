@@ -97,10 +97,17 @@ def _configure_tracing(service_name: str, environment: str) -> None:
 PROM_LATENCY = None
 PROM_INFLIGHT = None
 PROM_TASK_COUNTER = None
+PROM_UPLOAD_QUEUE = None
+
+
+def _upload_queue_depth() -> int:
+    from uploads.processing import queue_depth
+
+    return queue_depth()
 
 
 def _configure_metrics(port: int) -> None:
-    global PROM_LATENCY, PROM_INFLIGHT, PROM_TASK_COUNTER
+    global PROM_LATENCY, PROM_INFLIGHT, PROM_TASK_COUNTER, PROM_UPLOAD_QUEUE
 
     if start_http_server is None:  # pragma: no cover - optional dependency
         LOGGER.debug("prometheus_client not installed; skipping metrics configuration")
@@ -121,6 +128,11 @@ def _configure_metrics(port: int) -> None:
         "Celery tasks processed",
         ["queue", "status"],
     )
+    PROM_UPLOAD_QUEUE = Gauge(
+        "obsidian_upload_queue_depth",
+        "Uploads waiting in quarantine for scrubbing and scanning",
+    )
+    PROM_UPLOAD_QUEUE.set_function(_upload_queue_depth)
 
 
 class PrometheusRequestMetricsMiddleware:
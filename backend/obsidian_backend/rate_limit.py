@@ -0,0 +1,137 @@
+"""Ограничение частоты запросов по GCRA с атомарной проверкой нескольких лимитов.
+
+Для каждого ключа хранится одно число — теоретическое время прибытия
+следующего запроса (TAT). Запрос проходит, если после сдвига TAT на
+``period / limit`` он не уходит дальше ``period`` от текущего момента; так
+лимит ``N / period`` допускает всплеск до N запросов и затем ровный поток без
+скачка на границе окон, как у фиксированного окна.
+
+``check_limits`` проверяет набор лимитов за один обход кеша и засчитывает
+запрос только если прошли все: отказ по минутному лимиту не расходует
+секундный. В Redis (``django.core.cache.backends.redis.RedisCache``) это один
+Lua-скрипт со временем сервера Redis; для остальных бэкендов — ``get_many`` и
+``set_many`` под блокировкой процесса. Для ``LocMemCache`` это так же атомарно,
+как и сам кеш; для разделяемых не-Redis бэкендов — без гарантий между
+процессами.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+_KEY_PREFIX = "ratelimit:"
+_local_lock = threading.Lock()
+
+# KEYS — ключи лимитов; ARGV — пары (interval_ms, period_ms) в том же порядке.
+# Возвращает 0, если запрос засчитан, иначе миллисекунды до следующей попытки.
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local retry_after = 0
+local tats = {}
+for index, key in ipairs(KEYS) do
+  local interval = tonumber(ARGV[index * 2 - 1])
+  local period = tonumber(ARGV[index * 2])
+  local tat = tonumber(redis.call('GET', key)) or now
+  if tat < now then
+    tat = now
+  end
+  local new_tat = tat + interval
+  local allow_at = new_tat - period
+  if allow_at > now then
+    retry_after = math.max(retry_after, allow_at - now)
+  end
+  tats[index] = new_tat
+end
+if retry_after > 0 then
+  return retry_after
+end
+for index, key in ipairs(KEYS) do
+  redis.call('SET', key, tats[index], 'PX', tonumber(ARGV[index * 2]))
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Не больше ``limit`` запросов за ``period`` секунд по ключу ``key``."""
+
+    key: str
+    limit: int
+    period: float
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    # Секунды до момента, когда пройдут все отказавшие лимиты.
+    retry_after: float = 0.0
+
+
+def _cache():
+    return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+
+def check_limits(limits: Sequence[Limit]) -> RateLimitResult:
+    """Проверить и засчитать запрос сразу по всем ``limits``.
+
+    Лимиты с ``limit <= 0`` считаются отключёнными.
+    """
+
+    limits = [limit for limit in limits if limit.limit > 0]
+    if not limits:
+        return RateLimitResult(allowed=True)
+    backend = _cache()
+    if isinstance(backend, RedisCache):
+        return _check_redis(backend, limits)
+    return _check_local(backend, limits)
+
+
+def _check_redis(backend: RedisCache, limits: list[Limit]) -> RateLimitResult:
+    keys = [backend.make_and_validate_key(_KEY_PREFIX + limit.key) for limit in limits]
+    args: list[int] = []
+    for limit in limits:
+        args.extend((max(1, round(limit.interval * 1000)), round(limit.period * 1000)))
+    client = backend._cache.get_client(keys[0], write=True)
+    retry_after_ms = client.register_script(_GCRA_SCRIPT)(keys=keys, args=args)
+    if retry_after_ms:
+        return RateLimitResult(allowed=False, retry_after=int(retry_after_ms) / 1000)
+    return RateLimitResult(allowed=True)
+
+
+def _check_local(backend, limits: list[Limit]) -> RateLimitResult:
+    keys = [_KEY_PREFIX + limit.key for limit in limits]
+    with _local_lock:
+        now = time.time()
+        stored = backend.get_many(keys)
+        retry_after = 0.0
+        updates: dict[float, dict[str, float]] = defaultdict(dict)
+        for limit, key in zip(limits, keys, strict=True):
+            new_tat = max(stored.get(key, now), now) + limit.interval
+            allow_at = new_tat - limit.period
+            if allow_at > now:
+                retry_after = max(retry_after, allow_at - now)
+            updates[limit.period][key] = new_tat
+        if retry_after:
+            return RateLimitResult(allowed=False, retry_after=retry_after)
+        # TAT засчитанного запроса не дальше ``period`` от текущего момента.
+        for period, values in updates.items():
+            backend.set_many(values, timeout=math.ceil(period))
+    return RateLimitResult(allowed=True)
+
+
+__all__ = ["Limit", "RateLimitResult", "check_limits"]
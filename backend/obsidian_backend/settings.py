@@ -18,6 +18,7 @@ from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 
 from . import feature_flags as communications_flags
+from .channel_layers import BACKEND_MEMORY, build_channel_layers
 from . import jwt_settings as jwt_conf
 from .observability import configure_observability
 
@@ -83,6 +84,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third-party
     "channels",
     "rest_framework",
@@ -135,11 +137,36 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "obsidian_backend.wsgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# "memory" — один процесс (локально и в тестах); "redis" — несколько ASGI-воркеров.
+CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", BACKEND_MEMORY).strip().lower()
+# Несколько адресов — шардирование групп и каналов по инстансам Redis.
+CHANNEL_REDIS_URLS = get_list_env("CHANNEL_REDIS_URLS", [])
+CHANNEL_LAYERS = build_channel_layers(
+    backend=CHANNEL_LAYER_BACKEND,
+    redis_urls=CHANNEL_REDIS_URLS,
+    default={
+        "capacity": int(os.getenv("CHANNEL_LAYER_CAPACITY", "100")),
+        "expiry": int(os.getenv("CHANNEL_LAYER_EXPIRY", "60")),
+        "group_expiry": int(os.getenv("CHANNEL_LAYER_GROUP_EXPIRY", "86400")),
+    },
+    chat={
+        # Буфер на сокет треда: короткие всплески сообщений не теряются.
+        "capacity": int(os.getenv("CHAT_CHANNEL_CAPACITY", "200")),
+        "expiry": int(os.getenv("CHAT_CHANNEL_EXPIRY", "30")),
+        # Сокет, подключённый дольше group_expiry, молча выпадает из chat.thread.*.
+        "group_expiry": int(os.getenv("CHAT_GROUP_EXPIRY", "86400")),
+    },
+)
+
+# Общий кеш воркеров. Без CACHE_REDIS_URL остаётся LocMemCache в пределах процесса.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "").strip()
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
     }
-}
 
 
 # Database
@@ -213,6 +240,17 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+# Отдача приватных файлов (uploads.delivery): python | accel (nginx) | sendfile.
+PRIVATE_MEDIA_DELIVERY = os.getenv("PRIVATE_MEDIA_DELIVERY", "python")
+# internal-локация nginx, указывающая на PRIVATE_MEDIA_ROOT (режим accel).
+PRIVATE_MEDIA_ACCEL_PREFIX = os.getenv("PRIVATE_MEDIA_ACCEL_PREFIX", "/protected-media/")
+# Загрузки ждут очистки EXIF и антивирусной проверки в карантине (uploads.processing).
+UPLOAD_QUARANTINE_ROOT = Path(os.getenv("UPLOAD_QUARANTINE_ROOT", str(BASE_DIR / "quarantine")))
+# Процессы пула проверки загрузок; 0 — синхронно после коммита. Очередь живёт
+# в памяти процесса: queue_depth и метрика obsidian_upload_queue_depth считают
+# только задачи своего процесса, а файлы, застрявшие после перезапуска, заново
+# отправляет на проверку команда recover_quarantine (запускать по cron).
+UPLOAD_PROCESSING_WORKERS = int(os.getenv("UPLOAD_PROCESSING_WORKERS", "2"))
 
 AUTH_USER_MODEL = "accounts.User"
 
@@ -264,6 +302,14 @@ CHAT_ATTACHMENTS_ENABLED = communications_flags.is_feature_enabled(
     "chat.attachments"
 )
 CHAT_PRESENCE_ENABLED = communications_flags.is_feature_enabled("chat.presence")
+CHAT_PRESENCE_INTERVAL_SECONDS = int(os.getenv("CHAT_PRESENCE_INTERVAL_SECONDS", "5"))
+CHAT_TYPING_DEBOUNCE_SECONDS = float(os.getenv("CHAT_TYPING_DEBOUNCE_SECONDS", "3"))
+# Long-poll журнала событий: размер страницы, предел ожидания и шаг опроса.
+# Ждущий запрос держит поток воркера: при N потоках не больше N одновременных
+# long-poll, поэтому предел ожидания короткий — клиент просто переспрашивает.
+CHAT_EVENT_PAGE_SIZE = int(os.getenv("CHAT_EVENT_PAGE_SIZE", "100"))
+CHAT_EVENT_POLL_MAX_WAIT_SECONDS = float(os.getenv("CHAT_EVENT_POLL_MAX_WAIT_SECONDS", "5"))
+CHAT_EVENT_POLL_INTERVAL_SECONDS = float(os.getenv("CHAT_EVENT_POLL_INTERVAL_SECONDS", "0.5"))
 DISPUTE_ENABLED = communications_flags.is_feature_enabled("dispute.enabled")
 NOTIFY_EMAIL_ENABLED = communications_flags.is_feature_enabled("notify.email")
 NOTIFY_WEBPUSH_ENABLED = communications_flags.is_feature_enabled("notify.webpush")
@@ -319,11 +365,38 @@ AI_GATEWAY_API_KEY = os.getenv("AI_GATEWAY_API_KEY", "")
 AI_GATEWAY_ENABLE_TELEMETRY = get_bool_env(
     "AI_GATEWAY_ENABLE_TELEMETRY", default=True
 )
+# Таймауты по эндпоинтам (общие на все попытки с ретраями); по умолчанию —
+# AI_GATEWAY_TIMEOUT.
+AI_GATEWAY_ENDPOINT_TIMEOUTS = {
+    "/match": float(os.getenv("AI_GATEWAY_MATCH_TIMEOUT", str(AI_GATEWAY_TIMEOUT))),
+    "/match/batch": float(os.getenv("AI_GATEWAY_MATCH_BATCH_TIMEOUT", "5")),
+    "/semantic_search": float(
+        os.getenv("AI_GATEWAY_SEARCH_TIMEOUT", str(AI_GATEWAY_TIMEOUT))
+    ),
+    "/summaries/tldr": float(os.getenv("AI_GATEWAY_TLDR_TIMEOUT", "5")),
+}
+AI_GATEWAY_HTTP2 = get_bool_env("AI_GATEWAY_HTTP2", default=False)
+AI_GATEWAY_MAX_CONNECTIONS = int(os.getenv("AI_GATEWAY_MAX_CONNECTIONS", "20"))
+AI_GATEWAY_MAX_KEEPALIVE = int(os.getenv("AI_GATEWAY_MAX_KEEPALIVE", "10"))
+AI_GATEWAY_RETRIES = int(os.getenv("AI_GATEWAY_RETRIES", "2"))
+AI_GATEWAY_RETRY_BACKOFF = float(os.getenv("AI_GATEWAY_RETRY_BACKOFF", "0.1"))
+AI_GATEWAY_BREAKER_THRESHOLD = int(os.getenv("AI_GATEWAY_BREAKER_THRESHOLD", "5"))
+AI_GATEWAY_BREAKER_RESET_SECONDS = float(
+    os.getenv("AI_GATEWAY_BREAKER_RESET_SECONDS", "30")
+)
+RECOMMENDATIONS_SNAPSHOT_TTL_SECONDS = int(
+    os.getenv("RECOMMENDATIONS_SNAPSHOT_TTL_SECONDS", str(60 * 60 * 24))
+)
+SEMANTIC_SEARCH_SNAPSHOT_TTL_SECONDS = int(
+    os.getenv("SEMANTIC_SEARCH_SNAPSHOT_TTL_SECONDS", "600")
+)
 
 CHAT_RATE_LIMIT_USER_PER_SECOND = int(os.getenv("CHAT_RATE_LIMIT_USER_PER_SECOND", "5"))
 CHAT_RATE_LIMIT_USER_PER_MINUTE = int(os.getenv("CHAT_RATE_LIMIT_USER_PER_MINUTE", "30"))
 CHAT_RATE_LIMIT_THREAD_PER_SECOND = int(os.getenv("CHAT_RATE_LIMIT_THREAD_PER_SECOND", "8"))
 CHAT_RATE_LIMIT_THREAD_PER_MINUTE = int(os.getenv("CHAT_RATE_LIMIT_THREAD_PER_MINUTE", "60"))
+# Кеш счётчиков obsidian_backend.rate_limit: чата и DRF-троттлинга.
+RATE_LIMIT_CACHE_ALIAS = os.getenv("RATE_LIMIT_CACHE_ALIAS", "default")
 
 CORS_ENV_ORIGINS = {
     "dev": [
@@ -0,0 +1,154 @@
+import asyncio
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from .ai import client as gateway
+from .ai.client import (
+    AiGatewayClient,
+    AiGatewayError,
+    AiGatewayUnavailable,
+    AsyncAiGatewayClient,
+    CircuitBreaker,
+)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(gateway.time, "monotonic", return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+
+    def _open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_probe_through(self):
+        self._open()
+        self.clock.return_value = 131.0
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes_the_circuit(self):
+        self._open()
+        self.clock.return_value = 131.0
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self._open()
+        self.clock.return_value = 131.0
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.clock.return_value = 150.0
+        self.assertFalse(self.breaker.allow())
+        self.clock.return_value = 162.0
+        self.assertTrue(self.breaker.allow())
+
+
+@override_settings(
+    AI_GATEWAY_URL="http://gateway.test",
+    AI_GATEWAY_RETRIES=2,
+    AI_GATEWAY_RETRY_BACKOFF=0,
+    AI_GATEWAY_BREAKER_THRESHOLD=3,
+    AI_GATEWAY_BREAKER_RESET_SECONDS=30,
+)
+class GatewayClientTests(SimpleTestCase):
+    def setUp(self):
+        gateway.reset_gateway_clients()
+        self.addCleanup(gateway.reset_gateway_clients)
+        self.responses = []
+        self.calls = []
+
+    def _handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.url.path)
+        outcome = self.responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def _transport(self):
+        options = {"transport": httpx.MockTransport(self._handler)}
+        return mock.patch.object(gateway, "_client_options", return_value=options)
+
+    def _post(self, path: str, *responses, client=None):
+        self.responses = list(responses)
+        with self._transport():
+            return (client or AiGatewayClient())._post(path, {})
+
+    def test_idempotent_call_is_retried_after_5xx(self):
+        result = self._post(
+            "/match",
+            httpx.Response(503, json={"detail": "busy"}),
+            httpx.Response(200, json={"ok": True}),
+        )
+        self.assertEqual(result, {"ok": True})
+        self.assertEqual(self.calls, ["/match", "/match"])
+
+    def test_non_idempotent_call_is_not_retried(self):
+        with self.assertRaises(AiGatewayUnavailable):
+            self._post("/embeddings/upsert", httpx.Response(503, json={}))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_client_error_is_not_retried(self):
+        with self.assertRaises(AiGatewayError) as context:
+            self._post("/match", httpx.Response(422, json={"detail": "bad"}))
+        self.assertNotIsInstance(context.exception, AiGatewayUnavailable)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_timeout_is_not_retried(self):
+        with self.assertRaises(AiGatewayUnavailable):
+            self._post("/match", httpx.ReadTimeout("slow"), httpx.Response(200, json={}))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_retry_is_skipped_when_backoff_exceeds_the_deadline(self):
+        client = AiGatewayClient(timeout=0.5)
+        with mock.patch.object(client, "_backoff", return_value=1.0), mock.patch.object(
+            gateway.time, "sleep"
+        ) as sleep:
+            with self.assertRaises(AiGatewayUnavailable):
+                self._post(
+                    "/match",
+                    httpx.ConnectError("refused"),
+                    httpx.Response(200, json={}),
+                    client=client,
+                )
+        sleep.assert_not_called()
+        self.assertEqual(len(self.calls), 1)
+
+    def test_open_circuit_short_circuits_requests(self):
+        with self.assertRaises(AiGatewayUnavailable):
+            self._post("/match", *[httpx.Response(502, json={})] * 3)
+        self.assertFalse(AiGatewayClient().is_available)
+        with self.assertRaises(AiGatewayUnavailable) as context:
+            self._post("/match", httpx.Response(200, json={}))
+        self.assertEqual(context.exception.payload["detail"], "circuit open")
+        self.assertEqual(len(self.calls), 3)
+
+    def test_async_client_closes_its_loop_pool(self):
+        self.responses = [httpx.Response(503, json={}), httpx.Response(200, json={"ok": 1})]
+
+        async def run():
+            async with AsyncAiGatewayClient() as client:
+                result = await client.match({})
+                pool = gateway._async_clients[asyncio.get_running_loop()]
+            return result, pool
+
+        with self._transport():
+            result, pool = asyncio.run(run())
+        self.assertEqual(result, {"ok": 1})
+        self.assertTrue(pool.is_closed)
+        self.assertEqual(len(gateway._async_clients), 0)
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.db.models import Q
 
@@ -58,14 +60,19 @@ class PortfolioItem(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_DRAFT
     )
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Поля полнотекстового индекса: (вес A, вес B).
+    SEARCH_FIELDS = ("title", "problem")
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["status"], name="portfolio_status_idx"),
             models.Index(fields=["profile", "featured"], name="portfolio_featured_idx"),
+            GinIndex(fields=["search_vector"], name="portfolio_search_vector_gin"),
         ]
 
     def __str__(self) -> str:  # pragma: no cover
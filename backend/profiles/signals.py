@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from obsidian_backend.full_text import refresh_search_vector
+
+from .models import PortfolioItem
+
+
+@receiver(post_save, sender=PortfolioItem)
+def update_portfolio_search_vector(
+    sender, instance: PortfolioItem, update_fields=None, **_: object
+) -> None:
+    """Keep the full-text vector in sync with title and problem."""
+
+    refresh_search_vector(instance, update_fields)
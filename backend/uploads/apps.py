@@ -5,3 +5,8 @@ class UploadsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "uploads"
     verbose_name = "Secure Uploads"
+
+    def ready(self) -> None:  # pragma: no cover - import side effects
+        from .signals import connect_blob_references
+
+        connect_blob_references()
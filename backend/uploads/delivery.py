@@ -0,0 +1,145 @@
+"""Отдача приватных файлов после проверки токена и прав в Django.
+
+Режим задаёт ``PRIVATE_MEDIA_DELIVERY``:
+
+* ``accel`` — ответ без тела с ``X-Accel-Redirect`` на internal-локацию nginx
+  (``PRIVATE_MEDIA_ACCEL_PREFIX``), файл и ``Range`` отдаёт nginx;
+* ``sendfile`` — то же с ``X-Sendfile`` и абсолютным путём (Apache
+  mod_xsendfile, lighttpd);
+* ``python`` — поток из хранилища в самом Django с поддержкой одного
+  диапазона ``Range`` и ``If-None-Match``.
+
+ETag во всех режимах — сохранённый SHA-256 содержимого.
+"""
+
+from __future__ import annotations
+
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from django.http import FileResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+DELIVERY_PYTHON = "python"
+DELIVERY_ACCEL = "accel"
+DELIVERY_SENDFILE = "sendfile"
+
+_CHUNK_SIZE = 64 * 1024
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Границы ``(start, end)`` включительно для одного диапазона или ``None``.
+
+    Несколько диапазонов не поддерживаются — для них отдаётся весь файл.
+    Непересекающийся с файлом диапазон (в том числе любой диапазон пустого
+    файла) даёт ``ValueError``.
+    """
+
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # ``bytes=-N`` — последние N байт.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _read_range(file: FieldFile, start: int, end: int):
+    with file.open("rb") as stream:
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = stream.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _stream_response(request: HttpRequest, file: FieldFile, etag: str) -> HttpResponse:
+    size = file.size
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            bounds = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if bounds is not None:
+            start, end = bounds
+            response = StreamingHttpResponse(_read_range(file, start, end), status=206)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(end - start + 1)
+            return response
+    return FileResponse(file.open("rb"))
+
+
+def private_file_response(
+    request: HttpRequest,
+    file: FieldFile,
+    *,
+    filename: str,
+    content_type: str,
+    checksum: str,
+) -> HttpResponse:
+    """Ответ на скачивание ``file`` для уже авторизованного запроса."""
+
+    etag = f'"{checksum}"'
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+    mode = settings.PRIVATE_MEDIA_DELIVERY
+    if mode == DELIVERY_ACCEL:
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = settings.PRIVATE_MEDIA_ACCEL_PREFIX + quote(file.name)
+    elif mode == DELIVERY_SENDFILE:
+        response = HttpResponse()
+        response["X-Sendfile"] = file.path
+    else:
+        response = _stream_response(request, file, etag)
+        if response.status_code == 416:
+            return response
+        response["Accept-Ranges"] = "bytes"
+    response["Content-Type"] = content_type
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["ETag"] = etag
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+__all__ = [
+    "DELIVERY_ACCEL",
+    "DELIVERY_PYTHON",
+    "DELIVERY_SENDFILE",
+    "private_file_response",
+]
@@ -0,0 +1,106 @@
+"""Потоковый приём загрузок без чтения файла в память целиком.
+
+``ingest_upload`` один раз проходит по файлу кусками ``CHUNK_SIZE``: тип
+определяется по сигнатуре в первых байтах, SHA-256 считается инкрементально,
+лимит размера проверяется по мере чтения. Сам ``UploadedFile`` (в памяти до
+``FILE_UPLOAD_MAX_MEMORY_SIZE`` или во временном файле Django) затем
+передаётся хранилищу, которое тоже копирует его кусками.
+
+Декодируются только изображения — для очистки EXIF. Очистка и антивирусная
+проверка идут в фоне (``uploads.processing``): запрос сохраняет запись в
+статусе ``pending_scan`` без файла, в хранилище файл попадает после проверки.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from django.core.files import File
+
+from . import processing
+from .validators import FileTooLargeError, UnsupportedFileTypeError, detect_mime_type
+
+CHUNK_SIZE = 64 * 1024
+# Самая длинная сигнатура из ``ALLOWED_MIME_TYPES`` — 8 байт (PNG).
+_SNIFF_BYTES = 16
+
+
+@dataclass
+class IngestedFile:
+    source: File
+    name: str
+    mime_type: str
+    size: int
+    checksum: str
+
+    @property
+    def is_image(self) -> bool:
+        return self.mime_type.startswith("image/")
+
+
+def ingest_upload(
+    file_obj: File,
+    *,
+    max_bytes: int,
+    allowed_mime_types: Collection[str] | None = None,
+) -> IngestedFile:
+    """Проверить тип и размер загрузки и посчитать её SHA-256 за один проход."""
+
+    if file_obj.size is not None and file_obj.size > max_bytes:
+        raise FileTooLargeError(f"File exceeds maximum allowed size of {max_bytes} bytes")
+    digest = hashlib.sha256()
+    head = b""
+    mime_type: str | None = None
+    size = 0
+    for chunk in file_obj.chunks(CHUNK_SIZE):
+        if mime_type is None:
+            head += chunk[: _SNIFF_BYTES - len(head)]
+            if len(head) >= _SNIFF_BYTES:
+                mime_type = detect_mime_type(head)
+        size += len(chunk)
+        if size > max_bytes:
+            raise FileTooLargeError(f"File exceeds maximum allowed size of {max_bytes} bytes")
+        digest.update(chunk)
+    if mime_type is None:
+        mime_type = detect_mime_type(head)
+    if allowed_mime_types is not None and mime_type not in allowed_mime_types:
+        raise UnsupportedFileTypeError(f"File type {mime_type} is not allowed here")
+    file_obj.seek(0)
+    return IngestedFile(
+        source=file_obj,
+        name=file_obj.name,
+        mime_type=mime_type,
+        size=size,
+        checksum=digest.hexdigest(),
+    )
+
+
+def persist_upload(instance, upload: IngestedFile) -> None:
+    """Заполнить модель с полем ``file`` данными загрузки и сохранить её.
+
+    Модель должна иметь поля ``original_name``, ``mime_type``, ``size`` и
+    ``checksum`` и методы ``mark_scanned``/``mark_scan_rejected``. Запись
+    сохраняется сразу, а ``file`` остаётся пустым, пока загрузка в карантине.
+    """
+
+    instance.original_name = upload.name
+    instance.mime_type = upload.mime_type
+    instance.size = upload.size
+    instance.checksum = upload.checksum
+    instance.save()
+    processing.enqueue(
+        instance,
+        upload.source,
+        filename=upload.name,
+        scrub_image=upload.is_image,
+    )
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "IngestedFile",
+    "ingest_upload",
+    "persist_upload",
+]
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from uploads.models import StoredBlob
+
+
+class Command(BaseCommand):
+    help = "Удаление блобов загрузок, на которые больше не ссылается ни одна запись"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Не трогать блобы, освобождённые позже этого срока",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Сначала пересчитать ref_count по ссылкам из загрузок",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        if options["recount"]:
+            fixed = StoredBlob.objects.recount_references(dry_run=dry_run)
+            self.stdout.write(f"recount: {'mismatched' if dry_run else 'fixed'}={fixed}")
+        removed = StoredBlob.objects.collect_garbage(
+            older_than=timedelta(hours=options["grace_hours"]),
+            dry_run=dry_run,
+        )
+        label = "orphaned" if dry_run else "removed"
+        self.stdout.write(f"blobs: {label}={removed}")
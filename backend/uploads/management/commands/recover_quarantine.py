@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from uploads.processing import recover_quarantined
+
+
+class Command(BaseCommand):
+    help = "Повторная проверка загрузок, застрявших в карантине после перезапуска воркера"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-minutes",
+            type=float,
+            default=30,
+            help="Трогать только файлы карантина старше этого срока",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        requeued, removed = recover_quarantined(
+            older_than=timedelta(minutes=options["older_than_minutes"]),
+            dry_run=options["dry_run"],
+        )
+        self.stdout.write(f"quarantine: requeued={requeued} removed={removed}")
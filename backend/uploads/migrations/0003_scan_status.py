@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+def mark_existing_clean(apps, schema_editor):
+    # Всё загруженное до карантина уже прошло синхронную проверку при загрузке;
+    # ``scanned_at`` документам при этом не проставлялся.
+    SecureDocument = apps.get_model("uploads", "SecureDocument")
+    SecureDocument.objects.exclude(file="").update(scan_status="clean")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploads", "0002_alter_securedocument_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="securedocument",
+            name="scan_status",
+            field=models.CharField(choices=[("pending_scan", "Pending scan"), ("clean", "Clean"), ("rejected", "Rejected")], default="pending_scan", max_length=16),
+        ),
+        migrations.RunPython(mark_existing_clean, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:12
+
+import django.db.models.deletion
+import uploads.models
+import uploads.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploads", "0003_scan_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredBlob",
+            fields=[
+                ("checksum", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("file", models.FileField(max_length=512, storage=uploads.storage.private_storage, upload_to=uploads.models._blob_upload_to)),
+                ("size", models.PositiveBigIntegerField()),
+                ("ref_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["ref_count", "updated_at"], name="uploads_blob_gc_idx")],
+            },
+        ),
+        migrations.AddField(
+            model_name="securedocument",
+            name="blob",
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="secure_documents", to="uploads.storedblob"),
+        ),
+    ]
@@ -2,16 +2,143 @@ from __future__ import annotations
 
 import hashlib
 import uuid
+from collections import defaultdict
 from datetime import timedelta
 
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.db import models
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models import Count, F
 from django.utils import timezone
 
+from .ingest import IngestedFile, persist_upload
 from .storage import private_storage
 
 
+class ScanStatus(models.TextChoices):
+    """Состояние файла в карантине загрузок (см. ``uploads.processing``)."""
+
+    PENDING = "pending_scan", "Pending scan"
+    CLEAN = "clean", "Clean"
+    REJECTED = "rejected", "Rejected"
+
+
+class FileNotScannedError(Exception):
+    """Файл ещё в карантине или не прошёл проверку — выдавать его нельзя."""
+
+
+def _blob_upload_to(instance: StoredBlob, filename: str) -> str:
+    checksum = instance.checksum
+    return f"blobs/{checksum[:2]}/{checksum[2:4]}/{checksum}"
+
+
+class StoredBlobManager(models.Manager):
+    def acquire(self, stream: File, *, checksum: str, size: int) -> StoredBlob:
+        """Взять ссылку на блоб с содержимым ``stream``.
+
+        Файл пишется в хранилище, только если блоба с таким SHA-256 ещё нет
+        (или его файл потерян). Строка блоба блокируется до конца транзакции,
+        поэтому параллельная загрузка того же содержимого и сборка мусора не
+        пересекаются.
+        """
+
+        with transaction.atomic():
+            self.bulk_create([self.model(checksum=checksum, size=size)], ignore_conflicts=True)
+            blob = self.select_for_update().get(checksum=checksum)
+            if not blob.file or not blob.file.storage.exists(blob.file.name):
+                blob.file.save(checksum, stream, save=False)
+            blob.ref_count += 1
+            blob.save(update_fields=["file", "ref_count", "updated_at"])
+        return blob
+
+    def release(self, blob_id: str) -> None:
+        self.filter(pk=blob_id).update(ref_count=F("ref_count") - 1, updated_at=timezone.now())
+
+    def collect_garbage(self, *, older_than: timedelta, dry_run: bool = False) -> int:
+        """Удалить блобы без ссылок, освобождённые раньше ``older_than``; вернуть их число.
+
+        Кроме счётчика проверяются и сами внешние ключи, так что блоб с
+        разошедшимся ``ref_count`` не будет удалён, пока на него ссылаются.
+        """
+
+        candidates = self.filter(ref_count__lte=0, updated_at__lt=timezone.now() - older_than)
+        for relation in self.model._meta.related_objects:
+            candidates = candidates.filter(**{f"{relation.name}__isnull": True})
+        if dry_run:
+            return candidates.count()
+        removed = 0
+        for checksum in candidates.values_list("checksum", flat=True).iterator():
+            with transaction.atomic():
+                blob = (
+                    candidates.select_for_update(skip_locked=True, of=("self",))
+                    .filter(checksum=checksum)
+                    .first()
+                )
+                if blob is None:
+                    # Блоб успели взять заново или его держит другая транзакция.
+                    continue
+                if blob.file:
+                    blob.file.delete(save=False)
+                blob.delete()
+            removed += 1
+        return removed
+
+    def recount_references(self, *, dry_run: bool = False) -> int:
+        """Пересчитать ``ref_count`` по внешним ключам; вернуть число исправленных блобов.
+
+        ``dry_run`` только считает блобы с разошедшимся счётчиком.
+        """
+
+        fixed = 0
+        with transaction.atomic():
+            counts: dict[str, int] = defaultdict(int)
+            blobs = self.only("checksum", "ref_count")
+            blobs = list(blobs if dry_run else blobs.select_for_update())
+            for relation in self.model._meta.related_objects:
+                rows = (
+                    relation.related_model._base_manager.filter(**{f"{relation.field.name}__isnull": False})
+                    .values_list(relation.field.attname)
+                    .annotate(total=Count("pk"))
+                )
+                for checksum, total in rows:
+                    counts[checksum] += total
+            for blob in blobs:
+                actual = counts[blob.checksum]
+                if actual == blob.ref_count:
+                    continue
+                fixed += 1
+                if not dry_run:
+                    blob.ref_count = actual
+                    blob.save(update_fields=["ref_count", "updated_at"])
+        return fixed
+
+
+class StoredBlob(models.Model):
+    """Файл в хранилище, адресуемый своим SHA-256 и общий для всех загрузок.
+
+    Загрузки с одинаковым содержимым ссылаются на один блоб через поле
+    ``blob``; их ``file`` указывает на тот же путь в хранилище. Блоб без ссылок
+    удаляет команда ``collect_blobs``.
+    """
+
+    checksum = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(storage=private_storage, upload_to=_blob_upload_to, max_length=512)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StoredBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"], name="uploads_blob_gc_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - debug helper
+        return f"StoredBlob<{self.checksum}>"
+
+
 class SecureDocument(models.Model):
     CATEGORY_PORTFOLIO = "portfolio"
     CATEGORY_KYC = "kyc"
@@ -29,10 +156,22 @@ class SecureDocument(models.Model):
     )
     category = models.CharField(max_length=32, choices=CATEGORY_CHOICES)
     file = models.FileField(storage=private_storage, upload_to="secure", max_length=512)
+    blob = models.ForeignKey(
+        StoredBlob,
+        on_delete=models.PROTECT,
+        related_name="secure_documents",
+        null=True,
+        blank=True,
+    )
     original_name = models.CharField(max_length=255)
     mime_type = models.CharField(max_length=64)
     checksum = models.CharField(max_length=64)
     size = models.PositiveBigIntegerField()
+    scan_status = models.CharField(
+        max_length=16,
+        choices=ScanStatus.choices,
+        default=ScanStatus.PENDING,
+    )
     scanned_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,21 +185,25 @@ class SecureDocument(models.Model):
     def __str__(self) -> str:  # pragma: no cover - debug helper
         return f"SecureDocument<{self.pk}>"
 
-    def attach_file(self, *, data: bytes, name: str, mime_type: str) -> None:
-        checksum = hashlib.sha256(data).hexdigest()
-        content = ContentFile(data, name=name)
-        self.file.save(name, content, save=False)
-        self.original_name = name
-        self.mime_type = mime_type
-        self.checksum = checksum
-        self.size = len(data)
-        self.save()
+    def attach_upload(self, upload: IngestedFile) -> None:
+        persist_upload(self, upload)
+
+    @property
+    def is_scanned(self) -> bool:
+        return self.scan_status == ScanStatus.CLEAN
 
     def mark_scanned(self) -> None:
+        self.scan_status = ScanStatus.CLEAN
         self.scanned_at = timezone.now()
-        self.save(update_fields=["scanned_at", "updated_at"])
+        self.save(update_fields=["scan_status", "scanned_at", "updated_at"])
+
+    def mark_scan_rejected(self) -> None:
+        self.scan_status = ScanStatus.REJECTED
+        self.save(update_fields=["scan_status", "updated_at"])
 
-    def build_presigned_token(self, *, ttl_seconds: int = 300) -> "SecureDocumentLink":
+    def build_presigned_token(self, *, ttl_seconds: int = 300) -> SecureDocumentLink:
+        if not self.is_scanned:
+            raise FileNotScannedError(f"Document {self.pk} has not passed scanning")
         link = SecureDocumentLink(document=self)
         link.save(expires_in=ttl_seconds)
         return link
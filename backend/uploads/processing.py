@@ -0,0 +1,379 @@
+"""Карантин загрузок и фоновая проверка вне потока запроса.
+
+Запрос сохраняет запись со статусом ``pending_scan`` без файла и после
+коммита копирует загрузку в каталог ``UPLOAD_QUARANTINE_ROOT``. Оттуда файл
+уходит в пул из ``UPLOAD_PROCESSING_WORKERS`` процессов: там изображение
+перекодируется без EXIF и файл проверяется антивирусом.
+Работа с базой и хранилищем остаётся в родительском процессе — результат
+забирает небольшой пул потоков: он привязывает запись к блобу
+``StoredBlob`` с тем же SHA-256 (файл пишется, только если такого блоба ещё
+нет) и вызывает ``mark_scanned`` (или ``mark_scan_rejected``, если проверка
+упала).
+
+Число задач, ещё не дошедших до ``mark_scanned``, доступно через
+``queue_depth`` и экспортируется метрикой ``obsidian_upload_queue_depth`` —
+только для своего процесса. Очередь живёт в памяти: если процесс перезапустился
+до ``mark_scanned``, запись остаётся ``pending_scan``. Рядом с каждым файлом
+карантина лежит манифест ``<файл>.json``, и ``recover_quarantined`` (команда
+``recover_quarantine``) по нему отправляет такие файлы на проверку заново.
+При ``UPLOAD_PROCESSING_WORKERS = 0`` обработка идёт синхронно в
+``on_commit`` — так удобнее в тестах и локальной разработке.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from typing import BinaryIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+
+from .scanner import scan_file
+from .validators import scrub_exif_file
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+_MANIFEST_SUFFIX = ".json"
+_SCRUBBED_SUFFIX = ".scrubbed"
+_pool: ProcessPoolExecutor | None = None
+_finalizer: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_depth = 0
+_depth_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ProcessedFile:
+    path: str
+    size: int
+    checksum: str
+    # Содержимое отличается от загруженного — после очистки EXIF.
+    rewritten: bool = False
+
+
+@dataclass(frozen=True)
+class QuarantineJob:
+    """Что нужно, чтобы повторить проверку файла из карантина."""
+
+    model_label: str
+    pk: str
+    filename: str
+    scrub_image: bool
+
+
+def _get_pools() -> tuple[ProcessPoolExecutor, ThreadPoolExecutor]:
+    global _pool, _finalizer
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.UPLOAD_PROCESSING_WORKERS
+                if _finalizer is None:
+                    _finalizer = ThreadPoolExecutor(
+                        max_workers=workers,
+                        thread_name_prefix="upload-finalize",
+                    )
+                # ``spawn``: ASGI-сервер многопоточный, ``fork`` из него небезопасен.
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool, _finalizer
+
+
+def _change_depth(delta: int) -> None:
+    global _depth
+    with _depth_lock:
+        _depth += delta
+
+
+def queue_depth() -> int:
+    """Сколько загрузок этого процесса ждут проверки или сохранения."""
+
+    return _depth
+
+
+def _quarantine_dir() -> str:
+    path = str(settings.UPLOAD_QUARANTINE_ROOT)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def quarantine(source: File) -> str:
+    """Скопировать загрузку в каталог карантина кусками; вернуть путь."""
+
+    with tempfile.NamedTemporaryFile(
+        dir=_quarantine_dir(), prefix="upload-", delete=False
+    ) as target:
+        for chunk in source.chunks(_CHUNK_SIZE):
+            target.write(chunk)
+    return target.name
+
+
+def hash_stream(stream: BinaryIO) -> tuple[int, str]:
+    """Размер и SHA-256 файла, прочитанного кусками с начала."""
+
+    stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return size, digest.hexdigest()
+
+
+def process_quarantined(path: str, filename: str, scrub_image: bool) -> ProcessedFile:
+    """Очистить EXIF и проверить файл из карантина. Выполняется в пуле процессов.
+
+    Не обращается ни к базе, ни к хранилищу: на входе и на выходе — пути в
+    каталоге карантина.
+    """
+
+    if not scrub_image:
+        with open(path, "rb") as stream:
+            size, checksum = hash_stream(stream)
+            scan_file(stream, filename=filename)
+        return ProcessedFile(path=path, size=size, checksum=checksum)
+    scrubbed_path = f"{path}{_SCRUBBED_SUFFIX}"
+    try:
+        with open(scrubbed_path, "w+b") as scrubbed:
+            scrub_exif_file(path, scrubbed)
+            size, checksum = hash_stream(scrubbed)
+            scan_file(scrubbed, filename=filename)
+    except Exception:
+        _unlink(scrubbed_path)
+        raise
+    return ProcessedFile(path=scrubbed_path, size=size, checksum=checksum, rewritten=True)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_manifest(path: str, job: QuarantineJob) -> None:
+    with open(f"{path}{_MANIFEST_SUFFIX}", "w", encoding="utf-8") as manifest:
+        json.dump(asdict(job), manifest)
+
+
+def _read_manifest(path: str) -> QuarantineJob | None:
+    try:
+        with open(f"{path}{_MANIFEST_SUFFIX}", encoding="utf-8") as manifest:
+            return QuarantineJob(**json.load(manifest))
+    except (FileNotFoundError, TypeError, ValueError):
+        return None
+
+
+def _finalize(model_label: str, pk: str, pending_path: str, future: Future) -> None:
+    """Перенести проверенный файл в хранилище и отметить запись проверенной."""
+
+    from .models import ScanStatus
+
+    result: ProcessedFile | None = None
+    try:
+        instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+        if instance is not None and instance.scan_status != ScanStatus.PENDING:
+            # Повтор после ``recover_quarantined``: запись уже обработана.
+            return
+        try:
+            result = future.result()
+        except Exception:
+            logger.warning("Upload %s %s rejected by processing", model_label, pk, exc_info=True)
+            if instance is not None:
+                instance.mark_scan_rejected()
+            return
+        if instance is None:
+            # Запись удалили, пока файл ждал проверки.
+            return
+        update_fields = ["blob", "file"]
+        if result.rewritten:
+            instance.size = result.size
+            instance.checksum = result.checksum
+            update_fields += ["size", "checksum"]
+        blobs = apps.get_model("uploads", "StoredBlob").objects
+        with transaction.atomic():
+            with open(result.path, "rb") as stream:
+                blob = blobs.acquire(File(stream), checksum=result.checksum, size=result.size)
+            if instance.blob_id is not None:
+                # Повтор после сбоя до ``mark_scanned``: ссылка уже была взята.
+                blobs.release(instance.blob_id)
+            # Одинаковые загрузки указывают на один файл блоба, а не на копии.
+            instance.blob = blob
+            instance.file.name = blob.file.name
+            instance.save(update_fields=update_fields)
+        instance.mark_scanned()
+    finally:
+        _unlink(pending_path)
+        _unlink(f"{pending_path}{_MANIFEST_SUFFIX}")
+        if result is not None:
+            _unlink(result.path)
+        _change_depth(-1)
+
+
+def _finalize_in_thread(model_label: str, pk: str, pending_path: str, future: Future) -> None:
+    close_old_connections()
+    try:
+        _finalize(model_label, pk, pending_path, future)
+    except Exception:  # pragma: no cover - фоновый воркер не должен падать
+        logger.exception("Failed to store processed upload %s %s", model_label, pk)
+    finally:
+        close_old_connections()
+
+
+def _submit(pending_path: str, filename: str, scrub_image: bool) -> tuple[Future, ThreadPoolExecutor]:
+    global _pool
+    pool, finalizer = _get_pools()
+    try:
+        return pool.submit(process_quarantined, pending_path, filename, scrub_image), finalizer
+    except BrokenProcessPool:
+        # Воркер упал (например, на битом изображении) — пул больше не принимает задач.
+        logger.warning("Upload processing pool is broken, restarting it")
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool, finalizer = _get_pools()
+        return pool.submit(process_quarantined, pending_path, filename, scrub_image), finalizer
+
+
+def _process_inline(pending_path: str, filename: str, scrub_image: bool) -> Future:
+    future: Future = Future()
+    try:
+        future.set_result(process_quarantined(pending_path, filename, scrub_image))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def enqueue(instance, source: File, *, filename: str, scrub_image: bool) -> None:
+    """Поставить файл сохранённой записи ``instance`` в очередь проверки.
+
+    Файл копируется в карантин после коммита, чтобы откат транзакции не
+    оставлял в каталоге осиротевших копий. У модели должны быть поля ``file``,
+    ``blob`` и ``scan_status`` и методы ``mark_scanned`` и
+    ``mark_scan_rejected``; поля ``size`` и ``checksum`` обновляются, если
+    очистка EXIF изменила содержимое.
+    """
+
+    job = QuarantineJob(
+        model_label=instance._meta.label,
+        pk=str(instance.pk),
+        filename=filename,
+        scrub_image=scrub_image,
+    )
+
+    def dispatch() -> None:
+        pending_path = quarantine(source)
+        _write_manifest(pending_path, job)
+        args = (job.model_label, job.pk, pending_path)
+        _change_depth(1)
+        if settings.UPLOAD_PROCESSING_WORKERS <= 0:
+            _finalize(*args, _process_inline(pending_path, filename, scrub_image))
+            return
+        try:
+            future, finalizer = _submit(pending_path, filename, scrub_image)
+        except Exception:
+            _change_depth(-1)
+            _unlink(pending_path)
+            _unlink(f"{pending_path}{_MANIFEST_SUFFIX}")
+            raise
+        future.add_done_callback(lambda done: finalizer.submit(_finalize_in_thread, *args, done))
+
+    transaction.on_commit(dispatch)
+
+
+def _stale_quarantine(
+    older_than: timedelta,
+) -> tuple[list[tuple[str, QuarantineJob]], list[str]]:
+    """Застрявшие файлы карантина: ``(файл, задача)`` для повтора и файлы на удаление."""
+
+    from .models import ScanStatus
+
+    cutoff = time.time() - older_than.total_seconds()
+    directory = _quarantine_dir()
+    retry: list[tuple[str, QuarantineJob]] = []
+    stranded: list[str] = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        if name.endswith(_MANIFEST_SUFFIX):
+            if not os.path.exists(path.removesuffix(_MANIFEST_SUFFIX)):
+                stranded.append(path)
+            continue
+        if name.endswith(_SCRUBBED_SUFFIX):
+            # Промежуточный результат очистки; при повторе он создаётся заново.
+            stranded.append(path)
+            continue
+        job = _read_manifest(path)
+        if job is None:
+            stranded.append(path)
+            continue
+        pending = (
+            apps.get_model(job.model_label)
+            .objects.filter(pk=job.pk, scan_status=ScanStatus.PENDING)
+            .exists()
+        )
+        if pending:
+            retry.append((path, job))
+        else:
+            stranded += [path, f"{path}{_MANIFEST_SUFFIX}"]
+    return retry, stranded
+
+
+def recover_quarantined(*, older_than: timedelta, dry_run: bool = False) -> tuple[int, int]:
+    """Заново проверить загрузки, застрявшие в карантине; вернуть ``(requeued, removed)``.
+
+    Файл старше ``older_than``, чья запись всё ещё ``pending_scan``, снова
+    проходит очистку и проверку. Вызов ждёт результата. Файлы удалённых или уже
+    обработанных записей и копии без манифеста удаляются. ``older_than`` должен
+    быть заметно больше обычной задержки очереди, иначе файл возьмут в работу
+    дважды.
+    """
+
+    retry, stranded = _stale_quarantine(older_than)
+    if dry_run:
+        return len(retry), len(stranded)
+    for path in stranded:
+        _unlink(path)
+    submitted: list[tuple[str, QuarantineJob, Future]] = []
+    for path, job in retry:
+        _change_depth(1)
+        if settings.UPLOAD_PROCESSING_WORKERS <= 0:
+            future = _process_inline(path, job.filename, job.scrub_image)
+        else:
+            future, _ = _submit(path, job.filename, job.scrub_image)
+        submitted.append((path, job, future))
+    for path, job, future in submitted:
+        _finalize(job.model_label, job.pk, path, future)
+    return len(retry), len(stranded)
+
+
+__all__ = [
+    "ProcessedFile",
+    "QuarantineJob",
+    "enqueue",
+    "hash_stream",
+    "process_quarantined",
+    "quarantine",
+    "queue_depth",
+    "recover_quarantined",
+]
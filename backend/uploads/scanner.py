@@ -25,4 +25,14 @@ def scan_bytes(data: bytes, *, filename: str) -> None:
     raise RuntimeError("Antivirus scanner feature flag enabled but no scanner is configured")
 
 
-__all__ = ["scan_bytes", "scanner_enabled"]
+def scan_file(file_obj, *, filename: str) -> None:
+    """Streaming variant of :func:`scan_bytes` for files kept on disk."""
+
+    if not scanner_enabled():
+        return
+    size = getattr(file_obj, "size", None)
+    logger.info("Antivirus scan requested for %s (%s bytes)", filename, size)
+    raise RuntimeError("Antivirus scanner feature flag enabled but no scanner is configured")
+
+
+__all__ = ["scan_bytes", "scan_file", "scanner_enabled"]
@@ -15,6 +15,7 @@ class SecureDocumentSerializer(serializers.ModelSerializer):
             "mime_type",
             "size",
             "created_at",
+            "scan_status",
             "scanned_at",
         ]
         read_only_fields = [
@@ -23,6 +24,7 @@ class SecureDocumentSerializer(serializers.ModelSerializer):
             "mime_type",
             "size",
             "created_at",
+            "scan_status",
             "scanned_at",
         ]
 
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete
+
+from .models import StoredBlob
+
+
+def release_blob(sender, instance, **_: object) -> None:
+    """Drop the reference a deleted upload held on its content blob."""
+
+    if instance.blob_id:
+        StoredBlob.objects.release(instance.blob_id)
+
+
+def connect_blob_references() -> None:
+    # Every model with a ``blob`` FK (chat attachments, secure documents, evidence).
+    for relation in StoredBlob._meta.related_objects:
+        post_delete.connect(
+            release_blob,
+            sender=relation.related_model,
+            dispatch_uid=f"uploads.release_blob.{relation.related_model._meta.label}",
+        )
@@ -0,0 +1,287 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from . import processing
+from .delivery import _parse_range, private_file_response
+from .ingest import ingest_upload
+from .models import ScanStatus, SecureDocument, SecureDocumentLink, StoredBlob
+from .storage import private_storage
+from .validators import ALLOWED_MIME_TYPES, MAX_FILE_SIZE_BYTES
+
+_PDF = b"%PDF-1.4\n" + b"0" * 256
+
+
+class UploadTestCase(TestCase):
+    """Загрузки в карантине и хранилище во временных каталогах, проверка синхронно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(
+            nickname="uploader",
+            email="uploader@example.com",
+            first_name="Up",
+            last_name="Loader",
+        )
+
+    def setUp(self):
+        quarantine_root = tempfile.mkdtemp(prefix="quarantine-")
+        media_root = tempfile.mkdtemp(prefix="private-media-")
+        self.addCleanup(shutil.rmtree, quarantine_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.quarantine_root = quarantine_root
+        overrides = override_settings(
+            UPLOAD_QUARANTINE_ROOT=quarantine_root, UPLOAD_PROCESSING_WORKERS=0
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for attribute in ("location", "base_location"):
+            patcher = mock.patch.object(private_storage, attribute, media_root)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _document(self, content: bytes = _PDF, name: str = "contract.pdf") -> SecureDocument:
+        upload = ingest_upload(
+            SimpleUploadedFile(name, content),
+            max_bytes=MAX_FILE_SIZE_BYTES,
+            allowed_mime_types=ALLOWED_MIME_TYPES,
+        )
+        document = SecureDocument(owner=self.owner, category=SecureDocument.CATEGORY_PORTFOLIO)
+        with self.captureOnCommitCallbacks(execute=True):
+            document.attach_upload(upload)
+        document.refresh_from_db()
+        return document
+
+    def _quarantined(self) -> list[str]:
+        return sorted(os.listdir(self.quarantine_root))
+
+
+class UploadProcessingTests(UploadTestCase):
+    def test_pending_upload_is_stored_and_marked_clean(self):
+        document = self._document()
+
+        self.assertEqual(document.scan_status, ScanStatus.CLEAN)
+        self.assertIsNotNone(document.scanned_at)
+        self.assertEqual(document.blob.checksum, hashlib.sha256(_PDF).hexdigest())
+        self.assertEqual(document.blob.ref_count, 1)
+        with document.file.open("rb") as stored:
+            self.assertEqual(stored.read(), _PDF)
+        self.assertEqual(self._quarantined(), [])
+        self.assertEqual(processing.queue_depth(), 0)
+
+    def test_scanner_error_rejects_upload(self):
+        with mock.patch.object(
+            processing, "scan_file", side_effect=RuntimeError("infected")
+        ), self.assertLogs("uploads.processing", "WARNING"):
+            document = self._document()
+
+        self.assertEqual(document.scan_status, ScanStatus.REJECTED)
+        self.assertFalse(document.file)
+        self.assertIsNone(document.blob_id)
+        self.assertEqual(self._quarantined(), [])
+
+    def test_exif_scrub_updates_size_and_checksum(self):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker " * 20
+        source = io.BytesIO()
+        Image.new("RGB", (16, 16), "red").save(source, format="JPEG", exif=exif.tobytes())
+        original = source.getvalue()
+
+        document = self._document(original, name="photo.jpg")
+
+        self.assertEqual(document.scan_status, ScanStatus.CLEAN)
+        with document.file.open("rb") as stored:
+            content = stored.read()
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertNotIn("exif", image.info)
+        self.assertEqual(document.size, len(content))
+        self.assertEqual(document.checksum, hashlib.sha256(content).hexdigest())
+        self.assertNotEqual(document.checksum, hashlib.sha256(original).hexdigest())
+
+    def _pending_document(self) -> SecureDocument:
+        return SecureDocument.objects.create(
+            owner=self.owner,
+            category=SecureDocument.CATEGORY_PORTFOLIO,
+            original_name="contract.pdf",
+            mime_type="application/pdf",
+            size=len(_PDF),
+            checksum=hashlib.sha256(_PDF).hexdigest(),
+        )
+
+    def _strand(self, document: SecureDocument) -> str:
+        """Файл в карантине, как будто процесс упал до ``mark_scanned``."""
+
+        path = processing.quarantine(File(io.BytesIO(_PDF)))
+        processing._write_manifest(
+            path,
+            processing.QuarantineJob(
+                model_label=SecureDocument._meta.label,
+                pk=str(document.pk),
+                filename="contract.pdf",
+                scrub_image=False,
+            ),
+        )
+        stale = time.time() - 3600
+        for name in (path, f"{path}.json"):
+            os.utime(name, (stale, stale))
+        return path
+
+    def test_recover_requeues_stranded_upload(self):
+        document = self._pending_document()
+        self._strand(document)
+        orphan = processing.quarantine(File(io.BytesIO(b"orphan")))
+        fresh = processing.quarantine(File(io.BytesIO(b"fresh")))
+        stale = time.time() - 3600
+        os.utime(orphan, (stale, stale))
+
+        older_than = timedelta(minutes=30)
+        self.assertEqual(processing.recover_quarantined(older_than=older_than, dry_run=True), (1, 1))
+        self.assertEqual(processing.recover_quarantined(older_than=older_than), (1, 1))
+
+        document.refresh_from_db()
+        self.assertEqual(document.scan_status, ScanStatus.CLEAN)
+        with document.file.open("rb") as stored:
+            self.assertEqual(stored.read(), _PDF)
+        self.assertEqual(self._quarantined(), [os.path.basename(fresh)])
+
+    def test_retry_releases_the_blob_taken_before_the_crash(self):
+        document = self._pending_document()
+        with open(self._strand(document), "rb") as stream:
+            blob = StoredBlob.objects.acquire(
+                File(stream), checksum=document.checksum, size=document.size
+            )
+        SecureDocument.objects.filter(pk=document.pk).update(blob=blob, file=blob.file.name)
+
+        processing.recover_quarantined(older_than=timedelta(minutes=30))
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        document.refresh_from_db()
+        self.assertEqual(document.scan_status, ScanStatus.CLEAN)
+
+    def test_collect_blobs_dry_run_does_not_recount(self):
+        blob = self._document().blob
+        StoredBlob.objects.filter(pk=blob.pk).update(ref_count=5)
+        output = io.StringIO()
+
+        call_command("collect_blobs", "--recount", "--dry-run", stdout=output)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 5)
+        self.assertIn("recount: mismatched=1", output.getvalue())
+
+        call_command("collect_blobs", "--recount", stdout=io.StringIO())
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+
+class PendingUploadAccessTests(UploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+        with mock.patch.object(processing, "enqueue"):
+            self.document = self._document()
+
+    def test_pending_upload_cannot_be_presigned(self):
+        self.assertEqual(self.document.scan_status, ScanStatus.PENDING)
+        url = reverse("secure-document-presign", args=[self.document.pk])
+        self.assertEqual(self.api.post(url).status_code, 400)
+
+    def test_pending_upload_is_not_downloadable(self):
+        link = SecureDocumentLink(document=self.document)
+        link.save()
+        url = reverse("secure-document-download-detail", args=[self.document.pk])
+        self.assertEqual(self.api.get(url, {"token": link.token}).status_code, 404)
+
+
+class PrivateFileDeliveryTests(UploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self._document()
+        self.etag = f'"{self.document.checksum}"'
+
+    def _get(self, **headers):
+        request = RequestFactory().get("/download", headers=headers)
+        return private_file_response(
+            request,
+            self.document.file,
+            filename="contract.pdf",
+            content_type="application/pdf",
+            checksum=self.document.checksum,
+        )
+
+    @staticmethod
+    def _body(response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_full_response_advertises_ranges(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self._body(response), _PDF)
+
+    def test_single_range_returns_partial_content(self):
+        response = self._get(Range="bytes=2-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 2-9/{len(_PDF)}")
+        self.assertEqual(response["Content-Length"], "8")
+        self.assertEqual(self._body(response), _PDF[2:10])
+
+        response = self._get(Range="bytes=-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), _PDF[-5:])
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self._get(**{"If-None-Match": f'"other", W/{self.etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.etag)
+
+    def test_unsatisfiable_range_returns_416(self):
+        response = self._get(Range=f"bytes={len(_PDF)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(_PDF)}")
+
+    def test_empty_file_rejects_every_range(self):
+        for header in ("bytes=-5", "bytes=0-", "bytes=0-0"):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                _parse_range(header, 0)
+
+    def test_multiple_ranges_and_stale_if_range_fall_back_to_full_file(self):
+        for headers in (
+            {"Range": "bytes=0-1,4-5"},
+            {"Range": "bytes=0-1", "If-Range": '"stale"'},
+        ):
+            with self.subTest(headers=headers):
+                response = self._get(**headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self._body(response), _PDF)
+
+    @override_settings(PRIVATE_MEDIA_DELIVERY="accel", PRIVATE_MEDIA_ACCEL_PREFIX="/protected/")
+    def test_accel_mode_hands_the_file_to_nginx(self):
+        response = self._get(Range="bytes=0-1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected/{self.document.file.name}")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response.content, b"")
+
+    @override_settings(PRIVATE_MEDIA_DELIVERY="sendfile")
+    def test_sendfile_mode_sends_the_absolute_path(self):
+        response = self._get()
+        self.assertEqual(response["X-Sendfile"], self.document.file.path)
+        self.assertEqual(response.content, b"")
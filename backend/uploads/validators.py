@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import io
-from typing import Iterable, Tuple
+from typing import BinaryIO, Iterable, Tuple
 
 from PIL import Image
 
@@ -18,6 +18,14 @@ class FileValidationError(ValueError):
     pass
 
 
+class UnsupportedFileTypeError(FileValidationError):
+    pass
+
+
+class FileTooLargeError(FileValidationError):
+    pass
+
+
 def _matches_signature(data: bytes, signature: bytes) -> bool:
     return data.startswith(signature)
 
@@ -26,12 +34,12 @@ def detect_mime_type(data: bytes) -> str:
     for mime, signature in ALLOWED_MIME_TYPES.items():
         if _matches_signature(data, signature):
             return mime
-    raise FileValidationError("Unsupported or untrusted file type")
+    raise UnsupportedFileTypeError("Unsupported or untrusted file type")
 
 
 def ensure_size_within_limits(size: int) -> None:
     if size > MAX_FILE_SIZE_BYTES:
-        raise FileValidationError("File exceeds maximum allowed size of 20 MB")
+        raise FileTooLargeError("File exceeds maximum allowed size of 20 MB")
 
 
 def scrub_exif_if_image(data: bytes, mime_type: str) -> bytes:
@@ -42,3 +50,11 @@ def scrub_exif_if_image(data: bytes, mime_type: str) -> bytes:
         output = io.BytesIO()
         image.save(output, format=image.format)
         return output.getvalue()
+
+
+def scrub_exif_file(source_path: str, target: BinaryIO) -> None:
+    """Перекодировать изображение с диска в ``target`` без EXIF."""
+
+    with Image.open(source_path) as image:
+        image.info.pop("exif", None)
+        image.save(target, format=image.format)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from django.http import FileResponse, Http404
+from django.http import Http404
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
@@ -10,14 +11,15 @@ from accounts import rbac
 from accounts.audit import audit_logger
 from accounts.models import AuditEvent
 from accounts.permissions import RoleBasedAccessPermission
-from .models import SecureDocument, SecureDocumentLink
-from .scanner import scan_bytes
+from .delivery import private_file_response
+from .models import FileNotScannedError, SecureDocument, SecureDocumentLink
+from .ingest import ingest_upload
 from .serializers import (
     SecureDocumentLinkSerializer,
     SecureDocumentSerializer,
     SecureDocumentUploadSerializer,
 )
-from .validators import detect_mime_type, ensure_size_within_limits, scrub_exif_if_image
+from .validators import ALLOWED_MIME_TYPES, MAX_FILE_SIZE_BYTES, FileValidationError
 
 
 class SecureDocumentViewSet(
@@ -51,26 +53,19 @@ class SecureDocumentViewSet(
     def upload(self, request):
         serializer = SecureDocumentUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        file_obj = serializer.validated_data["file"]
-        ensure_size_within_limits(file_obj.size)
-        data = file_obj.read()
-        mime_type = detect_mime_type(data)
-        cleaned_data = scrub_exif_if_image(data, mime_type)
-        if cleaned_data is not data:
-            data = cleaned_data
-        ensure_size_within_limits(len(data))
-        scan_bytes(data, filename=file_obj.name)
-
-        document = SecureDocument.objects.create(
+        try:
+            upload = ingest_upload(
+                serializer.validated_data["file"],
+                max_bytes=MAX_FILE_SIZE_BYTES,
+                allowed_mime_types=ALLOWED_MIME_TYPES,
+            )
+        except FileValidationError as exc:
+            raise ValidationError({"file": [str(exc)]}) from exc
+        document = SecureDocument(
             owner=request.user,
             category=serializer.validated_data["category"],
         )
-        document.attach_file(
-            data=data,
-            name=file_obj.name,
-            mime_type=mime_type,
-        )
-        document.refresh_from_db()
+        document.attach_upload(upload)
         if document.category == SecureDocument.CATEGORY_KYC:
             audit_logger.log_event(
                 event_type=AuditEvent.TYPE_KYC_UPLOAD,
@@ -111,7 +106,10 @@ class SecureDocumentViewSet(
             ttl = int(request.data.get("ttl", 300))
         except (TypeError, ValueError):
             ttl = 300
-        link = document.build_presigned_token(ttl_seconds=max(60, min(ttl, 3600)))
+        try:
+            link = document.build_presigned_token(ttl_seconds=max(60, min(ttl, 3600)))
+        except FileNotScannedError as exc:
+            raise ValidationError({"detail": "File has not passed scanning yet"}) from exc
         serializer = SecureDocumentLinkSerializer(link)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -138,10 +136,16 @@ class SecureDocumentDownloadViewSet(viewsets.ViewSet):
         document = link.document
         if not rbac.can(request.user, "uploads:link", obj=document):
             return Response(status=status.HTTP_403_FORBIDDEN)
-        response = FileResponse(document.file.open("rb"), as_attachment=True, filename=document.original_name)
-        response["Content-Type"] = document.mime_type
-        response["X-Content-Type-Options"] = "nosniff"
-        response["Content-Disposition"] = f"attachment; filename*=UTF-8''{document.original_name}"
+        if not document.is_scanned:
+            # Файл ещё в карантине или не прошёл проверку.
+            raise Http404
+        response = private_file_response(
+            request,
+            document.file,
+            filename=document.original_name,
+            content_type=document.mime_type,
+            checksum=document.checksum,
+        )
         if document.category == SecureDocument.CATEGORY_KYC:
             audit_logger.log_event(
                 event_type=AuditEvent.TYPE_KYC_VIEW,
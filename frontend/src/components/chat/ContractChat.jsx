@@ -79,9 +79,11 @@ export default function ContractChat({
   useEffect(() => {
     async function bootstrap() {
       try {
+        // Голову журнала берём до истории: события между запросами не потеряются.
+        const head = await fetchJson(`/contracts/${contractId}/events/`);
+        cursorRef.current = head.next_cursor;
         const data = await fetchJson(`/contracts/${contractId}/messages/?page_size=50`);
         setMessages(data.results ?? data);
-        cursorRef.current = new Date().toISOString();
       } catch (err) {
         console.error('Failed to bootstrap chat', err);
         setError('Не удалось загрузить чат');
@@ -107,6 +109,9 @@ export default function ContractChat({
     socket.addEventListener('open', () => {
       setConnectionState('online');
       setError(null);
+      if (presenceEnabled) {
+        socket.send(JSON.stringify({ action: 'presence_snapshot' }));
+      }
       flushQueue();
     });
     socket.addEventListener('close', () => {
@@ -123,7 +128,7 @@ export default function ContractChat({
         console.warn('Unable to parse WebSocket payload', err);
       }
     });
-  }, [authToken, contractId, wsBaseUrl, flushQueue]);
+  }, [authToken, contractId, wsBaseUrl, flushQueue, presenceEnabled]);
 
   useEffect(() => {
     openSocket();
@@ -133,15 +138,21 @@ export default function ContractChat({
   }, [openSocket]);
 
   const handleSocketEvent = useCallback((payload) => {
+    if (payload.seq && payload.seq > (cursorRef.current ?? 0)) {
+      cursorRef.current = payload.seq;
+    }
     if (payload.type === 'message') {
       setMessages((current) => mergeMessages(current, payload.payload));
-      cursorRef.current = new Date().toISOString();
+    } else if (payload.type === 'hidden') {
+      setMessages((current) => current.filter((message) => message.id !== payload.payload.id));
     } else if (payload.type === 'status') {
       setMessages((current) => current.map((message) => (
         message.id === payload.payload.id
           ? { ...message, status: payload.payload.status, delivered_at: payload.payload.delivered_at, read_at: payload.payload.read_at }
           : message
       )));
+    } else if (payload.type === 'presence_snapshot' && presenceEnabled) {
+      setTypingState(() => (payload.payload.offline.length ? 'Собеседник оффлайн' : null));
     } else if (payload.type === 'presence' && presenceEnabled) {
       setTypingState(() => (payload.payload.status === 'online' ? null : 'Собеседник оффлайн'));
     } else if (payload.type === 'typing' && presenceEnabled) {
@@ -152,9 +163,9 @@ export default function ContractChat({
   useEffect(() => {
     const interval = setInterval(async () => {
       if (connectionState === 'online') return;
-      if (!cursorRef.current) return;
+      if (cursorRef.current === null) return;
       try {
-        const events = await fetchJson(`/contracts/${contractId}/events/?since=${cursorRef.current}`);
+        const events = await fetchJson(`/contracts/${contractId}/events/?cursor=${cursorRef.current}&wait=4`);
         events.events?.forEach(handleSocketEvent);
         cursorRef.current = events.next_cursor;
       } catch (err) {